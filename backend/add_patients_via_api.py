@@ -1,12 +1,40 @@
 """
-Script to add more patients via API to demonstrate pagination.
-This can be run locally and will add patients directly to the Railway database.
+Import patients through the API.
+
+Reads patients from CSV or NDJSON files, or uses the sample patients below when
+no file is given. Patients are posted with an async httpx client:
+- pooled keep-alive connections;
+- at most --concurrency requests in flight;
+- retries with exponential backoff and jitter after timeouts, connection errors,
+  409, 429 and 5xx, honouring Retry-After.
+
+Each request carries an Idempotency-Key that its retries reuse. A create that
+timed out after the server committed it is replayed, not inserted twice.
+
+If the server's OpenAPI schema lists POST /api/patients/bulk-create, patients
+are sent in batches of --batch-size. Otherwise it is one request per patient.
+The run ends with throughput, request latency and a count per outcome (created,
+exists, duplicate, invalid, failed). --results writes one NDJSON line per input
+row.
+
+    python add_patients_via_api.py patients.csv --api-url http://localhost:8000 --concurrency 16
 """
-import requests
-from datetime import date, timedelta
+import argparse
+import asyncio
+import csv
+from dataclasses import dataclass, field
+import json
+import os
 import random
+import statistics
+import sys
+import time
+import uuid
+import httpx
 
-API_URL = "https://cerula-care-production.up.railway.app"
+API_URL = os.getenv("API_URL", "https://cerula-care-production.up.railway.app")
+BULK_CREATE_PATH = "/api/patients/bulk-create"
+RETRY_STATUSES = {409, 429, 500, 502, 503, 504}
 
 # Additional patients to add (beyond the existing 10)
 additional_patients = [
@@ -221,32 +249,204 @@ additional_patients = [
     },
 ]
 
-def add_patients():
-    """Add patients via API"""
-    added = 0
-    skipped = 0
-    
-    for patient_data in additional_patients:
+
+class RequestFailed(Exception):
+    """A request that still failed after all retries"""
+
+
+@dataclass
+class Stats:
+    requests: int = 0
+    retries: int = 0
+    latencies: list = field(default_factory=list)
+    outcomes: dict = field(default_factory=dict)
+
+    def record(self, outcome: str):
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+
+def load_rows(paths) -> list:
+    """Patients from CSV (header row with field names) and NDJSON files"""
+    rows = []
+    for path in paths:
+        if path.endswith(".csv"):
+            with open(path, newline="") as f:
+                for record in csv.DictReader(f):
+                    # Empty cells mean "not provided"
+                    rows.append({k.strip(): v.strip() for k, v in record.items() if k and v and v.strip()})
+        elif path.endswith((".ndjson", ".jsonl")):
+            with open(path) as f:
+                rows.extend(json.loads(line) for line in f if line.strip())
+        else:
+            raise SystemExit(f"Unsupported input file (use .csv, .ndjson or .jsonl): {path}")
+    return rows
+
+
+def _retry_delay(attempt: int, response=None, base: float = 0.5, cap: float = 30.0) -> float:
+    if response is not None:
+        try:
+            return min(float(response.headers["retry-after"]), cap)
+        except (KeyError, ValueError):
+            pass
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+async def send(client: httpx.AsyncClient, method: str, path: str, stats: Stats, retries: int, **kwargs):
+    """Send a request, retrying transient failures with the same Idempotency-Key"""
+    headers = {"Idempotency-Key": str(uuid.uuid4()), **kwargs.pop("headers", {})}
+    for attempt in range(retries + 1):
+        start = time.perf_counter()
+        response = None
         try:
-            response = requests.post(f"{API_URL}/api/patients", json=patient_data)
-            if response.status_code == 201:
-                added += 1
-                print(f"✓ Added {patient_data['first_name']} {patient_data['last_name']}")
-            elif response.status_code == 400 and "already registered" in response.text:
-                skipped += 1
-                print(f"⊘ Skipped {patient_data['first_name']} {patient_data['last_name']} (already exists)")
-            else:
-                print(f"✗ Failed to add {patient_data['first_name']} {patient_data['last_name']}: {response.status_code} - {response.text[:100]}")
-        except Exception as e:
-            print(f"✗ Error adding {patient_data['first_name']} {patient_data['last_name']}: {e}")
-    
-    print(f"\n✓ Added {added} patients, skipped {skipped} (already exist)")
-    
+            response = await client.request(method, path, headers=headers, **kwargs)
+            error = None if response.status_code not in RETRY_STATUSES else f"HTTP {response.status_code}"
+        except httpx.TransportError as exc:
+            error = f"{type(exc).__name__}: {exc}"
+        stats.requests += 1
+        stats.latencies.append(time.perf_counter() - start)
+        if error is None:
+            return response
+        if attempt == retries:
+            raise RequestFailed(error)
+        stats.retries += 1
+        await asyncio.sleep(_retry_delay(attempt, response))
+
+
+def _detail(response) -> str:
+    try:
+        detail = response.json().get("detail")
+    except ValueError:
+        return response.text[:200]
+    return detail if isinstance(detail, str) else json.dumps(detail)[:200]
+
+
+async def create_one(client, index: int, patient: dict, stats: Stats, retries: int) -> dict:
+    try:
+        response = await send(client, "POST", "/api/patients", stats, retries, json=patient)
+    except RequestFailed as exc:
+        return {"index": index, "status": "failed", "detail": str(exc)}
+    if response.status_code == 201:
+        return {"index": index, "status": "created", "id": response.json()["id"]}
+    if response.status_code == 400 and "already registered" in response.text:
+        return {"index": index, "status": "exists"}
+    return {"index": index, "status": "invalid", "detail": f"HTTP {response.status_code}: {_detail(response)}"}
+
+
+async def create_batch(client, offset: int, patients: list, stats: Stats, retries: int) -> list:
+    try:
+        response = await send(client, "POST", BULK_CREATE_PATH, stats, retries, json={"patients": patients})
+    except RequestFailed as exc:
+        return [{"index": offset + i, "status": "failed", "detail": str(exc)} for i in range(len(patients))]
+    if response.status_code != 200:
+        detail = f"HTTP {response.status_code}: {_detail(response)}"
+        return [{"index": offset + i, "status": "failed", "detail": detail} for i in range(len(patients))]
+    results = []
+    for item in response.json()["results"]:
+        item = {k: v for k, v in item.items() if v is not None}
+        results.append({**item, "index": offset + item["index"]})
+    return results
+
+
+async def has_bulk_endpoint(client: httpx.AsyncClient) -> bool:
+    """True if the server's OpenAPI schema advertises the bulk create endpoint"""
+    try:
+        response = await client.get("/openapi.json")
+        return response.status_code == 200 and "post" in response.json().get("paths", {}).get(BULK_CREATE_PATH, {})
+    except (httpx.HTTPError, ValueError):
+        return False
+
+
+async def import_patients(rows: list, api_url: str, concurrency: int = 8, batch_size: int = 500,
+                          retries: int = 5, timeout: float = 30.0, use_bulk: bool = True, api_key: str = None):
+    """Import rows; returns (per-row results in input order, Stats, elapsed seconds, bulk used)"""
+    stats = Stats()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    headers = {"X-API-Key": api_key} if api_key else {}
+    async with httpx.AsyncClient(base_url=api_url, limits=limits, timeout=timeout, headers=headers) as client:
+        bulk = use_bulk and await has_bulk_endpoint(client)
+        slots = asyncio.Semaphore(concurrency)
+
+        async def bounded(coro):
+            async with slots:
+                return await coro
+
+        start = time.perf_counter()
+        if bulk:
+            batches = [
+                bounded(create_batch(client, offset, rows[offset:offset + batch_size], stats, retries))
+                for offset in range(0, len(rows), batch_size)
+            ]
+            results = [result for batch in await asyncio.gather(*batches) for result in batch]
+        else:
+            results = await asyncio.gather(*(
+                bounded(create_one(client, index, patient, stats, retries)) for index, patient in enumerate(rows)
+            ))
+        elapsed = time.perf_counter() - start
+
+    results.sort(key=lambda r: r["index"])
+    for result in results:
+        stats.record(result["status"])
+    return results, stats, elapsed, bulk
+
+
+def _print_report(rows: list, results: list, stats: Stats, elapsed: float, bulk: bool):
+    for result in results:
+        if result["status"] in ("invalid", "duplicate", "failed"):
+            patient = rows[result["index"]]
+            name = f"{patient.get('first_name', '?')} {patient.get('last_name', '?')}"
+            print(f"✗ Row {result['index']} ({name}): {result['status']} - {result.get('detail', '')}")
+
+    latencies = sorted(stats.latencies)
+    print(f"\n✓ {len(rows)} rows in {elapsed:.2f}s ({len(rows) / elapsed if elapsed else 0:.1f} rows/s) "
+          f"using {'the bulk endpoint' if bulk else 'one request per patient'}")
+    print(f"  Requests: {stats.requests} ({stats.retries} retries)")
+    if latencies:
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"  Latency: p50 {statistics.median(latencies) * 1000:.0f} ms, p95 {p95 * 1000:.0f} ms, "
+              f"max {latencies[-1] * 1000:.0f} ms")
+    print("  Outcomes: " + ", ".join(f"{name} {count}" for name, count in sorted(stats.outcomes.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import patients through the API")
+    parser.add_argument("files", nargs="*", help="CSV or NDJSON files (default: the built-in sample patients)")
+    parser.add_argument("--api-url", default=API_URL)
+    parser.add_argument("--api-key", default=os.getenv("API_KEY"), help="Sent as X-API-Key")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight at once")
+    parser.add_argument("--batch-size", type=int, default=500, help="Patients per bulk request (max 1000)")
+    parser.add_argument("--retries", type=int, default=5, help="Retries per request for transient failures")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument("--no-bulk", action="store_true", help="Always send one request per patient")
+    parser.add_argument("--results", help="Write per-row outcomes to this NDJSON file")
+    args = parser.parse_args()
+
+    rows = load_rows(args.files) if args.files else additional_patients
+    if not rows:
+        print("Nothing to import")
+        return
+    results, stats, elapsed, bulk = asyncio.run(import_patients(
+        rows, args.api_url.rstrip("/"), args.concurrency, min(args.batch_size, 1000),
+        args.retries, args.timeout, not args.no_bulk, args.api_key,
+    ))
+    _print_report(rows, results, stats, elapsed, bulk)
+
+    if args.results:
+        with open(args.results, "w") as f:
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+
     # Check final count
-    count_response = requests.get(f"{API_URL}/api/patients/count")
-    if count_response.status_code == 200:
-        total = count_response.json()["count"]
-        print(f"✓ Total patients in database: {total}")
+    try:
+        count = httpx.get(f"{args.api_url.rstrip('/')}/api/patients/count", timeout=args.timeout)
+        if count.status_code == 200:
+            print(f"✓ Total patients in database: {count.json()['count']}")
+    except httpx.HTTPError:
+        pass
+
+    if stats.outcomes.get("failed"):
+        sys.exit(1)
+
 
 if __name__ == "__main__":
-    add_patients()
+    main()
@@ -0,0 +1,237 @@
+"""
+Admission control and per-client rate limiting.
+
+Concurrency: at most ADMISSION_MAX_CONCURRENCY requests run at once per worker
+process. Up to ADMISSION_MAX_QUEUE more wait for a slot, for at most
+ADMISSION_QUEUE_TIMEOUT seconds. Anything beyond that gets an immediate 503 with
+Retry-After, instead of piling up behind the thread and connection pools until
+every request times out.
+
+Rate limits: each client has a token bucket per budget. A client is its
+X-API-Key header when the key is in RATE_LIMIT_API_KEYS, otherwise its address.
+Unknown keys are ignored, so sending a fresh key per request doesn't buy a fresh
+bucket. Behind TRUSTED_PROXY_HOPS proxies, the address is the one the outermost
+trusted proxy recorded in X-Forwarded-For. Entries before it are client-supplied
+and ignored. Expensive routes (searches, counts,
+seeding, archival, sync, analytics, care team recommendations and exports) draw
+from a separate, smaller budget, so a report script hammering counts can't use
+up the budget for ordinary page loads.
+Over-budget requests get a 429 with Retry-After.
+
+Long-lived streams and the docs are exempt. Counters for both mechanisms are
+available from ``snapshot()``.
+"""
+import asyncio
+from dataclasses import dataclass
+import hashlib
+import math
+import os
+import threading
+import time
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+ADMISSION_MAX_CONCURRENCY = int(
+    os.getenv("ADMISSION_MAX_CONCURRENCY", os.getenv("THREADPOOL_SIZE", "40"))
+)
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "100"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "2"))
+ADMISSION_EXEMPT_PATHS = [
+    p.strip() for p in os.getenv(
+        "ADMISSION_EXEMPT_PATHS", "/api/changes/stream,/api/admin/admission,/docs,/redoc,/openapi.json"
+    ).split(",") if p.strip()
+]
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+# Tokens per second and bucket size for ordinary requests
+RATE_LIMIT_RATE = float(os.getenv("RATE_LIMIT_RATE", "20"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "100"))
+# Tokens per second and bucket size for expensive routes
+RATE_LIMIT_EXPENSIVE_RATE = float(os.getenv("RATE_LIMIT_EXPENSIVE_RATE", "5"))
+RATE_LIMIT_EXPENSIVE_BURST = float(os.getenv("RATE_LIMIT_EXPENSIVE_BURST", "30"))
+RATE_LIMIT_EXPENSIVE_PATHS = [
+    p.strip() for p in os.getenv(
+        "RATE_LIMIT_EXPENSIVE_PATHS",
+        "/api/patients/count,/api/patients/bulk-,/api/admin/seed,/api/admin/archive,"
+        "/api/admin/snapshots,/api/sync/changes,/api/analytics,/api/care-team-assignments/",
+    ).split(",") if p.strip()
+]
+
+# API keys that get their own buckets (comma-separated); other keys are ignored
+RATE_LIMIT_API_KEYS = {
+    hashlib.sha256(key.strip().encode()).hexdigest()
+    for key in os.getenv("RATE_LIMIT_API_KEYS", "").split(",") if key.strip()
+}
+# Proxies in front of the app that append to X-Forwarded-For (Railway's edge is one)
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "1" if os.getenv("RAILWAY_ENVIRONMENT") else "0"))
+
+# Buckets idle this long are full again and can be forgotten
+_BUCKET_IDLE_SECONDS = 600
+_MAX_BUCKETS = 10000
+
+
+@dataclass
+class _Bucket:
+    tokens: float
+    updated: float
+
+
+class TokenBuckets:
+    """Token buckets keyed by (client, budget)"""
+
+    def __init__(self, budgets: dict):
+        # budget name -> (rate per second, burst)
+        self.budgets = budgets
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, client: str, budget: str) -> float:
+        """Take one token; returns 0 if allowed, else seconds until a token is available"""
+        rate, burst = self.budgets[budget]
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get((client, budget))
+            if bucket is None:
+                if len(self._buckets) >= _MAX_BUCKETS:
+                    self._prune(now)
+                bucket = self._buckets[(client, budget)] = _Bucket(burst, now)
+            bucket.tokens = min(burst, bucket.tokens + (now - bucket.updated) * rate)
+            bucket.updated = now
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                return 0.0
+            return (1 - bucket.tokens) / rate
+
+    def _prune(self, now: float):
+        for key, bucket in list(self._buckets.items()):
+            if now - bucket.updated > _BUCKET_IDLE_SECONDS:
+                del self._buckets[key]
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class AdmissionStats:
+    def __init__(self):
+        self.in_flight = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_queue_timeout = 0
+        self.rate_limited = {"default": 0, "expensive": 0}
+
+
+stats = AdmissionStats()
+buckets = TokenBuckets({
+    "default": (RATE_LIMIT_RATE, RATE_LIMIT_BURST),
+    "expensive": (RATE_LIMIT_EXPENSIVE_RATE, RATE_LIMIT_EXPENSIVE_BURST),
+})
+
+
+def client_address(scope) -> str:
+    """The client's address, as seen by the outermost trusted proxy"""
+    client = scope.get("client")
+    address = client[0] if client else "unknown"
+    if TRUSTED_PROXY_HOPS:
+        forwarded = Headers(scope=scope).get("x-forwarded-for")
+        hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()] if forwarded else []
+        # Each proxy appends the address it was connected from; count back from the end
+        if len(hops) >= TRUSTED_PROXY_HOPS:
+            address = hops[-TRUSTED_PROXY_HOPS]
+    return address
+
+
+def client_key(scope) -> str:
+    """A known API key when the client sends one, otherwise its address"""
+    api_key = Headers(scope=scope).get("x-api-key")
+    if api_key and RATE_LIMIT_API_KEYS:
+        digest = hashlib.sha256(api_key.encode()).hexdigest()
+        if digest in RATE_LIMIT_API_KEYS:
+            return f"key:{digest[:16]}"
+    return f"addr:{client_address(scope)}"
+
+
+def budget_for(scope) -> str:
+    path = scope["path"]
+    if any(path.startswith(prefix) for prefix in RATE_LIMIT_EXPENSIVE_PATHS):
+        return "expensive"
+    # Searches scan the patients table; plain list pages use the index
+    if path == "/api/patients" and b"search=" in scope.get("query_string", b""):
+        return "expensive"
+    return "default"
+
+
+def snapshot() -> dict:
+    return {
+        "max_concurrency": ADMISSION_MAX_CONCURRENCY,
+        "max_queue": ADMISSION_MAX_QUEUE,
+        "in_flight": stats.in_flight,
+        "queue_depth": stats.queued,
+        "max_queue_depth": stats.max_queued,
+        "admitted": stats.admitted,
+        "rejected_queue_full": stats.rejected_queue_full,
+        "rejected_queue_timeout": stats.rejected_queue_timeout,
+        "rate_limited": dict(stats.rate_limited),
+        "rate_limit_clients": len(buckets),
+    }
+
+
+def _reject(status_code: int, detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        {"detail": detail},
+        status_code=status_code,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class AdmissionControlMiddleware:
+    def __init__(self, app):
+        self.app = app
+        # Created on first use so it binds to the worker's event loop
+        self._slots = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or any(
+            scope["path"].startswith(prefix) for prefix in ADMISSION_EXEMPT_PATHS
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        if RATE_LIMIT_ENABLED:
+            budget = budget_for(scope)
+            wait = buckets.take(client_key(scope), budget)
+            if wait:
+                stats.rate_limited[budget] += 1
+                await _reject(429, "Rate limit exceeded", wait)(scope, receive, send)
+                return
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(ADMISSION_MAX_CONCURRENCY)
+
+        if self._slots.locked():
+            if stats.queued >= ADMISSION_MAX_QUEUE:
+                stats.rejected_queue_full += 1
+                await _reject(503, "Server busy, retry later", ADMISSION_RETRY_AFTER)(scope, receive, send)
+                return
+            stats.queued += 1
+            stats.max_queued = max(stats.max_queued, stats.queued)
+            try:
+                await asyncio.wait_for(self._slots.acquire(), ADMISSION_QUEUE_TIMEOUT)
+            except asyncio.TimeoutError:
+                stats.rejected_queue_timeout += 1
+                await _reject(503, "Server busy, retry later", ADMISSION_RETRY_AFTER)(scope, receive, send)
+                return
+            finally:
+                stats.queued -= 1
+        else:
+            await self._slots.acquire()
+
+        stats.in_flight += 1
+        stats.admitted += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            stats.in_flight -= 1
+            self._slots.release()
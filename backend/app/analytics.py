@@ -0,0 +1,268 @@
+"""
+Population statistics over health screening scores, computed with NumPy.
+
+The screening columns (patient id, date, score) and each patient's cohort
+attributes are streamed from the database in chunks of ANALYTICS_CHUNK_SIZE rows
+(``yield_per``) straight into NumPy arrays, without building ORM objects.
+Histograms, percentiles and per-cohort z-scores are then vectorized over those
+arrays.
+
+Each worker caches the screening arrays tagged with the health_screenings
+generation, and the patient-to-cohort mapping tagged with the patients
+generation (see app.generations). A request checks both with one small read.
+A screening write reloads the screening arrays; a patient write reloads only
+the cohort mapping, and the two are joined again in memory.
+
+NumPy is imported on first use, so importing the app doesn't pay for it.
+"""
+import os
+import threading
+from typing import TYPE_CHECKING
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app import generations
+from app.models import Patient, HealthScreening
+
+if TYPE_CHECKING:
+    import numpy as np
+
+ANALYTICS_CHUNK_SIZE = int(os.getenv("ANALYTICS_CHUNK_SIZE", "50000"))
+
+# Patient attributes that can define a cohort
+COHORT_FIELDS = ("care_program", "status")
+UNASSIGNED = "unassigned"
+
+SCORE_RANGE = (0.0, 10.0)
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+# date.toordinal() of 1970-01-01, the datetime64 epoch
+_EPOCH_ORDINAL = 719163
+
+
+def _to_days(values) -> "np.ndarray":
+    import numpy as np
+    # Much faster than letting NumPy convert date objects one by one
+    ordinals = np.fromiter((d.toordinal() for d in values), dtype=np.int64, count=len(values))
+    return (ordinals - _EPOCH_ORDINAL).astype("datetime64[D]")
+
+
+def _load_columns(db: Session, columns, converters) -> list:
+    """Stream columns into one NumPy array each, a chunk at a time"""
+    import numpy as np
+    chunks = [[] for _ in columns]
+    # Table columns (not ORM attributes), so rows skip ORM loading entirely
+    result = db.execute(select(*columns).execution_options(yield_per=ANALYTICS_CHUNK_SIZE))
+    for partition in result.partitions():
+        for i, values in enumerate(zip(*partition)):
+            chunks[i].append(converters[i](values))
+    return [
+        np.concatenate(parts) if parts else converters[i](())
+        for i, parts in enumerate(chunks)
+    ]
+
+
+def _cohort_label(value) -> str:
+    if value is None:
+        return UNASSIGNED
+    return getattr(value, "value", value)
+
+
+class Screenings:
+    """Screening columns sorted by patient then date"""
+
+    def __init__(self, patient_id, day, score, generation):
+        import numpy as np
+        order = np.lexsort((day, patient_id))
+        self.patient_id, self.day, self.score = patient_id[order], day[order], score[order]
+        self.generation = generation
+
+
+class Cohorts:
+    """Sorted patient ids with each patient's cohort code per field"""
+
+    def __init__(self, patients, cohort_values, generation):
+        import numpy as np
+        patient_order = np.argsort(patients)
+        self.patients = patients[patient_order]
+        # cohort field -> (code per patient, labels)
+        self.cohorts = {}
+        for field, values in cohort_values.items():
+            labels, codes = np.unique(values[patient_order], return_inverse=True)
+            self.cohorts[field] = (codes, [str(label) for label in labels])
+        self.generation = generation
+
+
+class ScreeningData:
+    """Screenings joined to their patients' cohorts"""
+
+    def __init__(self, screenings: Screenings, cohorts: Cohorts):
+        import numpy as np
+        # Map screenings to rows in the (sorted) patients array; drop strays from
+        # patients deleted between the two loads
+        patients = cohorts.patients
+        patient_id = screenings.patient_id
+        position = np.searchsorted(patients, patient_id).clip(max=max(len(patients) - 1, 0))
+        known = (patients[position] == patient_id) if len(patients) else np.zeros(len(patient_id), bool)
+
+        self.patient_id = patient_id[known]
+        self.day = screenings.day[known]
+        self.score = screenings.score[known]
+        self.patient_index = position[known]
+        self.patients = patients
+        self.cohorts = cohorts.cohorts
+        # Index of each patient's most recent screening (last of each run)
+        if len(self.patient_id):
+            self.latest = np.flatnonzero(np.r_[self.patient_id[1:] != self.patient_id[:-1], True])
+        else:
+            self.latest = np.array([], dtype=np.int64)
+        self.screenings = screenings
+        self.cohort_data = cohorts
+        self.generation = (cohorts.generation, screenings.generation)
+
+    def screening_cohorts(self, field: str, index=slice(None)):
+        """Cohort code of each selected screening, plus the cohort labels"""
+        codes, labels = self.cohorts[field]
+        return codes[self.patient_index[index]], labels
+
+
+def _array(dtype):
+    import numpy as np
+    return lambda values: np.array(values, dtype=dtype)
+
+
+def load_screenings(db: Session, generation=None) -> Screenings:
+    import numpy as np
+    screenings = HealthScreening.__table__.c
+    patient_id, day, score = _load_columns(
+        db,
+        [screenings.patient_id, screenings.screening_date, screenings.score],
+        [_array(np.int64), _to_days, _array(np.float64)],
+    )
+    return Screenings(patient_id, day, score, generation)
+
+
+def load_cohorts(db: Session, generation=None) -> Cohorts:
+    import numpy as np
+    patients = Patient.__table__.c
+    patient_ids, care_program, status = _load_columns(
+        db,
+        [patients.id, patients.care_program, patients.status],
+        [_array(np.int64), _array(object), _array(object)],
+    )
+    cohort_values = {
+        "care_program": np.array([_cohort_label(v) for v in care_program], dtype=object),
+        "status": np.array([_cohort_label(v) for v in status], dtype=object),
+    }
+    return Cohorts(patient_ids, cohort_values, generation)
+
+
+def load(db: Session, generation=(None, None)) -> ScreeningData:
+    """Load both parts; generation is (patients, health_screenings)"""
+    return ScreeningData(load_screenings(db, generation[1]), load_cohorts(db, generation[0]))
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_data(db: Session) -> ScreeningData:
+    """
+    Cached arrays. The screening arrays are reloaded only after a screening
+    write; a patient write reloads just the small patient-to-cohort mapping.
+    """
+    global _cache
+    generation = generations.current(db, "patients", "health_screenings")
+    data = _cache
+    if data is not None and data.generation == generation:
+        return data
+    with _cache_lock:
+        # Another request may have reloaded while we waited
+        data = _cache
+        if data is None or data.generation != generation:
+            patients_generation, screenings_generation = generation
+            screenings = data.screenings if data is not None else None
+            if screenings is None or screenings.generation != screenings_generation:
+                screenings = load_screenings(db, screenings_generation)
+            cohorts = data.cohort_data if data is not None else None
+            if cohorts is None or cohorts.generation != patients_generation:
+                cohorts = load_cohorts(db, patients_generation)
+            _cache = ScreeningData(screenings, cohorts)
+        return _cache
+
+
+def _filter_index(data: ScreeningData, latest: bool, cohort_filters: dict) -> "np.ndarray":
+    import numpy as np
+    index = data.latest if latest else np.arange(len(data.score))
+    for field, value in cohort_filters.items():
+        if value is None:
+            continue
+        codes, labels = data.screening_cohorts(field, index)
+        if value not in labels:
+            return index[:0]
+        index = index[codes == labels.index(value)]
+    return index
+
+
+def distribution(data: ScreeningData, bins: int = 10, latest: bool = False,
+                 percentiles=DEFAULT_PERCENTILES, **cohort_filters) -> dict:
+    """Histogram, percentiles, mean and standard deviation of scores"""
+    import numpy as np
+    scores = data.score[_filter_index(data, latest, cohort_filters)]
+    counts, edges = np.histogram(scores, bins=bins, range=SCORE_RANGE)
+    values = np.percentile(scores, percentiles) if len(scores) else [None] * len(percentiles)
+    return {
+        "count": int(len(scores)),
+        "mean": float(scores.mean()) if len(scores) else None,
+        "std": float(scores.std()) if len(scores) else None,
+        "bins": [
+            {"start": float(edges[i]), "end": float(edges[i + 1]), "count": int(counts[i])}
+            for i in range(len(counts))
+        ],
+        "percentiles": {
+            f"p{q:g}": (float(v) if v is not None else None) for q, v in zip(percentiles, values)
+        },
+    }
+
+
+def zscores(data: ScreeningData, cohort_field: str = "care_program", patient_id: int = None,
+            min_abs_z: float = None, limit: int = 100) -> dict:
+    """Z-score of each patient's latest score against the patients in their cohort"""
+    import numpy as np
+    latest = data.latest
+    scores = data.score[latest]
+    codes, labels = data.screening_cohorts(cohort_field, latest)
+
+    size = np.bincount(codes, minlength=len(labels))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.bincount(codes, weights=scores, minlength=len(labels)) / size
+        variance = np.bincount(codes, weights=scores * scores, minlength=len(labels)) / size - mean ** 2
+    std = np.sqrt(np.clip(variance, 0, None))
+    cohort_std = std[codes]
+    z = np.divide(scores - mean[codes], cohort_std, out=np.zeros_like(scores), where=cohort_std > 0)
+
+    selected = np.arange(len(z))
+    if patient_id is not None:
+        selected = selected[data.patient_id[latest] == patient_id]
+    if min_abs_z is not None:
+        selected = selected[np.abs(z[selected]) >= min_abs_z]
+    # Largest deviations first
+    selected = selected[np.argsort(-np.abs(z[selected]), kind="stable")][:limit]
+
+    return {
+        "cohort_field": cohort_field,
+        "cohorts": [
+            {"cohort": label, "patients": int(size[i]), "mean": float(mean[i]), "std": float(std[i])}
+            for i, label in enumerate(labels) if size[i]
+        ],
+        "patients": [
+            {
+                "patient_id": int(data.patient_id[latest[i]]),
+                "cohort": labels[codes[i]],
+                "score": float(scores[i]),
+                "screening_date": data.day[latest[i]].item(),
+                "z_score": float(z[i]),
+            }
+            for i in selected
+        ],
+    }
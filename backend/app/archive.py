@@ -0,0 +1,100 @@
+"""
+Archival of discharged patients.
+
+Discharged patients, with their care team assignments and health screenings, are
+moved in batches from the hot tables into the ``*_archive`` tables. Ids are kept,
+and the hot tables never hand out an id again (AUTOINCREMENT on SQLite,
+sequences on PostgreSQL), so archived patients stay readable through the
+existing detail endpoint. Each batch locks its patients and re-checks that they
+are still discharged, then runs an INSERT ... SELECT into the archive plus a
+DELETE from the hot tables, committed together. Moved rows leave "archived"
+tombstones so delta sync clients drop them too.
+"""
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import select, insert, delete, literal
+from sqlalchemy.orm import Session
+from app import models, counters, autocomplete, sync
+
+
+def _archive_batch(db: Session, patient_ids: list) -> int:
+    """Archive the given patients that are still discharged; returns how many were moved"""
+    archived_at = literal(datetime.utcnow())
+    patient = models.Patient.__table__
+    assignment = models.CareTeamAssignment.__table__
+    screening = models.HealthScreening.__table__
+
+    # Take the write lock (SQLite) and then the patient row locks (PostgreSQL) before
+    # re-checking the status, so no patient can leave discharged while we move it
+    seq = sync.next_seq(db)
+    patient_ids = list(db.execute(
+        select(patient.c.id)
+        .where(patient.c.id.in_(patient_ids), patient.c.status == models.PatientStatus.DISCHARGED)
+        .with_for_update()
+    ).scalars())
+    if not patient_ids:
+        return 0
+    discharged = (patient.c.id.in_(patient_ids), patient.c.status == models.PatientStatus.DISCHARGED)
+
+    db.execute(
+        insert(models.ArchivedPatient.__table__).from_select(
+            ["id", "first_name", "last_name", "date_of_birth", "email", "phone", "address",
+             "enrollment_date", "status", "care_program", "archived_at"],
+            select(
+                patient.c.id, patient.c.first_name, patient.c.last_name, patient.c.date_of_birth,
+                patient.c.email, patient.c.phone, patient.c.address, patient.c.enrollment_date,
+                patient.c.status, patient.c.care_program, archived_at,
+            ).where(*discharged),
+        )
+    )
+    db.execute(
+        insert(models.ArchivedCareTeamAssignment.__table__).from_select(
+            ["id", "patient_id", "care_team_member_id", "assigned_date"],
+            select(
+                assignment.c.id, assignment.c.patient_id,
+                assignment.c.care_team_member_id, assignment.c.assigned_date,
+            ).where(assignment.c.patient_id.in_(patient_ids)),
+        )
+    )
+    db.execute(
+        insert(models.ArchivedHealthScreening.__table__).from_select(
+            ["id", "patient_id", "screening_date", "score"],
+            select(
+                screening.c.id, screening.c.patient_id, screening.c.screening_date, screening.c.score,
+            ).where(screening.c.patient_id.in_(patient_ids)),
+        )
+    )
+
+    sync.tombstone_patients(db, patient_ids, seq, reason="archived")
+
+    db.execute(delete(assignment).where(assignment.c.patient_id.in_(patient_ids)))
+    db.execute(delete(screening).where(screening.c.patient_id.in_(patient_ids)))
+    rows = db.execute(delete(patient).where(*discharged).returning(patient.c.id, patient.c.status)).all()
+    counters.apply_deltas(db, {status: -count for status, count in Counter(row.status for row in rows).items()})
+    autocomplete.track_removed(db, [row.id for row in rows])
+    return len(rows)
+
+
+def archive_discharged(db: Session, batch_size: int = 500, on_batch=None) -> int:
+    """Move all discharged patients into the archive tables; returns the number archived"""
+    total = db.query(models.Patient).filter(
+        models.Patient.status == models.PatientStatus.DISCHARGED
+    ).count()
+
+    archived = 0
+    while True:
+        patient_ids = [
+            row.id for row in db.query(models.Patient.id).filter(
+                models.Patient.status == models.PatientStatus.DISCHARGED
+            ).order_by(models.Patient.id).limit(batch_size)
+        ]
+        if not patient_ids:
+            break
+
+        archived += _archive_batch(db, patient_ids)
+        db.commit()
+
+        if on_batch:
+            on_batch(archived, total)
+
+    return archived
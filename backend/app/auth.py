@@ -0,0 +1,28 @@
+"""
+Admin token check for operator-only features.
+
+The API itself is unauthenticated. The /api/admin endpoints (jobs, seeding,
+archival, snapshots, profiles, stats), bulk patient changes and deletes, and
+anything that bypasses normal limits require an
+X-Admin-Token header matching ADMIN_TOKEN. When ADMIN_TOKEN is unset those
+features are disabled.
+"""
+import hmac
+import os
+from fastapi import HTTPException, Request
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+
+def is_admin(request: Request) -> bool:
+    token = request.headers.get(ADMIN_TOKEN_HEADER, "")
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+
+def require_admin(request: Request):
+    """Dependency for admin-only routes"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN is not set)")
+    if not is_admin(request):
+        raise HTTPException(status_code=403, detail="Invalid or missing admin token")
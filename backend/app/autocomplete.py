@@ -0,0 +1,228 @@
+"""
+In-memory prefix index for patient typeahead.
+
+Each patient contributes a few lowercase keys (first name, last name, "first last",
+email, and phone digits) to one sorted array of (key, patient_id) pairs. A lookup
+is a bisect to the first key >= prefix followed by a short scan, so no database
+round trip is needed.
+
+The index is built at startup and kept current by session hooks: patient writes
+are collected on flush and applied once the transaction commits. Set-based
+statements that bypass the ORM call ``track_upserted`` / ``track_removed``. A
+commit's changes are applied as one batch, and only keys that changed are
+touched, so a status-only update leaves the key array alone. Small batches
+edit the array in place. Batches of more than AUTOCOMPLETE_MERGE_KEYS key
+changes build a new array next to the old one and swap it in, so searches
+aren't blocked while it is built.
+
+Every worker process keeps its own index, tagged with the patients generation
+(see app.generations) it reflects. Every AUTOCOMPLETE_REFRESH_SECONDS a search
+checks that generation in the background, and the index is rebuilt only if
+another worker has written patients since.
+"""
+from bisect import bisect_left, insort
+import os
+import re
+import threading
+import time
+from sqlalchemy import event
+from app import generations
+from app.database import RoutingSession, SessionLocal
+from app.models import Patient
+
+AUTOCOMPLETE_REFRESH_SECONDS = float(os.getenv("AUTOCOMPLETE_REFRESH_SECONDS", "60"))
+# Key changes in one commit above which the key array is rebuilt instead of edited
+AUTOCOMPLETE_MERGE_KEYS = int(os.getenv("AUTOCOMPLETE_MERGE_KEYS", "200"))
+
+SUMMARY_FIELDS = ("id", "first_name", "last_name", "email", "phone", "status")
+_PENDING_KEY = "autocomplete_pending"
+
+
+def patient_summary(patient) -> dict:
+    return {field: getattr(patient, field) for field in SUMMARY_FIELDS}
+
+
+def _keys(summary: dict) -> set:
+    first = (summary["first_name"] or "").lower()
+    last = (summary["last_name"] or "").lower()
+    keys = {first, last, f"{first} {last}", (summary["email"] or "").lower()}
+    phone = summary["phone"] or ""
+    keys.add(phone.lower())
+    keys.add(re.sub(r"\D", "", phone))
+    keys.discard("")
+    return keys
+
+
+def normalize_prefix(prefix: str) -> str:
+    prefix = prefix.strip().lower()
+    # Phone lookups match on digits regardless of formatting
+    if re.fullmatch(r"[\d\s().+-]+", prefix):
+        digits = re.sub(r"\D", "", prefix)
+        return digits or prefix
+    return prefix
+
+
+class PrefixIndex:
+    def __init__(self):
+        self._keys = []
+        self._entries = {}
+        # Searches hold _lock; writers also hold _write_lock, which keeps them in
+        # order while a large batch is merged outside _lock
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self.built_at = 0.0
+        self.generation = None
+        self._refreshing = False
+
+    def __len__(self):
+        return len(self._entries)
+
+    def build(self, summaries, generation=None):
+        entries = {s["id"]: s for s in summaries}
+        keys = sorted((key, pid) for pid, s in entries.items() for key in _keys(s))
+        with self._write_lock, self._lock:
+            self._entries = entries
+            self._keys = keys
+            self.generation = generation
+            self.built_at = time.monotonic()
+
+    def apply(self, changes: dict):
+        """Apply {patient_id: summary, or None to remove} as one batch"""
+        with self._write_lock:
+            removed, added = set(), []
+            for patient_id, summary in changes.items():
+                old = self._entries.get(patient_id)
+                old_keys = _keys(old) if old is not None else set()
+                new_keys = _keys(summary) if summary is not None else set()
+                removed.update((key, patient_id) for key in old_keys - new_keys)
+                added.extend((key, patient_id) for key in new_keys - old_keys)
+
+            if len(removed) + len(added) <= AUTOCOMPLETE_MERGE_KEYS:
+                with self._lock:
+                    for entry in removed:
+                        i = bisect_left(self._keys, entry)
+                        if i < len(self._keys) and self._keys[i] == entry:
+                            del self._keys[i]
+                    for entry in added:
+                        insort(self._keys, entry)
+                    self._update_entries(changes)
+                return
+
+            # Only this thread changes the array, so it can be read without _lock
+            keys = [entry for entry in self._keys if entry not in removed] if removed else list(self._keys)
+            # Two sorted runs; the sort merges them in linear time
+            keys.extend(sorted(added))
+            keys.sort()
+            with self._lock:
+                self._keys = keys
+                self._update_entries(changes)
+
+    def _update_entries(self, changes: dict):
+        for patient_id, summary in changes.items():
+            if summary is None:
+                self._entries.pop(patient_id, None)
+            else:
+                self._entries[patient_id] = summary
+
+    def upsert(self, summary: dict):
+        self.apply({summary["id"]: summary})
+
+    def remove(self, patient_id: int):
+        self.apply({patient_id: None})
+
+    def advance(self, generation: int):
+        """Record a patients generation produced by a commit this worker applied"""
+        with self._lock:
+            # Anything in between was written elsewhere; leave the gap for refresh
+            if self.generation is not None and generation == self.generation + 1:
+                self.generation = generation
+
+    def search(self, prefix: str, limit: int = 10) -> list:
+        prefix = normalize_prefix(prefix)
+        if not prefix:
+            return []
+        results = []
+        seen = set()
+        with self._lock:
+            i = bisect_left(self._keys, (prefix,))
+            while i < len(self._keys) and len(results) < limit:
+                key, patient_id = self._keys[i]
+                if not key.startswith(prefix):
+                    break
+                if patient_id not in seen:
+                    seen.add(patient_id)
+                    results.append(self._entries[patient_id])
+                i += 1
+        return results
+
+    def load(self, if_changed: bool = False):
+        """Rebuild the index from the patients table (with if_changed, only if patients changed)"""
+        db = SessionLocal()
+        try:
+            # Read before the rows, so a write in between leaves the index looking stale
+            generation = generations.current(db, "patients")[0]
+            if if_changed and generation == self.generation:
+                self.built_at = time.monotonic()
+                return
+            rows = db.query(*(getattr(Patient, f) for f in SUMMARY_FIELDS)).all()
+            self.build((dict(row._mapping) for row in rows), generation)
+        finally:
+            db.close()
+
+    def refresh_if_stale(self):
+        """Start a background check once the index is older than the refresh interval"""
+        if time.monotonic() - self.built_at < AUTOCOMPLETE_REFRESH_SECONDS or self._refreshing:
+            return
+        self._refreshing = True
+
+        def run():
+            try:
+                self.load(if_changed=True)
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name="autocomplete-refresh", daemon=True).start()
+
+
+index = PrefixIndex()
+
+
+def track_upserted(session, summaries):
+    """Update patients in the index once the session's transaction commits"""
+    pending = session.info.setdefault(_PENDING_KEY, {})
+    for summary in summaries:
+        pending[summary["id"]] = summary
+
+
+def track_removed(session, patient_ids):
+    """Remove patients from the index once the session's transaction commits"""
+    pending = session.info.setdefault(_PENDING_KEY, {})
+    for patient_id in patient_ids:
+        pending[patient_id] = None
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _collect_patient_changes(session, flush_context):
+    pending = session.info.setdefault(_PENDING_KEY, {})
+    for obj in session.new | session.dirty:
+        if isinstance(obj, Patient):
+            pending[obj.id] = patient_summary(obj)
+    for obj in session.deleted:
+        if isinstance(obj, Patient):
+            pending[obj.id] = None
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _apply_patient_changes(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    index.apply(pending)
+    committed, _ = generations.last_commit(session)
+    if "patients" in committed:
+        index.advance(committed["patients"])
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _discard_patient_changes(session):
+    session.info.pop(_PENDING_KEY, None)
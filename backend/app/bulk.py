@@ -0,0 +1,183 @@
+"""
+Set-based bulk operations on patients and care team assignments.
+
+Each operation is a single INSERT, UPDATE ... WHERE or DELETE ... WHERE over the
+rows involved, instead of one load-modify-commit round trip per row. Because the
+statements bypass the ORM, they keep the derived state in step themselves: the
+per-status counters, the autocomplete index, and change sequence values and
+tombstones for delta sync. Callers commit.
+
+Every operation allocates its change sequence value (``sync.next_seq``) before
+anything else. That row lock is the first lock every tracked write takes, so
+writers queue on it, then lock patient rows, then the counters, and rows read
+after it don't change under us until we commit.
+"""
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import insert, update, delete, select, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app import models, counters, autocomplete, sync
+
+# Fields a bulk update may set
+BULK_UPDATE_FIELDS = ("status", "care_program")
+
+
+def _count_statuses(db: Session, conditions) -> dict:
+    """Per-status counts of the matching patients; call it after sync.next_seq"""
+    return dict(
+        db.query(models.Patient.status, func.count(models.Patient.id))
+        .filter(*conditions)
+        .group_by(models.Patient.status)
+        .all()
+    )
+
+
+def update_patients(db: Session, conditions, changes: dict) -> dict:
+    """Apply changes to every patient matching conditions; returns the updated ids"""
+    unknown = set(changes) - set(BULK_UPDATE_FIELDS)
+    if unknown:
+        raise ValueError(f"Fields not allowed in bulk updates: {', '.join(sorted(unknown))}")
+
+    seq = sync.next_seq(db)
+    before = _count_statuses(db, conditions) if "status" in changes else {}
+
+    summary_columns = [getattr(models.Patient, f) for f in autocomplete.SUMMARY_FIELDS]
+    rows = db.execute(
+        update(models.Patient)
+        .where(*conditions)
+        .values(**changes, change_seq=seq, updated_at=datetime.utcnow())
+        .returning(*summary_columns),
+        execution_options={"synchronize_session": False},
+    ).all()
+
+    if "status" in changes:
+        new_status = changes["status"]
+        deltas = Counter()
+        for old_status, count in before.items():
+            if old_status != new_status:
+                deltas[old_status] -= count
+                deltas[new_status] += count
+        counters.apply_deltas(db, deltas)
+    autocomplete.track_upserted(db, [dict(row._mapping) for row in rows])
+
+    return {"ids": [row.id for row in rows], "change_seq": seq}
+
+
+def delete_patients(db: Session, conditions) -> dict:
+    """Delete every patient matching conditions, with their assignments and screenings"""
+    seq = sync.next_seq(db)
+
+    matching = select(models.Patient.id).where(*conditions)
+    tombstones = sync.tombstone_patients(db, matching, seq)
+    # Assignments and screenings go with their patient (ON DELETE CASCADE)
+    rows = db.execute(
+        delete(models.Patient)
+        .where(*conditions)
+        .returning(models.Patient.id, models.Patient.status),
+        execution_options={"synchronize_session": False},
+    ).all()
+
+    counters.apply_deltas(db, {status: -count for status, count in Counter(row.status for row in rows).items()})
+    ids = [row.id for row in rows]
+    autocomplete.track_removed(db, ids)
+
+    return {
+        "ids": ids,
+        "care_team_assignments": tombstones["care_team_assignment"],
+        "health_screenings": tombstones["health_screening"],
+        "change_seq": seq,
+    }
+
+
+def create_patients(db: Session, patients: list) -> dict:
+    """Insert patients whose email isn't registered yet; returns created rows and existing ids by email"""
+    emails = [p["email"] for p in patients]
+    existing = dict(
+        db.query(models.Patient.email, models.Patient.id).filter(models.Patient.email.in_(emails)).all()
+    )
+    new = [p for p in patients if p["email"] not in existing]
+    if not new:
+        return {"created": [], "existing": existing, "change_seq": None}
+
+    seq = sync.next_seq(db)
+    now = datetime.utcnow()
+    created = db.execute(
+        insert(models.Patient).returning(models.Patient, sort_by_parameter_order=True),
+        [{**p, "change_seq": seq, "updated_at": now} for p in new],
+    ).scalars().all()
+
+    counters.apply_deltas(db, Counter(patient.status for patient in created))
+    autocomplete.track_upserted(db, [autocomplete.patient_summary(patient) for patient in created])
+    return {"created": created, "existing": existing, "change_seq": seq}
+
+
+def _assignment_state(db: Session, pairs: list) -> tuple:
+    """Existing patient ids, existing member ids and {(patient_id, member_id): [assignment ids]}"""
+    patient_ids = {patient_id for patient_id, _ in pairs}
+    member_ids = {member_id for _, member_id in pairs}
+    patients = {row.id for row in db.query(models.Patient.id).filter(models.Patient.id.in_(patient_ids))}
+    members = {
+        row.id for row in db.query(models.CareTeamMember.id).filter(models.CareTeamMember.id.in_(member_ids))
+    }
+    existing = {}
+    for row in db.query(
+        models.CareTeamAssignment.id, models.CareTeamAssignment.patient_id,
+        models.CareTeamAssignment.care_team_member_id,
+    ).filter(
+        models.CareTeamAssignment.patient_id.in_(patient_ids),
+        models.CareTeamAssignment.care_team_member_id.in_(member_ids),
+    ).order_by(models.CareTeamAssignment.id):
+        existing.setdefault((row.patient_id, row.care_team_member_id), []).append(row.id)
+    return patients, members, existing
+
+
+def insert_assignments(db: Session, rows: list) -> list:
+    """Insert assignment rows, skipping pairs that are already assigned; returns the inserted rows"""
+    assignment = models.CareTeamAssignment.__table__
+    dialect_insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    # The unique index decides; pairs it skips were assigned by a concurrent request
+    return db.execute(
+        dialect_insert(assignment)
+        .on_conflict_do_nothing(index_elements=[assignment.c.patient_id, assignment.c.care_team_member_id])
+        .returning(*assignment.c),
+        rows,
+    ).all()
+
+
+def assign_care_team(db: Session, pairs: list, assigned_date) -> dict:
+    """Assign each (patient_id, member_id) pair that isn't assigned yet"""
+    seq = sync.next_seq(db)
+    patients, members, existing = _assignment_state(db, pairs)
+    new = [
+        (patient_id, member_id) for patient_id, member_id in pairs
+        if patient_id in patients and member_id in members and (patient_id, member_id) not in existing
+    ]
+    created = []
+    if new:
+        now = datetime.utcnow()
+        created = insert_assignments(db, [
+            {
+                "patient_id": patient_id, "care_team_member_id": member_id, "assigned_date": assigned_date,
+                "change_seq": seq, "updated_at": now,
+            }
+            for patient_id, member_id in new
+        ])
+        if len(created) < len(new):
+            existing = _assignment_state(db, pairs)[2]
+    return {"created": created, "patients": patients, "members": members, "existing": existing, "change_seq": seq}
+
+
+def unassign_care_team(db: Session, pairs: list) -> dict:
+    """Delete the assignments of each (patient_id, member_id) pair, leaving tombstones"""
+    seq = sync.next_seq(db)
+    patients, members, existing = _assignment_state(db, pairs)
+    deleted = {pair: existing[pair] for pair in pairs if pair in existing}
+    ids = [assignment_id for assignment_ids in deleted.values() for assignment_id in assignment_ids]
+    if ids:
+        sync.tombstone_assignments(db, ids, seq)
+        db.execute(
+            delete(models.CareTeamAssignment).where(models.CareTeamAssignment.id.in_(ids)),
+            execution_options={"synchronize_session": False},
+        )
+    return {"deleted": deleted, "patients": patients, "members": members, "change_seq": seq}
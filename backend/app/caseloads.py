@@ -0,0 +1,157 @@
+"""
+Care team caseloads and load-balanced assignment recommendations.
+
+Each worker caches the number of patients assigned to every care team member,
+tagged with the care_team_assignments and care_team_members generations (see
+app.generations). ORM assignment changes committed through this worker are
+applied to the cache directly. Changes from other workers or set-based
+statements move the generations past the tag, and the next read reloads the
+counts with one GROUP BY.
+
+Recommendations keep a min-heap of (caseload, member_id) per role. Each pick
+pops the least-loaded member who isn't already on the patient's team, then
+pushes it back with caseload + 1. A batch therefore spreads patients across
+members, instead of sending all of them to whoever was least loaded at the start.
+"""
+from collections import Counter, defaultdict
+import heapq
+import threading
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+from app import generations
+from app.database import RoutingSession
+from app.models import CareTeamAssignment, CareTeamMember, CareTeamRole
+
+_TABLES = ("care_team_assignments", "care_team_members")
+_PENDING_KEY = "caseloads_pending"
+
+
+class Caseloads:
+    def __init__(self):
+        self.counts = {}
+        self.roles = {}
+        self.generation = None
+        self._lock = threading.Lock()
+
+    def load(self, db: Session, generation: tuple):
+        roles = dict(db.query(CareTeamMember.id, CareTeamMember.role).all())
+        counts = dict(
+            db.query(CareTeamAssignment.care_team_member_id, func.count(CareTeamAssignment.id))
+            .group_by(CareTeamAssignment.care_team_member_id)
+            .all()
+        )
+        with self._lock:
+            self.roles = roles
+            self.counts = {member_id: counts.get(member_id, 0) for member_id in roles}
+            self.generation = generation
+
+    def ensure_current(self, db: Session):
+        generation = generations.current(db, *_TABLES)
+        if generation != self.generation:
+            self.load(db, generation)
+
+    def apply(self, deltas: Counter, committed: dict):
+        """Apply this worker's committed changes if nothing else happened in between"""
+        with self._lock:
+            if self.generation is None:
+                return
+            assignments, members = self.generation
+            if committed.get("care_team_members", members) != members:
+                self.generation = None
+                return
+            if committed.get("care_team_assignments") != assignments + 1:
+                # Another transaction committed in between; reload on next read
+                self.generation = None
+                return
+            for member_id, delta in deltas.items():
+                if member_id in self.counts:
+                    self.counts[member_id] += delta
+            self.generation = (assignments + 1, members)
+
+    def heaps(self, roles=None) -> dict:
+        """A min-heap of (caseload, member_id) per role"""
+        with self._lock:
+            heaps = defaultdict(list)
+            for member_id, role in self.roles.items():
+                if roles is None or role in roles:
+                    heaps[role].append((self.counts.get(member_id, 0), member_id))
+        for heap in heaps.values():
+            heapq.heapify(heap)
+        return heaps
+
+
+caseloads = Caseloads()
+
+
+def _pick(heap: list, exclude: set):
+    """Pop the least-loaded member not in exclude, count the new patient, push it back"""
+    skipped = []
+    picked = None
+    while heap:
+        entry = heapq.heappop(heap)
+        if entry[1] not in exclude:
+            picked = entry
+            break
+        skipped.append(entry)
+    for entry in skipped:
+        heapq.heappush(heap, entry)
+    if picked is None:
+        return None
+    heapq.heappush(heap, (picked[0] + 1, picked[1]))
+    return picked
+
+
+def recommend(db: Session, current_members: list, roles=None, only_missing: bool = False) -> list:
+    """
+    Balanced picks for a batch of patients.
+
+    current_members has one set of already-assigned member ids per patient. With
+    only_missing, roles a patient already has a member for are skipped. Returns,
+    per patient, a list of (role, member_id, caseload) with one entry for each
+    role that has an eligible member. caseload includes the picks made earlier in
+    the batch.
+    """
+    caseloads.ensure_current(db)
+    heaps = caseloads.heaps(set(roles) if roles else None)
+    ordered_roles = [role for role in CareTeamRole if role in heaps]
+    results = []
+    for exclude in current_members:
+        held = {caseloads.roles.get(member_id) for member_id in exclude} if only_missing else set()
+        picks = []
+        for role in ordered_roles:
+            if role in held:
+                continue
+            picked = _pick(heaps[role], exclude)
+            if picked is not None:
+                picks.append((role, picked[1], picked[0]))
+        results.append(picks)
+    return results
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _collect_assignment_changes(session, flush_context):
+    pending = session.info.setdefault(_PENDING_KEY, Counter())
+    for obj in session.new:
+        if isinstance(obj, CareTeamAssignment):
+            pending[obj.care_team_member_id] += 1
+    for obj in session.deleted:
+        if isinstance(obj, CareTeamAssignment):
+            pending[obj.care_team_member_id] -= 1
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _apply_assignment_changes(session):
+    deltas = session.info.pop(_PENDING_KEY, None)
+    committed, statement_tables = generations.last_commit(session)
+    if "care_team_assignments" not in committed and "care_team_members" not in committed:
+        return
+    if statement_tables & set(_TABLES):
+        # Changed by statements we can't replay; reload on next read
+        caseloads.generation = None
+        return
+    caseloads.apply(deltas or Counter(), committed)
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _discard_assignment_changes(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,197 @@
+"""
+Response compression middleware (brotli or gzip) with a size threshold and a
+content-type allowlist.
+
+Complete responses are compressed in one pass when they reach
+COMPRESSION_MINIMUM_SIZE. Streaming responses are compressed incrementally, and
+small chunks are buffered inside the compressor instead of being flushed one by
+one. That way a stream of tiny writes doesn't end up larger than the original.
+Types outside the allowlist, such as event streams, pass through untouched.
+"""
+import os
+import zlib
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+COMPRESSION_CONTENT_TYPES = [
+    t.strip() for t in os.getenv(
+        "COMPRESSION_CONTENT_TYPES",
+        "application/json,text/html,text/plain,text/css,text/csv,application/javascript",
+    ).split(",") if t.strip()
+]
+
+
+def _accepted_encodings(accept_encoding: str) -> set:
+    accepted = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if name:
+            accepted.add(name.lower())
+    return accepted
+
+
+def choose_encoding(accept_encoding: str):
+    """Pick brotli when available and accepted, else gzip, else None"""
+    accepted = _accepted_encodings(accept_encoding)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+class _GzipStream:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliStream:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+def compress(data: bytes, encoding: str, gzip_level: int = None, brotli_quality: int = None) -> bytes:
+    """Compress a complete body with the given encoding"""
+    if encoding == "br":
+        quality = COMPRESSION_BROTLI_QUALITY if brotli_quality is None else brotli_quality
+        return brotli.compress(data, quality=quality)
+    level = COMPRESSION_GZIP_LEVEL if gzip_level is None else gzip_level
+    stream = _GzipStream(level)
+    return stream.compress(data) + stream.finish()
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app,
+        minimum_size: int = COMPRESSION_MINIMUM_SIZE,
+        content_types: list = None,
+        gzip_level: int = COMPRESSION_GZIP_LEVEL,
+        brotli_quality: int = COMPRESSION_BROTLI_QUALITY,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.content_types = content_types or COMPRESSION_CONTENT_TYPES
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.start_message = None
+        self.mode = None  # "identity" or "stream", decided on the first body chunk
+        self.stream = None
+        self.pending = 0
+
+    def _compressible(self, headers: Headers) -> bool:
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        return content_type in self.middleware.content_types
+
+    def _new_stream(self):
+        if self.encoding == "br":
+            return _BrotliStream(self.middleware.brotli_quality)
+        return _GzipStream(self.middleware.gzip_level)
+
+    def _mark_encoded(self, headers: MutableHeaders):
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            # Hold the headers until we know whether the body will be compressed
+            self.start_message = message
+            return
+
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.mode is None:
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            if not self._compressible(headers):
+                self.mode = "identity"
+            elif not more_body:
+                if len(body) < self.middleware.minimum_size:
+                    self.mode = "identity"
+                else:
+                    body = compress(body, self.encoding, self.middleware.gzip_level, self.middleware.brotli_quality)
+                    self._mark_encoded(headers)
+                    headers["Content-Length"] = str(len(body))
+                    await self._send(self.start_message)
+                    await self._send({"type": "http.response.body", "body": body})
+                    return
+            else:
+                self.mode = "stream"
+                self.stream = self._new_stream()
+                self._mark_encoded(headers)
+                if "content-length" in headers:
+                    del headers["Content-Length"]
+            await self._send(self.start_message)
+
+        if self.mode == "identity":
+            await self._send(message)
+            return
+
+        # Streaming: coalesce small chunks and only flush once enough input has accumulated
+        chunk = self.stream.compress(body)
+        self.pending += len(body)
+        if not more_body:
+            chunk += self.stream.finish()
+        elif self.pending >= self.middleware.minimum_size:
+            chunk += self.stream.flush()
+            self.pending = 0
+        if chunk or not more_body:
+            await self._send({"type": "http.response.body", "body": chunk, "more_body": more_body})
@@ -0,0 +1,119 @@
+"""
+Per-status patient counters for O(1) counts.
+
+The ``patient_counts`` table holds one row per PatientStatus. ORM writes to
+Patient (create, status change, delete) adjust the counters in a before_flush
+hook, so the counters commit or roll back with the write that changed them.
+Set-based statements that bypass the ORM call ``apply_deltas`` themselves.
+``reconcile`` recomputes the counters from the patients table and reports drift.
+
+Broad searches (very short terms) use ``capped_count``, which stops counting
+after COUNT_CAP matches and reports the result as inexact.
+"""
+from collections import Counter
+import os
+from sqlalchemy import event, func, inspect, update, insert, select
+from sqlalchemy.orm import Session, Query
+from app.database import RoutingSession
+from app.models import Patient, PatientCount, PatientStatus
+
+# Searches of this many characters or fewer are counted approximately
+APPROX_SEARCH_MAX_LENGTH = int(os.getenv("COUNT_APPROX_MAX_SEARCH_LENGTH", "2"))
+# Stop counting after this many matches and report "COUNT_CAP+"
+COUNT_CAP = int(os.getenv("COUNT_CAP", "1000"))
+
+
+def _status_deltas(session: Session) -> Counter:
+    deltas = Counter()
+    for obj in session.new:
+        if isinstance(obj, Patient):
+            deltas[obj.status or PatientStatus.ACTIVE] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Patient):
+            history = inspect(obj).attrs.status.history
+            deltas[history.deleted[0] if history.deleted else obj.status] -= 1
+    for obj in session.dirty:
+        if isinstance(obj, Patient) and obj not in session.deleted:
+            history = inspect(obj).attrs.status.history
+            if history.added and history.deleted and history.added[0] != history.deleted[0]:
+                deltas[history.deleted[0]] -= 1
+                deltas[history.added[0]] += 1
+    return deltas
+
+
+def apply_deltas(session: Session, deltas: dict):
+    """Add per-status deltas to the counters inside the session's transaction"""
+    table = PatientCount.__table__
+    for status, delta in deltas.items():
+        if not delta:
+            continue
+        status = PatientStatus(status)
+        result = session.execute(
+            update(table).where(table.c.status == status).values(count=table.c.count + delta)
+        )
+        if result.rowcount == 0:
+            session.execute(insert(table).values(status=status, count=delta))
+
+
+@event.listens_for(RoutingSession, "before_flush")
+def _track_patient_counts(session, flush_context, instances):
+    deltas = _status_deltas(session)
+    if deltas:
+        apply_deltas(session, deltas)
+
+
+def get_count(session: Session, status: PatientStatus = None) -> int:
+    """Read the maintained count for one status, or the total across statuses"""
+    query = session.query(func.coalesce(func.sum(PatientCount.count), 0))
+    if status:
+        query = query.filter(PatientCount.status == status)
+    return query.scalar()
+
+
+def _planner_estimate(session: Session, query: Query):
+    """Row estimate from the PostgreSQL planner, or None on other databases"""
+    bind = session.get_bind()
+    if bind.dialect.name != "postgresql":
+        return None
+    compiled = query.statement.compile(dialect=bind.dialect)
+    plan = session.connection().exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params
+    ).scalar()
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def capped_count(session: Session, query: Query, cap: int = COUNT_CAP) -> dict:
+    """Count at most cap + 1 matching rows; past the cap, return cap and mark it inexact"""
+    limited = query.with_entities(Patient.id).limit(cap + 1).subquery()
+    count = session.execute(select(func.count()).select_from(limited)).scalar()
+    if count <= cap:
+        return {"count": count, "exact": True}
+    return {"count": cap, "exact": False, "estimate": _planner_estimate(session, query)}
+
+
+def reconcile(session: Session) -> dict:
+    """Recompute counters from the patients table; returns {status: drift} for mismatches"""
+    # Lock the counter rows so concurrent writers queue behind the recount
+    stored = {
+        row.status: row.count
+        for row in session.query(PatientCount).with_for_update()
+    }
+    actual = dict(
+        session.query(Patient.status, func.count(Patient.id)).group_by(Patient.status).all()
+    )
+
+    drift = {}
+    for status in PatientStatus:
+        expected = actual.get(status, 0)
+        current = stored.get(status)
+        if current == expected:
+            continue
+        drift[status.value] = expected - (current or 0)
+        if current is None:
+            session.add(PatientCount(status=status, count=expected))
+        else:
+            session.query(PatientCount).filter(PatientCount.status == status).update(
+                {PatientCount.count: expected}, synchronize_session=False
+            )
+    session.commit()
+    return drift
@@ -1,23 +1,172 @@
-from sqlalchemy import create_engine
+from contextvars import ContextVar
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
+from fastapi import Request
+import itertools
 import os
+import threading
+import time
 
 # Use PostgreSQL on Railway, SQLite locally
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./patient_care.db")
 
-# Convert Railway's postgres:// to postgresql:// for SQLAlchemy
-if DATABASE_URL.startswith("postgres://"):
-    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+# Optional comma-separated read replicas, e.g. two SQLite files or two local Postgres instances
+DATABASE_REPLICA_URLS = [
+    url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+]
 
-if DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(
-        DATABASE_URL, connect_args={"check_same_thread": False}
+# How long a replica stays out of rotation after a connection failure
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+# How often a replica is probed before being handed out again
+REPLICA_HEALTH_INTERVAL = float(os.getenv("REPLICA_HEALTH_INTERVAL", "10"))
+# How long a client's reads stay on the primary after it writes (read-your-writes)
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+
+READ_PRIMARY_HEADER = "X-Read-Primary"
+READ_PRIMARY_COOKIE = "read_primary_until"
+# Sent after a write: how many seconds the client should send READ_PRIMARY_HEADER
+READ_PRIMARY_FOR_HEADER = "X-Read-Primary-For"
+_WROTE_KEY = "request_wrote"
+
+# Set by watch_writes for the current request; commits that wrote mark it
+_request_writes = ContextVar("request_writes", default=None)
+
+
+def _normalize_url(url: str) -> str:
+    # Convert Railway's postgres:// to postgresql:// for SQLAlchemy
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql://", 1)
+    return url
+
+
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite ignores foreign keys (and ON DELETE CASCADE) unless enabled per connection
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def _make_engine(url: str, **kwargs):
+    if url.startswith("sqlite"):
+        sqlite_engine = create_engine(url, connect_args={"check_same_thread": False}, **kwargs)
+        event.listen(sqlite_engine, "connect", _enable_sqlite_foreign_keys)
+        return sqlite_engine
+    # Keep the pool in line with THREADPOOL_SIZE so sync routes don't queue on connections
+    return create_engine(
+        url,
+        pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        **kwargs,
     )
-else:
-    engine = create_engine(DATABASE_URL)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+DATABASE_URL = _normalize_url(DATABASE_URL)
+engine = _make_engine(DATABASE_URL)
+
+
+class ReplicaRouter:
+    """Round-robin over replica engines, skipping replicas that recently failed"""
+
+    def __init__(self, engines):
+        self.engines = engines
+        self._cycle = itertools.cycle(range(len(engines))) if engines else None
+        self._lock = threading.Lock()
+        self._down_until = {}
+        self._checked_at = {}
+
+    def mark_down(self, replica):
+        self._down_until[replica] = time.monotonic() + REPLICA_RETRY_SECONDS
+
+    def _healthy(self, replica) -> bool:
+        now = time.monotonic()
+        if self._down_until.get(replica, 0) > now:
+            return False
+        if now - self._checked_at.get(replica, 0) < REPLICA_HEALTH_INTERVAL:
+            return True
+        try:
+            with replica.connect():
+                pass
+        except Exception:
+            self.mark_down(replica)
+            return False
+        self._checked_at[replica] = now
+        return True
+
+    def pick(self):
+        """Return the next healthy replica, or None to fall back to the primary"""
+        if not self.engines:
+            return None
+        with self._lock:
+            order = [next(self._cycle) for _ in self.engines]
+        for index in order:
+            replica = self.engines[index]
+            if self._healthy(replica):
+                return replica
+        return None
+
+
+replica_engines = [
+    _make_engine(_normalize_url(url), pool_pre_ping=True) for url in DATABASE_REPLICA_URLS
+]
+replica_router = ReplicaRouter(replica_engines)
+
+
+def _on_replica_error(context):
+    # Take a replica out of rotation when its connection drops or cannot be opened
+    if context.is_disconnect or context.connection is None:
+        replica_router.mark_down(context.engine)
+
+
+for _replica in replica_engines:
+    event.listen(_replica, "handle_error", _on_replica_error)
+
+
+class RoutingSession(Session):
+    """Session that sends reads to a replica when marked read-only, everything else to the primary"""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if not self.info.get("read_only") or self._flushing:
+            return engine
+        # Pin one replica per session so a request sees a consistent snapshot
+        if "replica" not in self.info:
+            self.info["replica"] = replica_router.pick() or engine
+        return self.info["replica"]
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _note_flush(session, flush_context):
+    if session.new or session.deleted or any(session.is_modified(obj) for obj in session.dirty):
+        session.info[_WROTE_KEY] = True
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _note_statement(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info[_WROTE_KEY] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _record_write(session):
+    record = _request_writes.get()
+    if session.info.pop(_WROTE_KEY, False) and record is not None:
+        record["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _discard_write(session):
+    session.info.pop(_WROTE_KEY, None)
+
+
+def watch_writes() -> dict:
+    """Record whether the current request commits a write; returns {"wrote": bool}"""
+    # A mutable record, so commits in threadpool copies of the context still reach it
+    record = {"wrote": False}
+    _request_writes.set(record)
+    return record
+
+
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
@@ -28,3 +177,23 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def wants_primary(request: Request) -> bool:
+    """True if the client asked for primary reads or wrote within the sticky window"""
+    if request.headers.get(READ_PRIMARY_HEADER, "").lower() in ("1", "true"):
+        return True
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def get_read_db(request: Request):
+    """Session for read-only routes; routed to a replica when one is configured"""
+    db = SessionLocal()
+    db.info["read_only"] = bool(replica_engines) and not wants_primary(request)
+    try:
+        yield db
+    finally:
+        db.close()
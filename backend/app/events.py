@@ -0,0 +1,207 @@
+"""
+Change feed pub/sub.
+
+Mutating routes publish change events ({entity, id, op, version, ...}) after
+their transaction commits. Server-sent event streams subscribe to them. The broker
+is pluggable through CHANGE_FEED_BROKER:
+
+  - ``memory`` (default): in-process fan-out. Fine for a single worker and for
+    local development.
+  - ``postgres``: fan-out across worker processes with PostgreSQL
+    LISTEN/NOTIFY. Each worker relays notifications to its local subscribers.
+  - ``package.module:ClassName``: any Broker subclass, e.g. a stand-in for an
+    external broker.
+
+Event versions are the rows' ``change_seq`` values (see app.sync), so an event id
+can also be used as ``since_seq`` for /api/sync/changes. Each broker keeps a
+short replay buffer, so a reconnecting client that sends Last-Event-ID receives
+the events it missed.
+"""
+import asyncio
+from collections import deque
+import importlib
+import itertools
+import json
+import logging
+import os
+import select
+import threading
+
+logger = logging.getLogger(__name__)
+
+CHANGE_FEED_BROKER = os.getenv("CHANGE_FEED_BROKER", "memory")
+CHANGE_FEED_REPLAY = int(os.getenv("CHANGE_FEED_REPLAY", "1000"))
+CHANGE_FEED_QUEUE_SIZE = int(os.getenv("CHANGE_FEED_QUEUE_SIZE", "1000"))
+
+PG_CHANNEL = "change_feed"
+# NOTIFY payloads are limited to 8000 bytes; larger events are sent without data
+PG_MAX_PAYLOAD = 7900
+
+
+class Subscription:
+    """A subscriber's queue, bound to the event loop it was created on"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=CHANGE_FEED_QUEUE_SIZE)
+        self.overflowed = False
+
+    def offer(self, event: dict):
+        # Runs on the subscriber's loop
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow consumer: tell it to resync instead of silently dropping events
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"op": "resync"})
+
+
+class Broker:
+    """In-process fan-out with a replay buffer; subclasses change how events travel"""
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=CHANGE_FEED_REPLAY)
+        self._sequence = itertools.count(1)
+
+    def publish(self, event: dict):
+        self.deliver(event)
+
+    def deliver(self, event: dict):
+        """Hand an event to every local subscriber"""
+        with self._lock:
+            event.setdefault("version", next(self._sequence))
+            self._recent.append(event)
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            try:
+                sub.loop.call_soon_threadsafe(sub.offer, event)
+            except RuntimeError:
+                # Subscriber's loop already closed
+                self.unsubscribe(sub)
+
+    def subscribe(self) -> Subscription:
+        sub = Subscription(asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def replay_since(self, version: int):
+        """Events newer than version, or None if the buffer no longer reaches back that far"""
+        with self._lock:
+            recent = list(self._recent)
+        # Versions have gaps (not every change is published), so only a full
+        # buffer that starts after the requested version means events were lost
+        if len(recent) == self._recent.maxlen and recent[0]["version"] > version:
+            return None
+        return [e for e in recent if e["version"] > version]
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+
+class PostgresNotifyBroker(Broker):
+    """Fan-out across processes through PostgreSQL LISTEN/NOTIFY"""
+
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    def publish(self, event: dict):
+        from app.database import engine
+
+        payload = json.dumps(event, default=str)
+        if len(payload) > PG_MAX_PAYLOAD:
+            payload = json.dumps({k: v for k, v in event.items() if k != "data"}, default=str)
+        with engine.begin() as conn:
+            conn.exec_driver_sql("SELECT pg_notify(%s, %s)", (PG_CHANNEL, payload))
+
+    def subscribe(self) -> Subscription:
+        self._ensure_listener()
+        return super().subscribe()
+
+    def _ensure_listener(self):
+        # Started lazily in each worker (never in a pre-fork master)
+        with self._listener_lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name="change-feed-listener", daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        from app.database import engine
+
+        raw = engine.raw_connection()
+        try:
+            conn = raw.driver_connection
+            conn.autocommit = True
+            conn.cursor().execute(f"LISTEN {PG_CHANNEL}")
+            while True:
+                if select.select([conn], [], [], 30) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    try:
+                        self.deliver(json.loads(notify.payload))
+                    except ValueError:
+                        logger.warning("Ignoring malformed change feed payload")
+        except Exception:
+            logger.exception("Change feed listener stopped")
+        finally:
+            raw.close()
+
+
+def _make_broker(name: str) -> Broker:
+    if name == "memory":
+        return Broker()
+    if name == "postgres":
+        return PostgresNotifyBroker()
+    module_name, _, class_name = name.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+broker = _make_broker(CHANGE_FEED_BROKER)
+
+
+def set_broker(new_broker: Broker):
+    """Swap the broker (e.g. for a local stand-in in tests or scripts)"""
+    global broker
+    broker = new_broker
+
+
+def format_sse(event: dict) -> str:
+    """Encode an event as a server-sent event frame"""
+    lines = []
+    if "version" in event:
+        lines.append(f"id: {event['version']}")
+    lines.append(f"event: {'resync' if event.get('op') == 'resync' else 'change'}")
+    lines.append(f"data: {json.dumps(event, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def publish_change(entity: str, entity_id: int, op: str, data: dict = None, patient_id: int = None,
+                   version: int = None):
+    """Publish a change event; call after the transaction has committed"""
+    event = {"entity": entity, "id": entity_id, "op": op}
+    if version is not None:
+        event["version"] = version
+    if patient_id is not None:
+        event["patient_id"] = patient_id
+    if data is not None:
+        event["data"] = data
+    try:
+        broker.publish(event)
+    except Exception:
+        # The write already committed; a lost event only means clients refetch
+        logger.exception("Failed to publish change event")
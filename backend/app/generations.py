@@ -0,0 +1,113 @@
+"""
+Table generation counters for cache invalidation.
+
+``table_generations`` holds one counter per tracked table. A transaction that
+writes to a tracked table increments the table's counter before it commits
+(once per transaction). A cache entry tagged with the generations it was built
+from is current exactly while those counters are unchanged. Checking that is
+one primary-key read, and it holds across worker processes. Unlike comparing
+max(change_seq), it can't miss a transaction that took an older sequence value
+but committed later.
+
+ORM flushes are tracked in a before_flush hook. Statements run through
+``Session.execute`` (bulk updates and deletes, archival) are tracked in a
+do_orm_execute hook. A patient delete also bumps the tables it cascades to.
+
+After a commit, ``last_commit`` reports the generations the transaction
+produced and which tables set-based statements touched. Per-worker caches use
+that to apply their own changes incrementally rather than reloading.
+"""
+from sqlalchemy import event, update, select, insert
+from sqlalchemy.orm import Session
+from app.database import RoutingSession
+from app.models import TableGeneration
+
+TRACKED_TABLES = ("patients", "care_team_members", "care_team_assignments", "health_screenings")
+# Deleting from a table also deletes from these (ON DELETE CASCADE)
+_CASCADES = {"patients": ("care_team_assignments", "health_screenings")}
+_BUMPED_KEY = "generations_bumped"
+_STATEMENT_KEY = "generations_statement_tables"
+_COMMITTED_KEY = "generations_committed"
+
+
+def bump(session: Session, names):
+    """Increment the generations of the named tables in the session's transaction"""
+    bumped = session.info.setdefault(_BUMPED_KEY, {})
+    names = sorted(set(names) - set(bumped))
+    if not names:
+        return
+    # Connection-level execution, so do_orm_execute doesn't see our own statements
+    conn = session.connection()
+    table = TableGeneration.__table__
+    rows = conn.execute(
+        update(table)
+        .where(table.c.name.in_(names))
+        .values(generation=table.c.generation + 1)
+        .returning(table.c.name, table.c.generation)
+    ).all()
+    bumped.update(rows)
+    for name in names:
+        if name not in bumped:
+            conn.execute(insert(table).values(name=name, generation=1))
+            bumped[name] = 1
+
+
+def current(session: Session, *names) -> tuple:
+    """Generations of the named tables, in the order given"""
+    table = TableGeneration.__table__
+    rows = dict(session.execute(
+        select(table.c.name, table.c.generation).where(table.c.name.in_(names))
+    ).all())
+    return tuple(rows.get(name, 0) for name in names)
+
+
+def _written_tables(objects, deleted: bool) -> set:
+    names = set()
+    for obj in objects:
+        name = getattr(obj, "__tablename__", None)
+        if name in TRACKED_TABLES:
+            names.add(name)
+            if deleted:
+                names.update(_CASCADES.get(name, ()))
+    return names
+
+
+@event.listens_for(RoutingSession, "before_flush")
+def _track_flush(session, flush_context, instances):
+    names = _written_tables(session.new, False)
+    names |= _written_tables((obj for obj in session.dirty if session.is_modified(obj)), False)
+    names |= _written_tables(session.deleted, True)
+    if names:
+        bump(session, names)
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _track_statement(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    name = getattr(getattr(orm_execute_state.statement, "table", None), "name", None)
+    if name in TRACKED_TABLES:
+        names = {name}
+        if orm_execute_state.is_delete:
+            names.update(_CASCADES.get(name, ()))
+        orm_execute_state.session.info.setdefault(_STATEMENT_KEY, set()).update(names)
+        bump(orm_execute_state.session, names)
+
+
+def last_commit(session: Session) -> tuple:
+    """({table: generation} written by the last commit, tables changed by set-based statements)"""
+    return session.info.get(_COMMITTED_KEY, ({}, set()))
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _record_commit(session):
+    session.info[_COMMITTED_KEY] = (
+        session.info.pop(_BUMPED_KEY, {}),
+        session.info.pop(_STATEMENT_KEY, set()),
+    )
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _reset(session):
+    session.info.pop(_BUMPED_KEY, None)
+    session.info.pop(_STATEMENT_KEY, None)
@@ -0,0 +1,214 @@
+"""
+Idempotency keys for POST requests.
+
+A client that may retry a POST (after a timeout, say) sends an Idempotency-Key
+header with a unique value, and the same value on every retry. The first request
+claims the key by inserting a row into ``idempotency_keys`` and runs normally.
+Its response (status, headers and body) is stored in that row before the last
+byte is sent. A retry with the same key gets the stored response, marked with
+``Idempotent-Replayed: true``, and the route doesn't run again:
+
+- Same key while the first request is still running: 409 with Retry-After.
+- Same key with a different method, path, query or body: 422.
+- 5xx and 409 (transient conflict) responses, and responses over
+  IDEMPOTENCY_MAX_RESPONSE_BYTES, are not stored. The key is released, so a
+  retry runs the request again.
+
+Keys are scoped per client (see app.admission.client_key), so one client can't
+replay another's responses. They expire after IDEMPOTENCY_TTL_SECONDS. A key
+left claimed by a crashed worker can be taken over after
+IDEMPOTENCY_LOCK_SECONDS. Expired rows are purged by whichever request notices
+that IDEMPOTENCY_PURGE_INTERVAL has passed.
+
+The middleware runs inside compression, so stored bodies are uncompressed and
+each replay is encoded for the retrying client.
+"""
+from datetime import datetime, timedelta
+import hashlib
+import os
+import time
+from anyio import to_thread
+from sqlalchemy import select, insert, update, delete
+from sqlalchemy.exc import IntegrityError
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from app.admission import client_key
+from app.database import engine
+from app.models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "idempotency-key"
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60"))
+IDEMPOTENCY_MAX_RESPONSE_BYTES = int(os.getenv("IDEMPOTENCY_MAX_RESPONSE_BYTES", str(1024 * 1024)))
+IDEMPOTENCY_PURGE_INTERVAL = int(os.getenv("IDEMPOTENCY_PURGE_INTERVAL", "300"))
+_MAX_KEY_LENGTH = 255
+
+_table = IdempotencyKey.__table__
+_last_purge = 0.0
+
+
+def _sha256(*parts: bytes) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _purge_expired(conn, now: datetime):
+    global _last_purge
+    if time.monotonic() - _last_purge < IDEMPOTENCY_PURGE_INTERVAL:
+        return
+    _last_purge = time.monotonic()
+    conn.execute(delete(_table).where(_table.c.expires_at < now))
+
+
+def claim(key: str, request_hash: str):
+    """('claimed', None), ('replay', row), ('in_progress', None) or ('mismatch', None)"""
+    for _ in range(3):
+        now = datetime.utcnow()
+        try:
+            with engine.begin() as conn:
+                _purge_expired(conn, now)
+                conn.execute(insert(_table).values(
+                    key=key, request_hash=request_hash, created_at=now,
+                    expires_at=now + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS),
+                ))
+            return "claimed", None
+        except IntegrityError:
+            pass
+
+        with engine.begin() as conn:
+            row = conn.execute(select(_table).where(_table.c.key == key)).first()
+            if row is None:
+                continue
+            abandoned = row.status_code is None and row.created_at < now - timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS)
+            if row.expires_at < now or abandoned:
+                # Only delete the row we looked at, not one another request just claimed
+                conn.execute(delete(_table).where(
+                    _table.c.key == key, _table.c.created_at == row.created_at
+                ))
+                continue
+        if row.request_hash != request_hash:
+            return "mismatch", None
+        if row.status_code is None:
+            return "in_progress", None
+        return "replay", row
+    return "in_progress", None
+
+
+def store(key: str, status_code: int, headers: list, body: bytes):
+    with engine.begin() as conn:
+        conn.execute(
+            update(_table).where(_table.c.key == key)
+            .values(status_code=status_code, headers=headers, body=body)
+        )
+
+
+def release(key: str):
+    with engine.begin() as conn:
+        conn.execute(delete(_table).where(_table.c.key == key, _table.c.status_code.is_(None)))
+
+
+def _storable(status_code: int) -> bool:
+    # Conflicts and server errors are worth retrying for real
+    return status_code < 500 and status_code != 409
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+
+def _replay_receive(body: bytes, receive):
+    sent = False
+
+    async def wrapped():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+    return wrapped
+
+
+class IdempotencyMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+        idempotency_key = Headers(scope=scope).get(IDEMPOTENCY_HEADER)
+        if idempotency_key is None:
+            await self.app(scope, receive, send)
+            return
+        if not idempotency_key or len(idempotency_key) > _MAX_KEY_LENGTH:
+            response = JSONResponse({"detail": f"Idempotency-Key must be 1-{_MAX_KEY_LENGTH} characters"}, 400)
+            await response(scope, receive, send)
+            return
+
+        body = await _read_body(receive)
+        key = _sha256(client_key(scope).encode(), idempotency_key.encode())
+        request_hash = _sha256(
+            scope["method"].encode(), scope["path"].encode(), scope.get("query_string", b""), body
+        )
+        outcome, row = await to_thread.run_sync(claim, key, request_hash)
+
+        if outcome == "replay":
+            await self._replay(row, send)
+            return
+        if outcome == "mismatch":
+            response = JSONResponse({"detail": "Idempotency-Key was already used for a different request"}, 422)
+            await response(scope, receive, send)
+            return
+        if outcome == "in_progress":
+            response = JSONResponse(
+                {"detail": "A request with this Idempotency-Key is still in progress"}, 409,
+                headers={"Retry-After": "1"},
+            )
+            await response(scope, receive, send)
+            return
+
+        start = {}
+        chunks = []
+        size = 0
+        stored = False
+
+        async def capture(message):
+            nonlocal size, stored
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif message["type"] == "http.response.body":
+                chunk = message.get("body", b"")
+                size += len(chunk)
+                if size <= IDEMPOTENCY_MAX_RESPONSE_BYTES:
+                    chunks.append(chunk)
+                if not message.get("more_body"):
+                    # Store before the client sees the end of the response, so a
+                    # retry after it can't find the key still in progress
+                    if _storable(start["status"]) and size <= IDEMPOTENCY_MAX_RESPONSE_BYTES:
+                        headers = [[k.decode("latin-1"), v.decode("latin-1")] for k, v in start.get("headers", [])]
+                        await to_thread.run_sync(store, key, start["status"], headers, b"".join(chunks))
+                        stored = True
+            await send(message)
+
+        try:
+            await self.app(scope, _replay_receive(body, receive), capture)
+        finally:
+            if not stored:
+                await to_thread.run_sync(release, key)
+
+    async def _replay(self, row, send):
+        headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in row.headers or []]
+        headers.append((b"idempotent-replayed", b"true"))
+        await send({"type": "http.response.start", "status": row.status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": row.body or b""})
@@ -0,0 +1,156 @@
+"""
+Lightweight in-process job runner for long operations (seeding, bulk imports, backfills).
+
+Jobs are persisted in the ``jobs`` table so their status, progress and result can be
+polled from any request. Work runs in a small thread pool inside the API process;
+handlers report progress through a JobContext, which is also where cooperative
+cancellation is checked.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import os
+import threading
+import traceback
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models import Job, JobStatus
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+
+_handlers = {}
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler when cancellation has been requested"""
+
+
+class JobContext:
+    """Handle passed to job handlers for progress reporting and cancellation checks"""
+
+    def __init__(self, job_id: int):
+        self.job_id = job_id
+
+    def progress(self, current: int, total: int = None, message: str = None):
+        """Record progress and raise JobCancelled if the job was cancelled"""
+        db = SessionLocal()
+        try:
+            job = db.get(Job, self.job_id)
+            job.progress_current = current
+            if total is not None:
+                job.progress_total = total
+            if message is not None:
+                job.message = message
+            db.commit()
+            if job.cancel_requested:
+                raise JobCancelled()
+        finally:
+            db.close()
+
+    def check_cancelled(self):
+        """Raise JobCancelled if cancellation has been requested"""
+        db = SessionLocal()
+        try:
+            job = db.get(Job, self.job_id)
+            if job.cancel_requested:
+                raise JobCancelled()
+        finally:
+            db.close()
+
+
+def job_handler(kind: str):
+    """Register a function as the handler for a job kind"""
+    def decorator(func):
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+def _get_executor():
+    # Created lazily so a pre-forked server never shares threads across workers
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+        return _executor
+
+
+def submit(db: Session, kind: str, params: dict = None) -> Job:
+    """Persist a new job and schedule it on the worker pool"""
+    if kind not in _handlers:
+        raise ValueError(f"Unknown job kind: {kind}")
+
+    job = Job(kind=kind, params=params or {}, status=JobStatus.QUEUED)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+
+    _get_executor().submit(_run, job.id)
+    return job
+
+
+def request_cancel(db: Session, job: Job) -> Job:
+    """Cancel a queued job immediately, or ask a running job to stop"""
+    if job.status == JobStatus.QUEUED:
+        job.status = JobStatus.CANCELLED
+        job.finished_at = datetime.utcnow()
+    elif job.status == JobStatus.RUNNING:
+        job.cancel_requested = True
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def recover_interrupted(db: Session) -> int:
+    """Mark jobs left queued or running by a previous process as failed"""
+    interrupted = db.query(Job).filter(
+        Job.status.in_([JobStatus.QUEUED, JobStatus.RUNNING])
+    ).update(
+        {
+            Job.status: JobStatus.FAILED,
+            Job.error: "Interrupted by server restart",
+            Job.finished_at: datetime.utcnow(),
+        },
+        synchronize_session=False,
+    )
+    db.commit()
+    return interrupted
+
+
+def _finish(db: Session, job: Job, status: JobStatus, result=None, error: str = None):
+    job.status = status
+    job.result = result
+    job.error = error
+    job.finished_at = datetime.utcnow()
+    db.commit()
+
+
+def _run(job_id: int):
+    db = SessionLocal()
+    try:
+        job = db.get(Job, job_id)
+        if job is None or job.status != JobStatus.QUEUED:
+            # Cancelled before a worker picked it up
+            return
+
+        job.status = JobStatus.RUNNING
+        job.started_at = datetime.utcnow()
+        db.commit()
+
+        handler = _handlers[job.kind]
+        params = dict(job.params or {})
+        try:
+            result = handler(JobContext(job_id), **params)
+        except JobCancelled:
+            db.refresh(job)
+            _finish(db, job, JobStatus.CANCELLED)
+        except Exception as e:
+            db.rollback()
+            db.refresh(job)
+            _finish(db, job, JobStatus.FAILED, error=f"{e}\n{traceback.format_exc()}")
+        else:
+            db.refresh(job)
+            _finish(db, job, JobStatus.SUCCEEDED, result=result)
+    finally:
+        db.close()
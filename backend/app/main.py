@@ -1,21 +1,46 @@
-from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Header, Response
+from fastapi.responses import StreamingResponse, FileResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, func
+from sqlalchemy.orm import Session, configure_mappers
+from sqlalchemy.exc import IntegrityError
+from pydantic import ValidationError
+from sqlalchemy import or_, and_, func, update
 from typing import List, Optional
-from datetime import date, timedelta
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+import asyncio
+import base64
 import os
-from app.database import get_db, engine, Base
-from app import models, schemas
-
-# Create tables (only creates if they don't exist, never drops existing tables)
-Base.metadata.create_all(bind=engine)
+import time
+from anyio import to_thread
+from dateutil.relativedelta import relativedelta
+from app.auth import require_admin, is_admin
+from app.database import (
+    get_db, get_read_db, SessionLocal, replica_engines, watch_writes,
+    READ_PRIMARY_COOKIE, READ_PRIMARY_FOR_HEADER, REPLICA_STICKY_SECONDS,
+)
+from app import models, schemas, jobs, tasks, migrations, counters, autocomplete, events, sync, bulk, admission, analytics, caseloads, snapshots, profiling, streaming, generations, querycache
+from app.compression import CompressionMiddleware
+from app.admission import AdmissionControlMiddleware
+from app.idempotency import IdempotencyMiddleware
 
 app = FastAPI(
     title="Patient Care Dashboard API",
     description="API for managing patients, care teams, and health screenings",
     version="1.0.0"
 )
+# Every route can be profiled on request (X-Profile header or PROFILE_SAMPLE_RATE)
+app.router.route_class = profiling.ProfiledRoute
+
+# Replays stored responses for retried POSTs carrying an Idempotency-Key (IDEMPOTENCY_* env vars).
+# Innermost, so stored bodies are uncompressed and replays still pass rate limits.
+app.add_middleware(IdempotencyMiddleware)
+
+# Concurrency limit and per-client rate limits (ADMISSION_* / RATE_LIMIT_* env vars).
+# Added before CORS so 429/503 responses still carry CORS headers.
+app.add_middleware(AdmissionControlMiddleware)
 
 # CORS middleware
 # Get allowed origins from environment variable or use defaults
@@ -35,8 +60,67 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", READ_PRIMARY_FOR_HEADER],
 )
 
+# Compress large JSON responses (thresholds and types configured via COMPRESSION_* env vars)
+app.add_middleware(CompressionMiddleware)
+
+
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    """After a committed write, keep the client's reads on the primary for a short window"""
+    writes = watch_writes()
+    response = await call_next(request)
+    if replica_engines and writes["wrote"] and response.status_code < 400:
+        # Cross-site browsers drop the cookie, so the frontend sends
+        # X-Read-Primary for this many seconds instead
+        response.headers[READ_PRIMARY_FOR_HEADER] = f"{REPLICA_STICKY_SECONDS:g}"
+        response.set_cookie(
+            READ_PRIMARY_COOKIE,
+            str(time.time() + REPLICA_STICKY_SECONDS),
+            max_age=int(REPLICA_STICKY_SECONDS) + 1,
+            httponly=True,
+        )
+    return response
+
+
+# Schema changes are applied by `python -m app.migrations` at deploy time;
+# startup only confirms the database is at the expected version.
+@app.on_event("startup")
+def check_schema():
+    """Verify the schema version before serving requests"""
+    migrations.check()
+    # Resolve ORM relationships now rather than on the first request
+    configure_mappers()
+
+
+@app.on_event("startup")
+def recover_jobs():
+    """Fail jobs that were still queued or running when the previous process exited"""
+    # Under gunicorn the master does this once (see gunicorn.conf.py)
+    if os.getenv("RECOVER_JOBS_ON_STARTUP", "true").lower() not in ("1", "true", "yes"):
+        return
+    db = SessionLocal()
+    try:
+        jobs.recover_interrupted(db)
+    finally:
+        db.close()
+
+
+@app.on_event("startup")
+def build_autocomplete_index():
+    """Load the patient typeahead index"""
+    autocomplete.index.load()
+
+
+@app.on_event("startup")
+def configure_threadpool():
+    """Size the thread pool that runs sync (def) routes"""
+    threadpool_size = os.getenv("THREADPOOL_SIZE")
+    if threadpool_size:
+        to_thread.current_default_thread_limiter().total_tokens = int(threadpool_size)
+
 
 # Root endpoint - redirect to API docs
 @app.get("/")
@@ -46,62 +130,217 @@ def root():
     return RedirectResponse(url="/docs")
 
 
+def _publish_patient(patient: schemas.PatientResponse, op: str):
+    events.publish_change(
+        "patient", patient.id, op,
+        data=patient.model_dump(mode="json"),
+        patient_id=patient.id,
+        version=patient.change_seq,
+    )
+
+
+def _birth_date_range(age_min: Optional[int], age_max: Optional[int], today: date) -> tuple:
+    """date_of_birth bounds (inclusive lower, exclusive upper) for an age band"""
+    # Comparing date_of_birth to constants keeps the condition sargable, unlike computing ages per row
+    born_after = today - relativedelta(years=age_max + 1) if age_max is not None else None
+    born_on_or_before = today - relativedelta(years=age_min) if age_min is not None else None
+    return born_after, born_on_or_before
+
+
+def _patient_filters(search: Optional[str] = None, status: Optional[models.PatientStatus] = None,
+                     care_program: Optional[str] = None, enrolled_from: Optional[date] = None,
+                     enrolled_to: Optional[date] = None, age_min: Optional[int] = None,
+                     age_max: Optional[int] = None) -> list:
+    """SQL conditions shared by the patient list, count and bulk endpoints"""
+    conditions = []
+    if search:
+        conditions.append(or_(
+            models.Patient.first_name.ilike(f"%{search}%"),
+            models.Patient.last_name.ilike(f"%{search}%"),
+            models.Patient.email.ilike(f"%{search}%"),
+            models.Patient.phone.ilike(f"%{search}%")
+        ))
+    if status:
+        conditions.append(models.Patient.status == status)
+    if care_program:
+        conditions.append(models.Patient.care_program == care_program)
+    if enrolled_from:
+        conditions.append(models.Patient.enrollment_date >= enrolled_from)
+    if enrolled_to:
+        conditions.append(models.Patient.enrollment_date <= enrolled_to)
+    if age_min is not None or age_max is not None:
+        if age_min is not None and age_max is not None and age_min > age_max:
+            # Same 422 shape as FastAPI's own query validation errors
+            raise RequestValidationError([{
+                "type": "value_error", "loc": ("query", "age_min"),
+                "msg": "Value error, age_min must not be greater than age_max", "input": str(age_min),
+            }])
+        born_after, born_on_or_before = _birth_date_range(age_min, age_max, date.today())
+        if born_after:
+            conditions.append(models.Patient.date_of_birth > born_after)
+        if born_on_or_before:
+            conditions.append(models.Patient.date_of_birth <= born_on_or_before)
+    return conditions
+
+
+def _selection_filters(selection: schemas.PatientSelection) -> list:
+    if selection.ids is not None:
+        return [models.Patient.id.in_(selection.ids)]
+    return _patient_filters(**selection.filter.model_dump())
+
+
 # Patient endpoints
+PATIENT_PAGE_MAX_LIMIT = 100
+# Streamed pages hold one chunk in memory at a time, so they can be far larger
+PATIENT_STREAM_MAX_LIMIT = int(os.getenv("PATIENT_STREAM_MAX_LIMIT", "10000"))
+PATIENT_STREAM_ADMIN_MAX_LIMIT = int(os.getenv("PATIENT_STREAM_ADMIN_MAX_LIMIT", "1000000"))
+# Rough size of a cached count, for the cache's byte limit
+_COUNT_ENTRY_BYTES = 200
+
+
+def _patient_cache_key(endpoint: str, search, status, care_program, enrolled_from, enrolled_to,
+                       age_min, age_max, **params) -> tuple:
+    # Age bands resolve to birth dates relative to today, so they expire at midnight
+    today = date.today() if age_min is not None or age_max is not None else None
+    return querycache.key(
+        endpoint, search, status=status, care_program=care_program, enrolled_from=enrolled_from,
+        enrolled_to=enrolled_to, age_min=age_min, age_max=age_max, today=today, **params
+    )
+
+
+def _patient_json(row) -> str:
+    # Rows come straight from the database, so skip validation (EmailStr is slow)
+    return schemas.PatientResponse.model_construct(**row._mapping).model_dump_json()
+
+
 @app.get("/api/patients", response_model=List[schemas.PatientResponse])
 def get_patients(
+    request: Request,
     skip: int = Query(0, ge=0),
-    limit: int = Query(20, ge=1, le=100),
+    limit: int = Query(20, ge=1, description="Up to 100, or PATIENT_STREAM_MAX_LIMIT with stream=true (more for admins)"),
     search: Optional[str] = Query(None),
     status: Optional[schemas.PatientStatus] = Query(None),
-    db: Session = Depends(get_db)
+    care_program: Optional[str] = Query(None),
+    enrolled_from: Optional[date] = Query(None, description="Only patients enrolled on or after this date"),
+    enrolled_to: Optional[date] = Query(None, description="Only patients enrolled on or before this date"),
+    age_min: Optional[int] = Query(None, ge=0, le=150, description="Only patients at least this old"),
+    age_max: Optional[int] = Query(None, ge=0, le=150, description="Only patients at most this old"),
+    updated_since: Optional[datetime] = Query(None, description="Only patients modified after this time (UTC)"),
+    since_seq: Optional[int] = Query(None, ge=0, description="Only patients changed after this change sequence; results are ordered by it"),
+    stream: bool = Query(False, description="Stream the JSON array from a server-side cursor, for large pages"),
+    db: Session = Depends(get_read_db)
 ):
     """Get list of patients with pagination, search, and filtering"""
-    query = db.query(models.Patient)
-    
-    if search:
-        search_filter = or_(
-            models.Patient.first_name.ilike(f"%{search}%"),
-            models.Patient.last_name.ilike(f"%{search}%"),
-            models.Patient.email.ilike(f"%{search}%"),
-            models.Patient.phone.ilike(f"%{search}%")
+    if not stream:
+        max_limit = PATIENT_PAGE_MAX_LIMIT
+    elif is_admin(request):
+        max_limit = PATIENT_STREAM_ADMIN_MAX_LIMIT
+    else:
+        max_limit = PATIENT_STREAM_MAX_LIMIT
+    if limit > max_limit:
+        hint = "" if stream else "; use stream=true for larger pages"
+        raise HTTPException(status_code=422, detail=f"limit must be at most {max_limit}{hint}")
+
+    # Incremental and streamed reads are one-off; everything else is worth caching
+    cacheable = querycache.QUERY_CACHE_ENABLED and not stream and updated_since is None and since_seq is None
+    if cacheable:
+        cache_key = _patient_cache_key(
+            "list", search, status, care_program, enrolled_from, enrolled_to, age_min, age_max,
+            skip=skip, limit=limit,
         )
-        query = query.filter(search_filter)
-    
-    if status:
-        query = query.filter(models.Patient.status == status)
-    
-    patients = query.order_by(models.Patient.last_name, models.Patient.first_name).offset(skip).limit(limit).all()
-    return patients
+        generation = generations.current(db, "patients")
+        body = querycache.patients.get(cache_key, generation)
+        if body is not None:
+            return Response(body, media_type="application/json", headers={"X-Cache": "hit"})
+
+    query = db.query(models.Patient).filter(*_patient_filters(
+        search, status, care_program, enrolled_from, enrolled_to, age_min, age_max
+    ))
+
+    if updated_since:
+        query = query.filter(models.Patient.updated_at > updated_since)
+
+    if since_seq is not None:
+        query = query.filter(models.Patient.change_seq > since_seq)
+        # Sync clients page in change order
+        query = query.order_by(models.Patient.change_seq, models.Patient.id)
+    else:
+        query = query.order_by(models.Patient.last_name, models.Patient.first_name)
+
+    if stream:
+        # Plain columns rather than ORM objects: nothing to track, nothing to keep
+        columns = [models.Patient.__table__.c[name] for name in schemas.PatientResponse.model_fields]
+        statement = query.with_entities(*columns).offset(skip).limit(limit).statement
+        return StreamingResponse(
+            streaming.json_array(statement, _patient_json, read_only=db.info.get("read_only", False)),
+            media_type="application/json",
+        )
+
+    patients = query.offset(skip).limit(limit).all()
+    if not cacheable:
+        return patients
+    # Cache the serialized page, so hits skip validation and encoding too
+    body = ("[" + ",".join(
+        schemas.PatientResponse.model_validate(patient).model_dump_json() for patient in patients
+    ) + "]").encode()
+    querycache.patients.put(cache_key, generation, body, len(body))
+    return Response(body, media_type="application/json", headers={"X-Cache": "miss"})
 
 
-@app.get("/api/patients/count")
+@app.get("/api/patients/count", response_model=schemas.PatientCountResponse)
 def get_patients_count(
     search: Optional[str] = Query(None),
     status: Optional[schemas.PatientStatus] = Query(None),
-    db: Session = Depends(get_db)
+    care_program: Optional[str] = Query(None),
+    enrolled_from: Optional[date] = Query(None),
+    enrolled_to: Optional[date] = Query(None),
+    age_min: Optional[int] = Query(None, ge=0, le=150),
+    age_max: Optional[int] = Query(None, ge=0, le=150),
+    exact: bool = Query(False, description="Always return an exact count, even for broad searches"),
+    db: Session = Depends(get_read_db)
 ):
     """Get total count of patients matching filters"""
-    query = db.query(models.Patient)
-    
-    if search:
-        search_filter = or_(
-            models.Patient.first_name.ilike(f"%{search}%"),
-            models.Patient.last_name.ilike(f"%{search}%"),
-            models.Patient.email.ilike(f"%{search}%"),
-            models.Patient.phone.ilike(f"%{search}%")
-        )
-        query = query.filter(search_filter)
-    
-    if status:
-        query = query.filter(models.Patient.status == status)
-    
-    return {"count": query.count()}
+    structured = (care_program, enrolled_from, enrolled_to, age_min, age_max)
+    # Unfiltered and status-only counts come from the maintained counters
+    if not search and all(value is None for value in structured):
+        return {"count": counters.get_count(db, status), "exact": True}
+
+    if querycache.QUERY_CACHE_ENABLED:
+        cache_key = _patient_cache_key("count", search, status, *structured, exact=exact)
+        generation = generations.current(db, "patients")
+        result = querycache.patients.get(cache_key, generation)
+        if result is not None:
+            return result
+
+    query = db.query(models.Patient).filter(*_patient_filters(search, status, *structured))
+
+    # Short search terms match most of the table; stop counting at the cap
+    if search and not exact and len(search.strip()) <= counters.APPROX_SEARCH_MAX_LENGTH:
+        result = counters.capped_count(db, query)
+    else:
+        result = {"count": query.count(), "exact": True}
+
+    if querycache.QUERY_CACHE_ENABLED:
+        querycache.patients.put(cache_key, generation, result, _COUNT_ENTRY_BYTES)
+    return result
+
+
+@app.get("/api/patients/autocomplete", response_model=List[schemas.PatientSuggestion])
+def autocomplete_patients(
+    prefix: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=50)
+):
+    """Typeahead suggestions by name, email or phone prefix, served from memory"""
+    autocomplete.index.refresh_if_stale()
+    return autocomplete.index.search(prefix, limit)
 
 
 @app.get("/api/patients/{patient_id}", response_model=schemas.PatientDetailResponse)
-def get_patient(patient_id: int, db: Session = Depends(get_db)):
-    """Get detailed patient information"""
+def get_patient(patient_id: int, db: Session = Depends(get_read_db)):
+    """Get detailed patient information, including archived patients"""
     patient = db.get(models.Patient, patient_id)
+    if not patient:
+        patient = db.get(models.ArchivedPatient, patient_id)
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     return patient
@@ -119,52 +358,170 @@ def create_patient(patient: schemas.PatientCreate, db: Session = Depends(get_db)
     db.add(db_patient)
     db.commit()
     db.refresh(db_patient)
-    return db_patient
+    response = schemas.PatientResponse.model_validate(db_patient)
+    _publish_patient(response, "create")
+    return response
 
 
 @app.put("/api/patients/{patient_id}", response_model=schemas.PatientResponse)
 def update_patient(patient_id: int, patient_update: schemas.PatientUpdate, db: Session = Depends(get_db)):
     """Update patient information"""
-    db_patient = db.query(models.Patient).filter(models.Patient.id == patient_id).first()
-    if not db_patient:
-        raise HTTPException(status_code=404, detail="Patient not found")
-    
     update_data = patient_update.dict(exclude_unset=True)
+    if not update_data:
+        db_patient = db.get(models.Patient, patient_id)
+        if not db_patient:
+            raise HTTPException(status_code=404, detail="Patient not found")
+        return db_patient
     
     # Check email uniqueness if being updated
     if "email" in update_data:
-        existing = db.query(models.Patient).filter(
+        existing = db.query(models.Patient.id).filter(
             models.Patient.email == update_data["email"],
             models.Patient.id != patient_id
         ).first()
         if existing:
             raise HTTPException(status_code=400, detail="Email already registered")
-    
-    for field, value in update_data.items():
-        setattr(db_patient, field, value)
-    
+
+    # The change sequence is locked first, before the patient row and the counters
+    seq = sync.next_seq(db)
+    # The status counters need the status being replaced; lock the row until commit
+    old_status = None
+    if "status" in update_data:
+        old_status = db.query(models.Patient.status).filter(
+            models.Patient.id == patient_id
+        ).with_for_update().scalar()
+        if old_status is None:
+            raise HTTPException(status_code=404, detail="Patient not found")
+
+    # One UPDATE ... RETURNING instead of load, modify, flush and refresh
+    db_patient = db.execute(
+        update(models.Patient)
+        .where(models.Patient.id == patient_id)
+        .values(**update_data, change_seq=seq, updated_at=datetime.utcnow())
+        .returning(models.Patient),
+        execution_options={"synchronize_session": False},
+    ).scalar_one_or_none()
+    if not db_patient:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Patient not found")
+
+    if old_status is not None and old_status != db_patient.status:
+        counters.apply_deltas(db, {old_status: -1, db_patient.status: 1})
+    autocomplete.track_upserted(db, [autocomplete.patient_summary(db_patient)])
+    # Serialize before commit so the response doesn't reload the expired row
+    response = schemas.PatientResponse.model_validate(db_patient)
     db.commit()
-    db.refresh(db_patient)
-    return db_patient
+    _publish_patient(response, "update")
+    return response
 
 
 @app.delete("/api/patients/{patient_id}", status_code=204)
 def delete_patient(patient_id: int, db: Session = Depends(get_db)):
     """Delete a patient"""
-    db_patient = db.query(models.Patient).filter(models.Patient.id == patient_id).first()
-    if not db_patient:
+    # One DELETE; assignments and screenings go with it through ON DELETE CASCADE
+    result = bulk.delete_patients(db, [models.Patient.id == patient_id])
+    if not result["ids"]:
+        db.rollback()
         raise HTTPException(status_code=404, detail="Patient not found")
-    
-    db.delete(db_patient)
+
     db.commit()
+    events.publish_change(
+        "patient", patient_id, "delete", patient_id=patient_id, version=result["change_seq"],
+    )
     return None
 
 
+@app.post("/api/patients/bulk-create", response_model=schemas.PatientBulkCreateResponse)
+def bulk_create_patients(request: schemas.PatientBulkCreate, db: Session = Depends(get_db)):
+    """Create up to 1000 patients in one statement, with a result for each item"""
+    results = [None] * len(request.patients)
+    valid = {}
+    first_index = {}
+    for index, item in enumerate(request.patients):
+        try:
+            patient = schemas.PatientCreate.model_validate(item)
+        except ValidationError as exc:
+            detail = "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in exc.errors())
+            results[index] = {"index": index, "status": "invalid", "detail": detail}
+            continue
+        if patient.email in first_index:
+            results[index] = {
+                "index": index, "status": "duplicate",
+                "detail": f"Same email as item {first_index[patient.email]}",
+            }
+            continue
+        first_index[patient.email] = index
+        valid[index] = patient.model_dump()
+
+    try:
+        result = bulk.create_patients(db, list(valid.values()))
+        db.commit()
+    except IntegrityError:
+        # Another request registered one of the emails since we checked
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Conflicting concurrent insert; retry the batch")
+
+    created = iter(result["created"])
+    ids = []
+    for index, patient in valid.items():
+        if patient["email"] in result["existing"]:
+            results[index] = {"index": index, "status": "exists", "id": result["existing"][patient["email"]]}
+        else:
+            ids.append(next(created).id)
+            results[index] = {"index": index, "status": "created", "id": ids[-1]}
+
+    if ids:
+        events.publish_change("patient", None, "bulk_create", data={"ids": ids}, version=result["change_seq"])
+    return {
+        "created": len(ids),
+        "existing": len(result["existing"]),
+        "invalid": sum(1 for r in results if r["status"] in ("invalid", "duplicate")),
+        "results": results,
+    }
+
+
+@app.post("/api/patients/bulk-update", response_model=schemas.PatientBulkUpdateResponse, dependencies=[Depends(require_admin)])
+def bulk_update_patients(request: schemas.PatientBulkUpdate, db: Session = Depends(get_db)):
+    """Change status or care program for a list of patients, or every patient matching a filter"""
+    changes = request.changes.model_dump(exclude_unset=True)
+    result = bulk.update_patients(db, _selection_filters(request), changes)
+    db.commit()
+
+    if result["ids"]:
+        events.publish_change(
+            "patient", None, "bulk_update",
+            data={"ids": result["ids"], "changes": jsonable_encoder(changes)},
+            version=result["change_seq"],
+        )
+    return {
+        "updated": len(result["ids"]),
+        "not_found": sorted(set(request.ids or ()) - set(result["ids"])),
+    }
+
+
+@app.post("/api/patients/bulk-delete", response_model=schemas.PatientBulkDeleteResponse, dependencies=[Depends(require_admin)])
+def bulk_delete_patients(request: schemas.PatientSelection, db: Session = Depends(get_db)):
+    """Delete a list of patients, or every patient matching a filter, with their history"""
+    result = bulk.delete_patients(db, _selection_filters(request))
+    db.commit()
+
+    if result["ids"]:
+        events.publish_change(
+            "patient", None, "bulk_delete", data={"ids": result["ids"]}, version=result["change_seq"],
+        )
+    return {
+        "deleted": len(result["ids"]),
+        "care_team_assignments_deleted": result["care_team_assignments"],
+        "health_screenings_deleted": result["health_screenings"],
+        "not_found": sorted(set(request.ids or ()) - set(result["ids"])),
+    }
+
+
 # Care Team Member endpoints
 @app.get("/api/care-team-members", response_model=List[schemas.CareTeamMemberResponse])
 def get_care_team_members(
     role: Optional[schemas.CareTeamRole] = Query(None),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get list of care team members"""
     query = db.query(models.CareTeamMember)
@@ -176,7 +533,7 @@ def get_care_team_members(
 
 
 @app.get("/api/care-team-members/{member_id}", response_model=schemas.CareTeamMemberResponse)
-def get_care_team_member(member_id: int, db: Session = Depends(get_db)):
+def get_care_team_member(member_id: int, db: Session = Depends(get_read_db)):
     """Get care team member details"""
     member = db.query(models.CareTeamMember).filter(models.CareTeamMember.id == member_id).first()
     if not member:
@@ -186,7 +543,7 @@ def get_care_team_member(member_id: int, db: Session = Depends(get_db)):
 
 # Care Team Assignment endpoints
 @app.get("/api/patients/{patient_id}/care-team-assignments", response_model=List[schemas.CareTeamAssignmentResponse])
-def get_patient_care_team_assignments(patient_id: int, db: Session = Depends(get_db)):
+def get_patient_care_team_assignments(patient_id: int, db: Session = Depends(get_read_db)):
     """Get care team assignments for a patient"""
     patient = db.query(models.Patient).filter(models.Patient.id == patient_id).first()
     if not patient:
@@ -225,8 +582,19 @@ def assign_care_team_member(
         assigned_date=assigned_date
     )
     db.add(db_assignment)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # Assigned by a concurrent request since we checked
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Care team member already assigned to this patient")
     db.refresh(db_assignment)
+    events.publish_change(
+        "care_team_assignment", db_assignment.id, "create",
+        data=schemas.CareTeamAssignmentResponse.model_validate(db_assignment).model_dump(mode="json"),
+        patient_id=patient_id,
+        version=db_assignment.change_seq,
+    )
     return db_assignment
 
 
@@ -242,26 +610,268 @@ def unassign_care_team_member(patient_id: int, assignment_id: int, db: Session =
     
     db.delete(assignment)
     db.commit()
+    events.publish_change(
+        "care_team_assignment", assignment_id, "delete", patient_id=patient_id,
+        version=sync.deleted_seq(db, "care_team_assignment", assignment_id),
+    )
     return None
 
 
+def _current_members(db: Session, patient_ids) -> dict:
+    """Assigned member ids for each of the given patients that exists"""
+    existing = [row.id for row in db.query(models.Patient.id).filter(models.Patient.id.in_(patient_ids))]
+    members = defaultdict(set)
+    for patient_id, member_id in db.query(
+        models.CareTeamAssignment.patient_id, models.CareTeamAssignment.care_team_member_id
+    ).filter(models.CareTeamAssignment.patient_id.in_(existing)):
+        members[patient_id].add(member_id)
+    return {patient_id: members[patient_id] for patient_id in existing}
+
+
+def _recommendation_responses(db: Session, patient_ids: list, picks: list) -> list:
+    member_ids = {member_id for patient_picks in picks for _, member_id, _ in patient_picks}
+    members = {
+        member.id: member
+        for member in db.query(models.CareTeamMember).filter(models.CareTeamMember.id.in_(member_ids))
+    }
+    return [
+        {
+            "patient_id": patient_id,
+            "recommendations": [
+                {"role": role, "care_team_member": members[member_id], "caseload": caseload}
+                for role, member_id, caseload in patient_picks
+            ],
+        }
+        for patient_id, patient_picks in zip(patient_ids, picks)
+    ]
+
+
+@app.get("/api/patients/{patient_id}/care-team-recommendations", response_model=schemas.PatientCareTeamRecommendations)
+def recommend_care_team_members(
+    patient_id: int,
+    role: Optional[List[schemas.CareTeamRole]] = Query(None),
+    db: Session = Depends(get_read_db)
+):
+    """Get the least-loaded care team member per role who isn't already on the patient's team"""
+    current = _current_members(db, [patient_id])
+    if patient_id not in current:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    picks = caseloads.recommend(db, [current[patient_id]], roles=role)
+    return _recommendation_responses(db, [patient_id], picks)[0]
+
+
+@app.post("/api/care-team-assignments/recommendations", response_model=List[schemas.PatientCareTeamRecommendations])
+def recommend_care_team_members_batch(
+    request: schemas.CareTeamRecommendationRequest,
+    db: Session = Depends(get_read_db)
+):
+    """Get balanced care team picks for a batch of existing or new patients"""
+    if request.count is not None:
+        patient_ids = [None] * request.count
+        current_members = [set()] * request.count
+    else:
+        current = _current_members(db, request.patient_ids)
+        patient_ids = [pid for pid in dict.fromkeys(request.patient_ids) if pid in current]
+        current_members = [current[pid] for pid in patient_ids]
+    picks = caseloads.recommend(db, current_members, roles=request.roles)
+    return _recommendation_responses(db, patient_ids, picks)
+
+
+@app.post("/api/care-team-assignments/auto-assign", response_model=schemas.CareTeamAutoAssignResponse)
+def auto_assign_care_team_members(request: schemas.CareTeamAutoAssignRequest, db: Session = Depends(get_db)):
+    """Fill each patient's missing roles with the least-loaded members, in one transaction"""
+    # Lock the change sequence before reading, so the missing roles can't change until we commit
+    seq = sync.next_seq(db)
+    current = _current_members(db, request.patient_ids)
+    patient_ids = [pid for pid in dict.fromkeys(request.patient_ids) if pid in current]
+    picks = caseloads.recommend(
+        db, [current[pid] for pid in patient_ids], roles=request.roles, only_missing=True
+    )
+
+    now = datetime.utcnow()
+    assigned_date = request.assigned_date or date.today()
+    rows = [
+        {
+            "patient_id": patient_id, "care_team_member_id": member_id, "assigned_date": assigned_date,
+            "change_seq": seq, "updated_at": now,
+        }
+        for patient_id, patient_picks in zip(patient_ids, picks)
+        for _, member_id, _ in patient_picks
+    ]
+    created = bulk.insert_assignments(db, rows) if rows else []
+    assignments = [schemas.SyncCareTeamAssignment.model_validate(a) for a in created]
+    db.commit()
+    inserted = {(a.patient_id, a.care_team_member_id) for a in assignments}
+
+    if assignments:
+        events.publish_change(
+            "care_team_assignment", None, "bulk_create",
+            data={"ids": [a.id for a in assignments], "patient_ids": sorted({a.patient_id for a in assignments})},
+            version=seq,
+        )
+    return {
+        "assigned": len(assignments),
+        "assignments": assignments,
+        "skipped": [
+            {"patient_id": row["patient_id"], "care_team_member_id": row["care_team_member_id"]}
+            for row in rows if (row["patient_id"], row["care_team_member_id"]) not in inserted
+        ],
+        "not_found": sorted(set(request.patient_ids) - set(current)),
+    }
+
+
+def _bulk_assignment_result(patient_id: int, member_id: int, result: dict, status: str, assignment_id=None) -> dict:
+    if patient_id not in result["patients"]:
+        status, assignment_id = "patient_not_found", None
+    elif member_id not in result["members"]:
+        status, assignment_id = "member_not_found", None
+    return {"patient_id": patient_id, "care_team_member_id": member_id, "status": status, "assignment_id": assignment_id}
+
+
+@app.post("/api/care-team-assignments/bulk-assign", response_model=schemas.CareTeamBulkAssignResponse)
+def bulk_assign_care_team_members(request: schemas.CareTeamBulkAssign, db: Session = Depends(get_db)):
+    """Assign one member to many patients, or many members to one patient, in one transaction"""
+    pairs = request.pairs()
+    result = bulk.assign_care_team(db, pairs, request.assigned_date or date.today())
+    created = {(a.patient_id, a.care_team_member_id): a.id for a in result["created"]}
+    db.commit()
+
+    if created:
+        events.publish_change(
+            "care_team_assignment", None, "bulk_create",
+            data={"ids": list(created.values()), "patient_ids": sorted({p for p, _ in created})},
+            version=result["change_seq"],
+        )
+    results = []
+    for pair in pairs:
+        if pair in created:
+            results.append(_bulk_assignment_result(*pair, result, "assigned", created[pair]))
+        else:
+            existing = result["existing"].get(pair)
+            results.append(_bulk_assignment_result(*pair, result, "already_assigned", existing and existing[0]))
+    return {"assigned": len(created), "results": results}
+
+
+@app.post("/api/care-team-assignments/bulk-unassign", response_model=schemas.CareTeamBulkUnassignResponse)
+def bulk_unassign_care_team_members(request: schemas.CareTeamBulkSelection, db: Session = Depends(get_db)):
+    """Unassign one member from many patients, or many members from one patient, in one transaction"""
+    pairs = request.pairs()
+    result = bulk.unassign_care_team(db, pairs)
+    deleted = result["deleted"]
+    db.commit()
+
+    if deleted:
+        events.publish_change(
+            "care_team_assignment", None, "bulk_delete",
+            data={"ids": [i for ids in deleted.values() for i in ids], "patient_ids": sorted({p for p, _ in deleted})},
+            version=result["change_seq"],
+        )
+    results = []
+    for pair in pairs:
+        if pair in deleted:
+            results.append(_bulk_assignment_result(*pair, result, "unassigned", deleted[pair][0]))
+        else:
+            results.append(_bulk_assignment_result(*pair, result, "not_assigned"))
+    return {"unassigned": len(deleted), "results": results}
+
+
 # Health Screening endpoints
+def _encode_cursor(screening_date: date, screening_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{screening_date.isoformat()}:{screening_id}".encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple:
+    try:
+        day, screening_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+        return date.fromisoformat(day), int(screening_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _screening_page(query, date_from: Optional[date], date_to: Optional[date], cursor: Optional[str],
+                    limit: Optional[int], screening_of=lambda row: row):
+    """Newest-first screenings after the cursor; returns (rows, next cursor)"""
+    screening = models.HealthScreening
+    if date_from:
+        query = query.filter(screening.screening_date >= date_from)
+    if date_to:
+        query = query.filter(screening.screening_date <= date_to)
+    if cursor:
+        # Keyset pagination: rows strictly after the last one returned, no OFFSET scan
+        day, screening_id = _decode_cursor(cursor)
+        query = query.filter(or_(
+            screening.screening_date < day,
+            and_(screening.screening_date == day, screening.id < screening_id),
+        ))
+    query = query.order_by(screening.screening_date.desc(), screening.id.desc())
+    if limit is None:
+        return query.all(), None
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    last = screening_of(rows[limit - 1])
+    return rows[:limit], _encode_cursor(last.screening_date, last.id)
+
+
 @app.get("/api/patients/{patient_id}/health-screenings", response_model=List[schemas.HealthScreeningResponse])
-def get_patient_health_screenings(patient_id: int, db: Session = Depends(get_db)):
-    """Get health screening history for a patient"""
-    patient = db.query(models.Patient).filter(models.Patient.id == patient_id).first()
+def get_patient_health_screenings(
+    patient_id: int,
+    response: Response,
+    date_from: Optional[date] = Query(None, alias="from", description="Only screenings on or after this date"),
+    date_to: Optional[date] = Query(None, alias="to", description="Only screenings on or before this date"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; all matching screenings if omitted"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    db: Session = Depends(get_read_db)
+):
+    """Get health screening history for a patient, newest first"""
+    patient = db.query(models.Patient.id).filter(models.Patient.id == patient_id).first()
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
-    
-    screenings = db.query(models.HealthScreening).filter(
-        models.HealthScreening.patient_id == patient_id
-    ).order_by(models.HealthScreening.screening_date.desc()).all()
-    
+
+    screenings, next_cursor = _screening_page(
+        db.query(models.HealthScreening).filter(models.HealthScreening.patient_id == patient_id),
+        date_from, date_to, cursor, limit,
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return screenings
 
 
+@app.get("/api/health-screenings", response_model=schemas.HealthScreeningPage)
+def search_health_screenings(
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    score_min: Optional[float] = Query(None, ge=0, le=10),
+    score_max: Optional[float] = Query(None, ge=0, le=10),
+    care_program: Optional[str] = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    db: Session = Depends(get_read_db)
+):
+    """Get screenings across all patients, newest first, for QA reviews"""
+    query = db.query(
+        models.HealthScreening, models.Patient.first_name, models.Patient.last_name, models.Patient.care_program
+    ).join(models.Patient, models.Patient.id == models.HealthScreening.patient_id)
+    if score_min is not None:
+        query = query.filter(models.HealthScreening.score >= score_min)
+    if score_max is not None:
+        query = query.filter(models.HealthScreening.score <= score_max)
+    if care_program:
+        query = query.filter(models.Patient.care_program == care_program)
+
+    rows, next_cursor = _screening_page(query, date_from, date_to, cursor, limit, screening_of=lambda row: row[0])
+    items = [
+        schemas.HealthScreeningReviewItem(
+            **schemas.HealthScreeningResponse.model_validate(screening).model_dump(),
+            first_name=first_name, last_name=last_name, care_program=program,
+        )
+        for screening, first_name, last_name, program in rows
+    ]
+    return {"items": items, "next_cursor": next_cursor}
+
+
 @app.get("/api/health-screenings/{screening_id}", response_model=schemas.HealthScreeningResponse)
-def get_health_screening(screening_id: int, db: Session = Depends(get_db)):
+def get_health_screening(screening_id: int, db: Session = Depends(get_read_db)):
     """Get a specific health screening"""
     screening = db.query(models.HealthScreening).filter(models.HealthScreening.id == screening_id).first()
     if not screening:
@@ -269,50 +879,242 @@ def get_health_screening(screening_id: int, db: Session = Depends(get_db)):
     return screening
 
 
-@app.post("/api/admin/seed")
-def seed_database():
-    """Seed the database with sample data. Only use in development/staging."""
-    try:
-        # Import the main function from seed_data
-        import subprocess
-        import sys
-        import os
-        from app.database import SessionLocal
-        
-        # Get the backend directory path
-        backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        seed_script = os.path.join(backend_dir, "seed_data.py")
-        
-        # Run the seed script
-        result = subprocess.run(
-            [sys.executable, seed_script],
-            cwd=backend_dir,
-            capture_output=True,
-            text=True,
-            timeout=60
-        )
-        
-        if result.returncode != 0:
-            raise Exception(f"Seed script failed: {result.stderr}")
-        
-        # Get counts from database
-        seed_db = SessionLocal()
+# Analytics endpoints
+@app.get("/api/analytics/scores/distribution", response_model=schemas.ScoreDistributionResponse)
+def get_score_distribution(
+    bins: int = Query(10, ge=1, le=100),
+    latest: bool = Query(False, description="Only each patient's most recent screening"),
+    care_program: Optional[str] = Query(None),
+    status: Optional[schemas.PatientStatus] = Query(None),
+    percentile: List[float] = Query(list(analytics.DEFAULT_PERCENTILES), description="Percentiles to report, 0-100"),
+    db: Session = Depends(get_read_db)
+):
+    """Get a histogram and percentiles of health screening scores"""
+    if any(not 0 <= q <= 100 for q in percentile):
+        raise HTTPException(status_code=400, detail="Percentiles must be between 0 and 100")
+    data = analytics.get_data(db)
+    return analytics.distribution(
+        data, bins=bins, latest=latest, percentiles=percentile,
+        care_program=care_program, status=status.value if status else None,
+    )
+
+
+@app.get("/api/analytics/scores/zscores", response_model=schemas.ScoreZScoresResponse)
+def get_score_zscores(
+    cohort: str = Query("care_program", pattern="^(care_program|status)$"),
+    patient_id: Optional[int] = Query(None),
+    min_abs_z: Optional[float] = Query(None, ge=0),
+    limit: int = Query(100, ge=1, le=5000),
+    db: Session = Depends(get_read_db)
+):
+    """Get z-scores of patients' latest screening scores against their cohort, largest first"""
+    data = analytics.get_data(db)
+    return analytics.zscores(data, cohort_field=cohort, patient_id=patient_id, min_abs_z=min_abs_z, limit=limit)
+
+
+# Delta sync
+@app.get("/api/sync/changes", response_model=schemas.SyncChangesResponse)
+def get_changes(
+    since_seq: int = Query(0, ge=0, description="next_seq from the previous sync; 0 for a full sync"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page, while has_more is true"),
+    limit: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_read_db)
+):
+    """Get patients, assignments, screenings and deletes changed after since_seq"""
+    position = None
+    if cursor:
         try:
-            return {
-                "message": "Database seeded successfully",
-                "output": result.stdout,
-                "care_team_members": seed_db.query(models.CareTeamMember).count(),
-                "patients": seed_db.query(models.Patient).count(),
-                "assignments": seed_db.query(models.CareTeamAssignment).count(),
-                "screenings": seed_db.query(models.HealthScreening).count()
-            }
+            position = sync.decode_cursor(cursor)
+        except (ValueError, UnicodeDecodeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    page = sync.changes_since(db, since_seq, limit, position)
+    changes = page["changes"]
+    return {
+        "patients": changes["patient"],
+        "care_team_assignments": changes["care_team_assignment"],
+        "health_screenings": changes["health_screening"],
+        "tombstones": changes["tombstone"],
+        "next_seq": page["next_seq"],
+        "next_cursor": page["next_cursor"],
+        "has_more": page["has_more"],
+    }
+
+
+# Change feed
+@app.get("/api/changes/stream")
+async def stream_changes(
+    request: Request,
+    entity: Optional[List[str]] = Query(None, description="Only these entities: patient, care_team_assignment, health_screening"),
+    patient_id: Optional[int] = Query(None),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID")
+):
+    """Server-sent events stream of changes to patients, assignments and screenings"""
+    def wanted(event: dict) -> bool:
+        if event.get("op") == "resync":
+            return True
+        if entity and event.get("entity") not in entity:
+            return False
+        if patient_id is None or event.get("patient_id") == patient_id:
+            return True
+        # Bulk events list the affected patients
+        data = event.get("data") or {}
+        if event.get("entity") == "patient":
+            return patient_id in data.get("ids", ())
+        return patient_id in data.get("patient_ids", ())
+
+    async def event_stream():
+        # Subscribe before replaying so nothing published in between is lost
+        subscription = events.broker.subscribe()
+        try:
+            # Versions are change sequence values; concurrent commits can publish them
+            # slightly out of order, so duplicates are detected by identity, not ordering
+            replayed = set()
+            if last_event_id and last_event_id.isdigit():
+                missed = events.broker.replay_since(int(last_event_id))
+                if missed is None:
+                    yield events.format_sse({"op": "resync"})
+                else:
+                    for event in missed:
+                        replayed.add((event["version"], event.get("entity"), event.get("id")))
+                        if wanted(event):
+                            yield events.format_sse(event)
+
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event.get("op") == "resync":
+                    subscription.overflowed = False
+                elif replayed and (event["version"], event.get("entity"), event.get("id")) in replayed:
+                    continue
+                if wanted(event):
+                    yield events.format_sse(event)
         finally:
-            seed_db.close()
-    except Exception as e:
-        import traceback
-        raise HTTPException(status_code=500, detail=f"Error seeding database: {str(e)}\n{traceback.format_exc()}")
+            events.broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/api/admin/seed", response_model=schemas.JobResponse, status_code=202, dependencies=[Depends(require_admin)])
+def seed_database(db: Session = Depends(get_db)):
+    """Queue a job that seeds the database with sample data. Only use in development/staging."""
+    return jobs.submit(db, "seed")
+
+
+@app.post("/api/admin/archive/discharged", response_model=schemas.JobResponse, status_code=202, dependencies=[Depends(require_admin)])
+def archive_discharged_patients(request: Optional[schemas.ArchiveRequest] = None, db: Session = Depends(get_db)):
+    """Queue a job that moves discharged patients and their history into the archive tables"""
+    request = request or schemas.ArchiveRequest()
+    return jobs.submit(db, "archive_discharged", {"batch_size": request.batch_size})
+
+
+@app.post("/api/admin/patient-counts/reconcile", response_model=schemas.JobResponse, status_code=202, dependencies=[Depends(require_admin)])
+def reconcile_patient_counts(db: Session = Depends(get_db)):
+    """Queue a job that verifies the per-status patient counters and corrects any drift"""
+    return jobs.submit(db, "reconcile_patient_counts")
+
+
+@app.post("/api/admin/snapshots", response_model=schemas.JobResponse, status_code=202, dependencies=[Depends(require_admin)])
+def create_snapshot(request: Optional[schemas.SnapshotRequest] = None, db: Session = Depends(get_db)):
+    """Queue a job that exports the patient tables to Parquet or Arrow files"""
+    if not snapshots.available():
+        raise HTTPException(status_code=503, detail="Snapshots are unavailable: pyarrow is not installed")
+    request = request or schemas.SnapshotRequest()
+    return jobs.submit(db, "snapshot_export", request.model_dump(mode="json", exclude_none=True))
+
+
+@app.get("/api/admin/snapshots", response_model=List[schemas.SnapshotResponse], dependencies=[Depends(require_admin)])
+def get_snapshots():
+    """List completed snapshots, oldest first"""
+    return snapshots.list_snapshots()
+
+
+@app.get("/api/admin/profiles", response_model=List[schemas.ProfileResponse], dependencies=[Depends(require_admin)])
+def get_profiles(limit: int = Query(100, ge=1, le=1000)):
+    """List captured request profiles, newest first"""
+    return profiling.list_profiles(limit)
+
+
+@app.get("/api/admin/profiles/{profile_id}", response_model=schemas.ProfileDetailResponse, dependencies=[Depends(require_admin)])
+def get_profile(
+    profile_id: str,
+    sort: str = Query("cumulative", pattern="^(cumulative|tottime|calls)$"),
+    limit: int = Query(30, ge=1, le=500)
+):
+    """Get a profile's request details and its most expensive functions"""
+    metadata = profiling.get_metadata(profile_id)
+    if metadata is None or profiling.stats_path(profile_id) is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return {**metadata, "functions": profiling.top_functions(profile_id, sort, limit)}
+
+
+@app.get("/api/admin/profiles/{profile_id}/download", dependencies=[Depends(require_admin)])
+def download_profile(profile_id: str):
+    """Download a profile as a pstats file"""
+    path = profiling.stats_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
+
+
+@app.get("/api/admin/admission", response_model=schemas.AdmissionStatsResponse, dependencies=[Depends(require_admin)])
+def get_admission_stats():
+    """Queue depth, in-flight requests and rejection counters for this worker"""
+    return admission.snapshot()
+
+
+@app.get("/api/admin/query-cache", response_model=schemas.QueryCacheStatsResponse, dependencies=[Depends(require_admin)])
+def get_query_cache_stats():
+    """Size and hit rate of this worker's patient list and count cache"""
+    return querycache.snapshot()
+
+
+# Job endpoints
+@app.get("/api/admin/jobs", response_model=List[schemas.JobResponse], dependencies=[Depends(require_admin)])
+def get_jobs(
+    kind: Optional[str] = Query(None),
+    status: Optional[models.JobStatus] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """List recent background jobs, newest first"""
+    query = db.query(models.Job)
+
+    if kind:
+        query = query.filter(models.Job.kind == kind)
+
+    if status:
+        query = query.filter(models.Job.status == status)
+
+    return query.order_by(models.Job.id.desc()).limit(limit).all()
+
+
+@app.get("/api/admin/jobs/{job_id}", response_model=schemas.JobResponse, dependencies=[Depends(require_admin)])
+def get_job(job_id: int, db: Session = Depends(get_db)):
+    """Get status and progress of a background job"""
+    job = db.get(models.Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.post("/api/admin/jobs/{job_id}/cancel", response_model=schemas.JobResponse, dependencies=[Depends(require_admin)])
+def cancel_job(job_id: int, db: Session = Depends(get_db)):
+    """Cancel a queued job, or request that a running job stop at its next checkpoint"""
+    job = db.get(models.Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status not in (models.JobStatus.QUEUED, models.JobStatus.RUNNING):
+        raise HTTPException(status_code=400, detail=f"Job already {job.status.value}")
+    return jobs.request_cancel(db, job)
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(app, host="0.0.0.0", port=8000, loop="uvloop", http="httptools")
@@ -0,0 +1,424 @@
+"""
+Versioned schema migrations.
+
+Migrations run once per deploy, before the new app version starts:
+
+    python -m app.migrations            # apply pending migrations
+    python -m app.migrations --check    # exit 1 if the schema is out of date
+
+The applied version is stored in the single-row ``schema_version`` table, so the
+app only needs one primary-key read at startup to confirm the schema is current.
+
+Each migration must be safe to run against a database that was created by an
+older ``Base.metadata.create_all`` (tables, columns and indexes are only created
+when they are missing).
+"""
+import argparse
+from datetime import datetime
+import logging
+import os
+import sys
+from sqlalchemy import inspect, text, select, func, literal
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.engine import Connection, Engine
+from app.database import Base, engine, DATABASE_URL
+from app import models  # noqa: F401 - registers tables on Base.metadata
+
+logger = logging.getLogger(__name__)
+
+# Local SQLite databases are migrated on startup unless explicitly disabled
+AUTO_MIGRATE = os.getenv(
+    "AUTO_MIGRATE", "true" if DATABASE_URL.startswith("sqlite") else "false"
+).lower() in ("1", "true", "yes")
+
+MIGRATIONS = []
+
+
+class SchemaOutOfDate(RuntimeError):
+    """Raised when the database schema is older than the running code"""
+
+
+def migration(version: int, description: str):
+    """Register a migration function taking a Connection"""
+    def decorator(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+    return decorator
+
+
+def latest_version() -> int:
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def _create_tables(conn: Connection, *table_names: str):
+    tables = [Base.metadata.tables[name] for name in table_names]
+    Base.metadata.create_all(bind=conn, tables=tables, checkfirst=True)
+
+
+def _add_column(conn: Connection, table_name: str, column_name: str):
+    """Add a model column to an existing table if it is missing"""
+    existing = {c["name"] for c in inspect(conn).get_columns(table_name)}
+    if column_name in existing:
+        return
+    column = Base.metadata.tables[table_name].c[column_name]
+    column_type = column.type.compile(dialect=conn.dialect)
+    conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}"))
+
+
+def _create_index(conn: Connection, table_name: str, index_name: str):
+    """Create a model index if it is missing"""
+    index = next(i for i in Base.metadata.tables[table_name].indexes if i.name == index_name)
+    index.create(bind=conn, checkfirst=True)
+
+
+def _set_on_delete_cascade(conn: Connection, table_name: str, column_name: str):
+    """Make an existing foreign key cascade deletes, matching the model"""
+    fk = next(
+        fk for fk in inspect(conn).get_foreign_keys(table_name)
+        if fk["constrained_columns"] == [column_name]
+    )
+    if (fk.get("options") or {}).get("ondelete", "").upper() == "CASCADE":
+        return
+    referred = f"{fk['referred_table']}({', '.join(fk['referred_columns'])})"
+
+    if conn.dialect.name != "sqlite":
+        conn.execute(text(f"ALTER TABLE {table_name} DROP CONSTRAINT {fk['name']}"))
+        conn.execute(text(
+            f"ALTER TABLE {table_name} ADD CONSTRAINT {fk['name']} "
+            f"FOREIGN KEY ({column_name}) REFERENCES {referred} ON DELETE CASCADE"
+        ))
+        return
+
+    # SQLite cannot alter constraints: rebuild the table from the model and copy rows
+    old_name = f"{table_name}_old"
+    old_indexes = [i["name"] for i in inspect(conn).get_indexes(table_name)]
+    old_columns = {c["name"] for c in inspect(conn).get_columns(table_name)}
+    conn.execute(text(f"ALTER TABLE {table_name} RENAME TO {old_name}"))
+    for index_name in old_indexes:
+        conn.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
+    _create_tables(conn, table_name)
+    columns = ", ".join(c.name for c in Base.metadata.tables[table_name].columns if c.name in old_columns)
+    # Rows orphaned while foreign keys were not enforced are dropped
+    copied = conn.execute(text(
+        f"INSERT INTO {table_name} ({columns}) SELECT {columns} FROM {old_name} "
+        f"WHERE {column_name} IN (SELECT {', '.join(fk['referred_columns'])} FROM {fk['referred_table']})"
+    )).rowcount
+    total = conn.execute(text(f"SELECT COUNT(*) FROM {old_name}")).scalar()
+    if copied != total:
+        logger.warning("Dropped %s orphaned rows from %s", total - copied, table_name)
+    conn.execute(text(f"DROP TABLE {old_name}"))
+
+
+def _sqlite_autoincrement(conn: Connection, table_name: str, *retired_id_tables: str):
+    """
+    Rebuild a SQLite table with AUTOINCREMENT so ids are never reused.
+
+    The next id is set past every id in retired_id_tables (archive copies) and
+    in the table's tombstones. The rebuild needs foreign keys off, which SQLite
+    only allows outside a transaction, so it runs on its own connection and
+    commits separately. It is a no-op once the table has AUTOINCREMENT.
+    """
+    if conn.dialect.name != "sqlite":
+        return
+    ddl = conn.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table_name}
+    ).scalar()
+    if ddl is None or "AUTOINCREMENT" in ddl.upper():
+        return
+
+    table = Base.metadata.tables[table_name]
+    indexes = {i["name"] for i in inspect(conn).get_indexes(table_name)}
+    new_name = f"{table_name}_new"
+    create = str(CreateTable(table).compile(dialect=conn.dialect)).replace(
+        f"CREATE TABLE {table_name} ", f"CREATE TABLE {new_name} ", 1
+    )
+    old_columns = {c["name"] for c in inspect(conn).get_columns(table_name)}
+    columns = ", ".join(c.name for c in table.columns if c.name in old_columns)
+    floors = [f"(SELECT MAX(id) FROM {name})" for name in (table_name, *retired_id_tables)]
+    entity = {"patients": "patient", "care_team_assignments": "care_team_assignment",
+              "health_screenings": "health_screening"}[table_name]
+    floors.append(f"(SELECT MAX(entity_id) FROM tombstones WHERE entity = '{entity}')")
+
+    raw = conn.engine.raw_connection()
+    try:
+        driver = raw.driver_connection
+        driver.isolation_level = None
+        driver.execute("PRAGMA foreign_keys=OFF")
+        try:
+            driver.execute("BEGIN IMMEDIATE")
+            driver.execute(create)
+            driver.execute(f"INSERT INTO {new_name} ({columns}) SELECT {columns} FROM {table_name}")
+            driver.execute(f"DROP TABLE {table_name}")
+            driver.execute(f"ALTER TABLE {new_name} RENAME TO {table_name}")
+            driver.execute(f"DELETE FROM sqlite_sequence WHERE name = '{table_name}'")
+            driver.execute(
+                f"INSERT INTO sqlite_sequence (name, seq) "
+                f"SELECT '{table_name}', MAX({', '.join(f'COALESCE({f}, 0)' for f in floors)})"
+            )
+            if driver.execute("PRAGMA foreign_key_check").fetchall():
+                raise RuntimeError(f"Foreign key violations after rebuilding {table_name}")
+            driver.execute("COMMIT")
+        except Exception:
+            driver.execute("ROLLBACK")
+            raise
+        finally:
+            driver.execute("PRAGMA foreign_keys=ON")
+            driver.isolation_level = ""
+    finally:
+        raw.close()
+    # The old table's indexes were dropped with it; indexes it didn't have yet
+    # are left to the migrations that add them
+    for index in table.indexes:
+        if index.name in indexes:
+            index.create(bind=conn, checkfirst=True)
+
+
+# Migrations (append only - never edit a migration once it has shipped)
+@migration(1, "Baseline schema")
+def _baseline(conn: Connection):
+    _create_tables(
+        conn,
+        "patients",
+        "care_team_members",
+        "care_team_assignments",
+        "health_screenings",
+        "jobs",
+    )
+
+
+@migration(2, "Patient archive tables and partial indexes for active patients")
+def _patient_archive(conn: Connection):
+    _create_tables(
+        conn,
+        "patients_archive",
+        "care_team_assignments_archive",
+        "health_screenings_archive",
+    )
+    _create_index(conn, "patients", "ix_patients_active_name")
+    _create_index(conn, "patients", "ix_patients_status")
+
+
+@migration(3, "Per-status patient counters")
+def _patient_counts(conn: Connection):
+    _create_tables(conn, "patient_counts")
+    patients = Base.metadata.tables["patients"]
+    counts = Base.metadata.tables["patient_counts"]
+    actual = dict(conn.execute(
+        select(patients.c.status, func.count()).group_by(patients.c.status)
+    ).all())
+    existing = {row.status for row in conn.execute(select(counts.c.status))}
+    for status in models.PatientStatus:
+        if status not in existing:
+            conn.execute(counts.insert().values(status=status, count=actual.get(status, 0)))
+
+
+@migration(4, "Change tracking columns, change sequence and tombstones for delta sync")
+def _delta_sync(conn: Connection):
+    _create_tables(conn, "tombstones", "change_sequence")
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("CREATE SEQUENCE IF NOT EXISTS change_seq"))
+
+    sequence = Base.metadata.tables["change_sequence"]
+    for table_name in ("patients", "care_team_assignments", "health_screenings"):
+        _add_column(conn, table_name, "updated_at")
+        _add_column(conn, table_name, "change_seq")
+        table = Base.metadata.tables[table_name]
+        conn.execute(
+            table.update().where(table.c.updated_at.is_(None)).values(updated_at=func.now())
+        )
+        # Existing rows get sequence values so a full sync (since_seq=0) includes them
+        if conn.dialect.name == "postgresql":
+            conn.execute(text(
+                f"UPDATE {table_name} SET change_seq = nextval('change_seq') WHERE change_seq IS NULL"
+            ))
+        else:
+            base = conn.execute(select(sequence.c.value).where(sequence.c.id == 1)).scalar()
+            if base is None:
+                base = 0
+                conn.execute(sequence.insert().values(id=1, value=0))
+            conn.execute(
+                table.update().where(table.c.change_seq.is_(None)).values(change_seq=table.c.id + base)
+            )
+            top = conn.execute(select(func.max(table.c.change_seq))).scalar() or base
+            conn.execute(sequence.update().where(sequence.c.id == 1).values(value=max(base, top)))
+        _create_index(conn, table_name, f"ix_{table_name}_updated_at")
+        _create_index(conn, table_name, f"ix_{table_name}_change_seq")
+
+
+@migration(5, "Cascade patient deletes to assignments and screenings in the database")
+def _cascade_patient_deletes(conn: Connection):
+    _set_on_delete_cascade(conn, "care_team_assignments", "patient_id")
+    _set_on_delete_cascade(conn, "health_screenings", "patient_id")
+
+
+@migration(6, "Table generation counters for cache invalidation")
+def _table_generations(conn: Connection):
+    _create_tables(conn, "table_generations")
+    generations = Base.metadata.tables["table_generations"]
+    existing = set(conn.execute(select(generations.c.name)).scalars())
+    # Seed the rows up front so concurrent first writers only ever UPDATE them
+    for name in ("patients", "care_team_assignments", "health_screenings"):
+        if name not in existing:
+            conn.execute(generations.insert().values(name=name, generation=0))
+
+
+@migration(7, "Caseload index on care team assignments")
+def _caseload_index(conn: Connection):
+    _create_index(conn, "care_team_assignments", "ix_care_team_assignments_care_team_member_id")
+    generations = Base.metadata.tables["table_generations"]
+    if conn.execute(select(generations.c.name).where(generations.c.name == "care_team_members")).first() is None:
+        conn.execute(generations.insert().values(name="care_team_members", generation=0))
+
+
+@migration(8, "Screening history indexes for date-range pagination")
+def _screening_history_indexes(conn: Connection):
+    _create_index(conn, "health_screenings", "ix_health_screenings_patient_date")
+    _create_index(conn, "health_screenings", "ix_health_screenings_date_id")
+
+
+@migration(9, "Indexes for structured patient filters")
+def _patient_filter_indexes(conn: Connection):
+    for name in ("ix_patients_care_program_status", "ix_patients_enrollment_date", "ix_patients_date_of_birth"):
+        _create_index(conn, "patients", name)
+
+
+@migration(10, "Stored responses for idempotent requests")
+def _idempotency_keys(conn: Connection):
+    _create_tables(conn, "idempotency_keys")
+
+
+@migration(11, "Never reuse patient, assignment and screening ids (SQLite AUTOINCREMENT)")
+def _autoincrement_ids(conn: Connection):
+    _sqlite_autoincrement(conn, "patients", "patients_archive")
+    _sqlite_autoincrement(conn, "care_team_assignments", "care_team_assignments_archive")
+    _sqlite_autoincrement(conn, "health_screenings", "health_screenings_archive")
+
+
+@migration(12, "Lock-ordered change sequence and (change_seq, id) indexes for sync paging")
+def _ordered_change_sequence(conn: Connection):
+    # PostgreSQL took values from a native sequence; continue from it in the table
+    sequence = Base.metadata.tables["change_sequence"]
+    current = conn.execute(select(sequence.c.value).where(sequence.c.id == 1)).scalar()
+    if conn.dialect.name == "postgresql":
+        native = conn.execute(text("SELECT last_value FROM change_seq")).scalar()
+        current = max(current or 0, native or 0)
+    tables = ("patients", "care_team_assignments", "health_screenings", "tombstones")
+    for table_name in tables:
+        table = Base.metadata.tables[table_name]
+        top = conn.execute(select(func.max(table.c.change_seq))).scalar()
+        current = max(current or 0, top or 0)
+    conn.execute(sequence.delete())
+    conn.execute(sequence.insert().values(id=1, value=current or 0))
+
+    for table_name in tables:
+        _create_index(conn, table_name, f"ix_{table_name}_change_seq_id")
+
+
+@migration(13, "Index care_team_assignments.patient_id for cascaded deletes")
+def _assignment_patient_index(conn: Connection):
+    _create_index(conn, "care_team_assignments", "ix_care_team_assignments_patient_id")
+
+
+@migration(14, "Unique (patient_id, care_team_member_id) on care team assignments")
+def _unique_assignments(conn: Connection):
+    assignments = Base.metadata.tables["care_team_assignments"]
+    keep = (
+        select(func.min(assignments.c.id))
+        .group_by(assignments.c.patient_id, assignments.c.care_team_member_id)
+        .scalar_subquery()
+    )
+    duplicate = assignments.c.id.not_in(keep)
+    duplicates = conn.execute(select(func.count()).select_from(assignments).where(duplicate)).scalar()
+    if duplicates:
+        # Keep the oldest assignment of each pair; clients drop the rest on their next sync
+        sequence = Base.metadata.tables["change_sequence"]
+        seq = conn.execute(
+            sequence.update().where(sequence.c.id == 1).values(value=sequence.c.value + 1).returning(sequence.c.value)
+        ).scalar()
+        tombstones = Base.metadata.tables["tombstones"]
+        conn.execute(tombstones.insert().from_select(
+            ["entity", "entity_id", "patient_id", "reason", "change_seq", "deleted_at"],
+            select(
+                literal("care_team_assignment"), assignments.c.id, assignments.c.patient_id,
+                literal("deleted"), literal(seq), literal(datetime.utcnow()),
+            ).where(duplicate),
+        ))
+        conn.execute(assignments.delete().where(duplicate))
+        logger.info("Removed %s duplicate care team assignments", duplicates)
+    _create_index(conn, "care_team_assignments", "uq_care_team_assignments_patient_member")
+
+
+def current_version(conn: Connection) -> int:
+    """Return the applied schema version, or 0 for an unversioned database"""
+    if not inspect(conn).has_table("schema_version"):
+        return 0
+    version = conn.execute(text("SELECT version FROM schema_version")).scalar()
+    return version or 0
+
+
+def _set_version(conn: Connection, version: int):
+    updated = conn.execute(text("UPDATE schema_version SET version = :v"), {"v": version})
+    if updated.rowcount == 0:
+        conn.execute(text("INSERT INTO schema_version (version) VALUES (:v)"), {"v": version})
+
+
+def upgrade(bind: Engine = engine) -> int:
+    """Apply all pending migrations, each in its own transaction"""
+    with bind.begin() as conn:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"))
+        version = current_version(conn)
+
+    for target, description, func in MIGRATIONS:
+        if target <= version:
+            continue
+        logger.info("Applying migration %s: %s", target, description)
+        with bind.begin() as conn:
+            func(conn)
+            _set_version(conn, target)
+        version = target
+
+    return version
+
+
+def check(bind: Engine = engine):
+    """Cheap startup check: one read of schema_version, no reflection"""
+    try:
+        with bind.connect() as conn:
+            version = conn.execute(text("SELECT version FROM schema_version")).scalar() or 0
+    except Exception:
+        version = 0
+
+    if version < latest_version():
+        if AUTO_MIGRATE:
+            upgrade(bind)
+            return
+        raise SchemaOutOfDate(
+            f"Database schema is at version {version}, code expects {latest_version()}. "
+            "Run `python -m app.migrations` before starting the app."
+        )
+    if version > latest_version():
+        logger.warning(
+            "Database schema version %s is newer than this code (%s)", version, latest_version()
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply database schema migrations")
+    parser.add_argument("--check", action="store_true", help="Only report whether migrations are pending")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.check:
+        with engine.connect() as conn:
+            version = current_version(conn)
+        print(f"Schema version {version}, latest {latest_version()}")
+        sys.exit(0 if version >= latest_version() else 1)
+
+    version = upgrade()
+    print(f"✓ Database schema at version {version}")
+
+
+if __name__ == "__main__":
+    main()
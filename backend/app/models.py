@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey, Enum as SQLEnum
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Date, DateTime, Boolean, Text, JSON, LargeBinary, ForeignKey, Index, Enum as SQLEnum, text
 from sqlalchemy.orm import relationship
-from datetime import date
+from datetime import date, datetime
 import enum
 from app.database import Base
 
@@ -17,6 +17,14 @@ class CareTeamRole(str, enum.Enum):
     PSYCHIATRIST = "Psychiatrist"
 
 
+class JobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
 class Patient(Base):
     __tablename__ = "patients"
 
@@ -31,9 +39,33 @@ class Patient(Base):
     status = Column(SQLEnum(PatientStatus), default=PatientStatus.ACTIVE, nullable=False)
     care_program = Column(String)
 
-    # Relationships
-    care_team_assignments = relationship("CareTeamAssignment", back_populates="patient", cascade="all, delete-orphan")
-    health_screenings = relationship("HealthScreening", back_populates="patient", cascade="all, delete-orphan")
+    # Change tracking for delta sync (maintained by app.sync)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    change_seq = Column(BigInteger, index=True)
+
+    # Relationships (the database deletes children via ON DELETE CASCADE; they are never loaded to delete them)
+    care_team_assignments = relationship("CareTeamAssignment", back_populates="patient", cascade="all, delete-orphan", passive_deletes=True)
+    health_screenings = relationship("HealthScreening", back_populates="patient", cascade="all, delete-orphan", passive_deletes=True)
+
+    archived = False
+
+    __table_args__ = (
+        # Most screens only look at active patients; keep their index small
+        Index(
+            "ix_patients_active_name", "last_name", "first_name",
+            postgresql_where=text("status = 'ACTIVE'"),
+            sqlite_where=text("status = 'ACTIVE'"),
+        ),
+        Index("ix_patients_status", "status"),
+        # Structured list filters; care_program is usually combined with status
+        Index("ix_patients_care_program_status", "care_program", "status"),
+        Index("ix_patients_enrollment_date", "enrollment_date"),
+        Index("ix_patients_date_of_birth", "date_of_birth"),
+        # Delta sync pages by (change_seq, id)
+        Index("ix_patients_change_seq_id", "change_seq", "id"),
+        # Never reuse the id of a deleted or archived patient
+        {"sqlite_autoincrement": True},
+    )
 
     def __repr__(self):
         return f"<Patient {self.first_name} {self.last_name}>"
@@ -60,14 +92,26 @@ class CareTeamAssignment(Base):
     __tablename__ = "care_team_assignments"
 
     id = Column(Integer, primary_key=True, index=True)
-    patient_id = Column(Integer, ForeignKey("patients.id"), nullable=False)
-    care_team_member_id = Column(Integer, ForeignKey("care_team_members.id"), nullable=False)
+    # Indexed for cascaded patient deletes and per-patient lookups (PostgreSQL doesn't index foreign keys)
+    patient_id = Column(Integer, ForeignKey("patients.id", ondelete="CASCADE"), nullable=False, index=True)
+    care_team_member_id = Column(Integer, ForeignKey("care_team_members.id"), nullable=False, index=True)
     assigned_date = Column(Date, nullable=False, default=date.today)
 
+    # Change tracking for delta sync (maintained by app.sync)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    change_seq = Column(BigInteger, index=True)
+
     # Relationships
     patient = relationship("Patient", back_populates="care_team_assignments")
     care_team_member = relationship("CareTeamMember", back_populates="assignments")
 
+    __table_args__ = (
+        Index("ix_care_team_assignments_change_seq_id", "change_seq", "id"),
+        # A member is assigned to a patient at most once
+        Index("uq_care_team_assignments_patient_member", "patient_id", "care_team_member_id", unique=True),
+        {"sqlite_autoincrement": True},
+    )
+
     def __repr__(self):
         return f"<CareTeamAssignment Patient {self.patient_id} - Member {self.care_team_member_id}>"
 
@@ -76,12 +120,171 @@ class HealthScreening(Base):
     __tablename__ = "health_screenings"
 
     id = Column(Integer, primary_key=True, index=True)
-    patient_id = Column(Integer, ForeignKey("patients.id"), nullable=False)
+    patient_id = Column(Integer, ForeignKey("patients.id", ondelete="CASCADE"), nullable=False)
     screening_date = Column(Date, nullable=False)
     score = Column(Float, nullable=False)  # 0-10 scale
 
+    # Change tracking for delta sync (maintained by app.sync)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    change_seq = Column(BigInteger, index=True)
+
     # Relationships
     patient = relationship("Patient", back_populates="health_screenings")
 
+    __table_args__ = (
+        Index("ix_health_screenings_change_seq_id", "change_seq", "id"),
+        {"sqlite_autoincrement": True},
+    )
+
     def __repr__(self):
         return f"<HealthScreening Patient {self.patient_id} - Score {self.score} on {self.screening_date}>"
+
+
+# Screening history pages newest first, per patient and across patients
+Index(
+    "ix_health_screenings_patient_date",
+    HealthScreening.patient_id, HealthScreening.screening_date.desc(), HealthScreening.id.desc(),
+)
+Index("ix_health_screenings_date_id", HealthScreening.screening_date.desc(), HealthScreening.id.desc())
+
+
+class Tombstone(Base):
+    __tablename__ = "tombstones"
+
+    id = Column(Integer, primary_key=True, index=True)
+    entity = Column(String, nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    patient_id = Column(Integer)
+    reason = Column(String, nullable=False, default="deleted")  # "deleted" or "archived"
+    change_seq = Column(BigInteger, nullable=False, index=True)
+    deleted_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    __table_args__ = (Index("ix_tombstones_change_seq_id", "change_seq", "id"),)
+
+    def __repr__(self):
+        return f"<Tombstone {self.entity} {self.entity_id} at {self.change_seq}>"
+
+
+class ChangeSequence(Base):
+    # Single-row change sequence; its row lock orders writers (see app.sync)
+    __tablename__ = "change_sequence"
+
+    id = Column(Integer, primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
+
+
+class TableGeneration(Base):
+    # Bumped in the same transaction as every write to the named table (see app.generations)
+    __tablename__ = "table_generations"
+
+    name = Column(String, primary_key=True)
+    generation = Column(BigInteger, nullable=False, default=0)
+
+
+class PatientCount(Base):
+    __tablename__ = "patient_counts"
+
+    status = Column(SQLEnum(PatientStatus), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<PatientCount {self.status.value}: {self.count}>"
+
+
+# Archive tables: discharged patients are moved here (same ids) to keep the hot tables small
+class ArchivedPatient(Base):
+    __tablename__ = "patients_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    first_name = Column(String, nullable=False)
+    last_name = Column(String, nullable=False)
+    date_of_birth = Column(Date, nullable=False)
+    email = Column(String, index=True)
+    phone = Column(String)
+    address = Column(String)
+    enrollment_date = Column(Date, nullable=False)
+    status = Column(SQLEnum(PatientStatus), nullable=False)
+    care_program = Column(String)
+    archived_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    # Relationships
+    care_team_assignments = relationship("ArchivedCareTeamAssignment", back_populates="patient")
+    health_screenings = relationship(
+        "ArchivedHealthScreening", back_populates="patient",
+        order_by="ArchivedHealthScreening.screening_date.desc()"
+    )
+
+    archived = True
+
+    def __repr__(self):
+        return f"<ArchivedPatient {self.first_name} {self.last_name}>"
+
+
+class ArchivedCareTeamAssignment(Base):
+    __tablename__ = "care_team_assignments_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    patient_id = Column(Integer, ForeignKey("patients_archive.id"), nullable=False, index=True)
+    care_team_member_id = Column(Integer, ForeignKey("care_team_members.id"), nullable=False)
+    assigned_date = Column(Date, nullable=False)
+
+    # Relationships
+    patient = relationship("ArchivedPatient", back_populates="care_team_assignments")
+    care_team_member = relationship("CareTeamMember")
+
+    def __repr__(self):
+        return f"<ArchivedCareTeamAssignment Patient {self.patient_id} - Member {self.care_team_member_id}>"
+
+
+class ArchivedHealthScreening(Base):
+    __tablename__ = "health_screenings_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    patient_id = Column(Integer, ForeignKey("patients_archive.id"), nullable=False, index=True)
+    screening_date = Column(Date, nullable=False)
+    score = Column(Float, nullable=False)
+
+    # Relationships
+    patient = relationship("ArchivedPatient", back_populates="health_screenings")
+
+    def __repr__(self):
+        return f"<ArchivedHealthScreening Patient {self.patient_id} - Score {self.score} on {self.screening_date}>"
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False, index=True)
+    status = Column(SQLEnum(JobStatus), default=JobStatus.QUEUED, nullable=False, index=True)
+    params = Column(JSON)
+    progress_current = Column(Integer, default=0, nullable=False)
+    progress_total = Column(Integer)
+    message = Column(String)
+    result = Column(JSON)
+    error = Column(Text)
+    cancel_requested = Column(Boolean, default=False, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+    def __repr__(self):
+        return f"<Job {self.id} {self.kind} ({self.status.value})>"
+
+
+class IdempotencyKey(Base):
+    """Stored response for a request sent with an Idempotency-Key header (see app.idempotency)"""
+    __tablename__ = "idempotency_keys"
+
+    # sha256 of the client and its Idempotency-Key
+    key = Column(String(64), primary_key=True)
+    request_hash = Column(String(64), nullable=False)
+    # Null while the first request is still running
+    status_code = Column(Integer)
+    headers = Column(JSON)
+    body = Column(LargeBinary)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<IdempotencyKey {self.key[:12]} ({self.status_code or 'in progress'})>"
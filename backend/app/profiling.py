@@ -0,0 +1,222 @@
+"""
+Opt-in per-request profiling.
+
+A request is profiled when it sends ``X-Profile: 1`` together with a valid admin
+token (see app.auth), or when it is picked by PROFILE_SAMPLE_RATE (a fraction of
+requests, 0 by default). Other requests pay for one header lookup.
+
+Routes use ProfiledRoute, which wraps each endpoint so cProfile runs in the
+thread that executes it. For sync routes that is the threadpool worker, not the
+event loop, so the profile holds the request's own work (queries, ORM loading,
+serialization done in the endpoint) and nothing from requests interleaved on the
+loop.
+
+Each profile is saved to PROFILE_DIR as a pstats file (load it with
+``pstats.Stats``, snakeviz or gprof2dot), with a JSON sidecar describing the
+request. Only the newest PROFILE_MAX_FILES are kept. The response carries the
+profile id in X-Profile-Id.
+"""
+from contextvars import ContextVar
+import cProfile
+from datetime import datetime
+import functools
+import inspect
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from app import auth
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "100"))
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+# Don't profile the endpoints that serve profiles
+_EXCLUDED_PREFIX = "/api/admin/profiles"
+_ID = re.compile(r"^[0-9]{8}T[0-9]{12}-[0-9a-f]{8}$")
+
+_capture = ContextVar("profile_capture", default=None)
+_prune_lock = threading.Lock()
+
+
+def trigger_for(request: Request):
+    """'header', 'sampled' or None"""
+    if request.url.path.startswith(_EXCLUDED_PREFIX):
+        return None
+    if request.headers.get(PROFILE_HEADER, "").lower() in ("1", "true") and auth.is_admin(request):
+        return "header"
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+def _profiled(endpoint):
+    """Run the endpoint under the request's profiler, if it has one"""
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            profiler = _capture.get()
+            if profiler is None:
+                return await endpoint(*args, **kwargs)
+            profiler.enable()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                profiler.disable()
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            profiler = _capture.get()
+            if profiler is None:
+                return endpoint(*args, **kwargs)
+            profiler.enable()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                profiler.disable()
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """APIRoute that can profile individual requests"""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        # functools.wraps keeps the signature FastAPI reads parameters from
+        super().__init__(path, _profiled(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def profiled_handler(request: Request):
+            trigger = trigger_for(request)
+            if trigger is None:
+                return await handler(request)
+            # The context is copied into the threadpool, so the endpoint sees this profiler
+            profiler = cProfile.Profile()
+            token = _capture.set(profiler)
+            start = time.perf_counter()
+
+            async def finish(status_code: int):
+                _capture.reset(token)
+                if not profiler.getstats():
+                    # Rejected before the endpoint ran (e.g. validation errors)
+                    return None
+                # Writing and pruning files would block the event loop
+                return await run_in_threadpool(
+                    save, profiler, request, self.path_format, status_code,
+                    (time.perf_counter() - start) * 1000, trigger,
+                )
+
+            try:
+                response = await handler(request)
+            except HTTPException as exc:
+                profile_id = await finish(exc.status_code)
+                if profile_id:
+                    exc.headers = {**(exc.headers or {}), PROFILE_ID_HEADER: profile_id}
+                raise
+            except RequestValidationError:
+                await finish(422)
+                raise
+            except Exception:
+                await finish(500)
+                raise
+            profile_id = await finish(response.status_code)
+            if profile_id:
+                response.headers[PROFILE_ID_HEADER] = profile_id
+            return response
+
+        return profiled_handler
+
+
+def save(profiler: cProfile.Profile, request: Request, route: str, status_code: int,
+         duration_ms: float, trigger: str) -> str:
+    """Write the profile and its metadata; returns the profile id"""
+    now = datetime.utcnow()
+    profile_id = f"{now:%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profiler.dump_stats(os.path.join(PROFILE_DIR, profile_id + ".prof"))
+    metadata = {
+        "id": profile_id,
+        "method": request.method,
+        "path": request.url.path,
+        "query": request.url.query,
+        "route": route,
+        "status_code": status_code,
+        "duration_ms": round(duration_ms, 3),
+        "trigger": trigger,
+        "created_at": now.isoformat(),
+    }
+    with open(os.path.join(PROFILE_DIR, profile_id + ".json"), "w") as f:
+        json.dump(metadata, f)
+    _prune()
+    return profile_id
+
+
+def _prune():
+    with _prune_lock:
+        ids = sorted(name[:-5] for name in os.listdir(PROFILE_DIR) if name.endswith(".json"))
+        for profile_id in ids[:max(len(ids) - PROFILE_MAX_FILES, 0)]:
+            for suffix in (".prof", ".json"):
+                try:
+                    os.remove(os.path.join(PROFILE_DIR, profile_id + suffix))
+                except FileNotFoundError:
+                    pass
+
+
+def list_profiles(limit: int = 100) -> list:
+    """Profile metadata, newest first"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    ids = sorted((name[:-5] for name in os.listdir(PROFILE_DIR) if name.endswith(".json")), reverse=True)
+    profiles = []
+    for profile_id in ids[:limit]:
+        metadata = get_metadata(profile_id)
+        if metadata is not None:
+            profiles.append(metadata)
+    return profiles
+
+
+def get_metadata(profile_id: str):
+    if not _ID.match(profile_id):
+        return None
+    try:
+        with open(os.path.join(PROFILE_DIR, profile_id + ".json")) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def stats_path(profile_id: str):
+    """Path of the pstats file, or None if there is no such profile"""
+    if not _ID.match(profile_id):
+        return None
+    path = os.path.join(PROFILE_DIR, profile_id + ".prof")
+    return path if os.path.isfile(path) else None
+
+
+def top_functions(profile_id: str, sort: str = "cumulative", limit: int = 30) -> list:
+    """The profile's most expensive functions"""
+    stats = pstats.Stats(stats_path(profile_id))
+    stats.sort_stats(sort)
+    functions = []
+    for func in stats.fcn_list[:limit]:
+        primitive_calls, calls, total_time, cumulative_time, _ = stats.stats[func]
+        filename, line, name = func
+        functions.append({
+            "function": f"{filename}:{line}({name})",
+            "calls": calls,
+            "primitive_calls": primitive_calls,
+            "total_time_ms": round(total_time * 1000, 3),
+            "cumulative_time_ms": round(cumulative_time * 1000, 3),
+        })
+    return functions
@@ -0,0 +1,123 @@
+"""
+Per-worker cache of patient list and count results.
+
+The same filters (an unfiltered first page, ``status=active``, popular search
+terms) are requested over and over. Results are cached under a normalized key
+of the endpoint and its filter, paging and sort parameters. Every entry is
+tagged with the patients generation (see app.generations) it was read under,
+and a lookup first reads the current generation, so an entry is used only
+while no patient write has committed since. There is no per-key invalidation:
+any patient write moves the generation on, and the first request that sees the
+new generation drops every older entry at once.
+
+The generation is read before the result, in the same session. A write that
+commits between the two reads makes the entry newer than its tag, which only
+costs a miss. A session that reports an older generation than the cache holds
+(a lagging replica) bypasses the cache rather than flushing it.
+
+The cache is bounded by QUERY_CACHE_MAX_ENTRIES and QUERY_CACHE_MAX_BYTES, and
+evicts least recently used entries first. Hit, miss and eviction counters are
+available from ``snapshot()``.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+import os
+import threading
+
+QUERY_CACHE_ENABLED = os.getenv("QUERY_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "2000"))
+QUERY_CACHE_MAX_BYTES = int(os.getenv("QUERY_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+
+def key(endpoint: str, search=None, **params) -> tuple:
+    """A normalized cache key; parameters left unset don't affect it"""
+    # Searches match case-insensitively, and an empty search is no search
+    search = search.lower() if search else None
+    params = {name: value for name, value in params.items() if value is not None}
+    params["search"] = search
+    return (endpoint,) + tuple(sorted((name, str(value)) for name, value in params.items()))
+
+
+@dataclass
+class Stats:
+    hits: int = 0
+    misses: int = 0
+    # Entries dropped because patients changed
+    invalidated: int = 0
+    # Entries dropped to stay within the size limits
+    evictions: int = 0
+    # Lookups from a session behind the cache's generation
+    bypassed: int = 0
+
+
+class QueryCache:
+    def __init__(self, max_entries: int = QUERY_CACHE_MAX_ENTRIES, max_bytes: int = QUERY_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.generation = None
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.stats = Stats()
+        self._lock = threading.Lock()
+
+    def _advance(self, generation) -> bool:
+        """Adopt a newer generation; False if the caller's generation is older"""
+        if self.generation is None or generation > self.generation:
+            self.stats.invalidated += len(self.entries)
+            self.entries.clear()
+            self.bytes = 0
+            self.generation = generation
+        return generation == self.generation
+
+    def get(self, cache_key: tuple, generation):
+        """The cached value, or None on a miss"""
+        with self._lock:
+            if not self._advance(generation):
+                self.stats.bypassed += 1
+                return None
+            entry = self.entries.get(cache_key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            self.entries.move_to_end(cache_key)
+            self.stats.hits += 1
+            return entry[0]
+
+    def put(self, cache_key: tuple, generation, value, size: int):
+        with self._lock:
+            if not self._advance(generation) or size > self.max_bytes:
+                return
+            old = self.entries.pop(cache_key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self.entries[cache_key] = (value, size)
+            self.bytes += size
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.stats.evictions += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lookups = self.stats.hits + self.stats.misses
+            return {
+                "enabled": QUERY_CACHE_ENABLED,
+                "generation": self.generation[0] if self.generation else None,
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.stats.hits,
+                "misses": self.stats.misses,
+                "hit_rate": round(self.stats.hits / lookups, 4) if lookups else None,
+                "invalidated": self.stats.invalidated,
+                "evictions": self.stats.evictions,
+                "bypassed": self.stats.bypassed,
+            }
+
+
+patients = QueryCache()
+
+
+def snapshot() -> dict:
+    return patients.snapshot()
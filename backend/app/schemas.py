@@ -1,7 +1,7 @@
-from pydantic import BaseModel, EmailStr, Field
-from datetime import date
-from typing import Optional, List
-from app.models import PatientStatus, CareTeamRole
+from pydantic import BaseModel, EmailStr, Field, model_validator
+from datetime import date, datetime
+from typing import Optional, List, Dict, Any, Literal
+from app.models import PatientStatus, CareTeamRole, JobStatus
 
 
 # Patient Schemas
@@ -35,12 +35,113 @@ class PatientUpdate(BaseModel):
 
 class PatientResponse(PatientBase):
     id: int
+    updated_at: Optional[datetime] = None
+    change_seq: Optional[int] = None
 
     class Config:
         from_attributes = True
 
 
+class PatientSuggestion(BaseModel):
+    id: int
+    first_name: str
+    last_name: str
+    email: Optional[str] = None
+    phone: Optional[str] = None
+    status: PatientStatus
+
+
+class PatientCountResponse(BaseModel):
+    count: int
+    # False when the count stopped at the cap; render it as "count+"
+    exact: bool = True
+    # Planner row estimate for inexact counts (PostgreSQL only)
+    estimate: Optional[int] = None
+
+
+class PatientFilter(BaseModel):
+    search: Optional[str] = None
+    status: Optional[PatientStatus] = None
+    care_program: Optional[str] = None
+    enrolled_from: Optional[date] = None
+    enrolled_to: Optional[date] = None
+    age_min: Optional[int] = Field(None, ge=0, le=150)
+    age_max: Optional[int] = Field(None, ge=0, le=150)
+
+    @model_validator(mode="after")
+    def require_criteria(self):
+        if all(value is None for value in self.model_dump().values()):
+            raise ValueError("filter needs at least one criterion")
+        if self.age_min is not None and self.age_max is not None and self.age_min > self.age_max:
+            raise ValueError("age_min must not be greater than age_max")
+        return self
+
+
+class PatientSelection(BaseModel):
+    # Exactly one of ids or filter
+    ids: Optional[List[int]] = Field(None, min_length=1, max_length=10000)
+    filter: Optional[PatientFilter] = None
+
+    @model_validator(mode="after")
+    def require_one_selector(self):
+        if (self.ids is None) == (self.filter is None):
+            raise ValueError("provide exactly one of ids or filter")
+        return self
+
+
+class PatientBulkChanges(BaseModel):
+    # Only these fields can be changed in bulk; care_program may be set to null
+    status: Optional[PatientStatus] = None
+    care_program: Optional[str] = None
+
+    @model_validator(mode="after")
+    def require_changes(self):
+        if not self.model_fields_set:
+            raise ValueError("changes must set at least one field")
+        if "status" in self.model_fields_set and self.status is None:
+            raise ValueError("status cannot be null")
+        return self
+
+
+class PatientBulkUpdate(PatientSelection):
+    changes: PatientBulkChanges
+
+
+class PatientBulkUpdateResponse(BaseModel):
+    updated: int
+    # Requested ids that did not match a patient
+    not_found: List[int] = []
+
+
+class PatientBulkDeleteResponse(BaseModel):
+    deleted: int
+    care_team_assignments_deleted: int
+    health_screenings_deleted: int
+    not_found: List[int] = []
+
+
+class PatientBulkCreate(BaseModel):
+    # Validated one by one, so one bad row doesn't reject the batch
+    patients: List[Dict[str, Any]] = Field(min_length=1, max_length=1000)
+
+
+class PatientBulkCreateResult(BaseModel):
+    index: int
+    # created, exists (email already registered), duplicate (email repeated in this batch) or invalid
+    status: Literal["created", "exists", "duplicate", "invalid"]
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+
+class PatientBulkCreateResponse(BaseModel):
+    created: int
+    existing: int
+    invalid: int
+    results: List[PatientBulkCreateResult]
+
+
 class PatientDetailResponse(PatientResponse):
+    archived: bool = False
     care_team_assignments: List["CareTeamAssignmentResponse"] = []
     health_screenings: List["HealthScreeningResponse"] = []
 
@@ -82,12 +183,110 @@ class CareTeamAssignmentResponse(BaseModel):
     patient_id: int
     care_team_member_id: int
     assigned_date: date
+    updated_at: Optional[datetime] = None
+    change_seq: Optional[int] = None
     care_team_member: CareTeamMemberResponse
 
     class Config:
         from_attributes = True
 
 
+# Care Team Recommendation Schemas
+class CareTeamRecommendation(BaseModel):
+    role: CareTeamRole
+    care_team_member: CareTeamMemberResponse
+    # Patients assigned to the member before this pick
+    caseload: int
+
+
+class PatientCareTeamRecommendations(BaseModel):
+    # None for hypothetical new patients
+    patient_id: Optional[int] = None
+    recommendations: List[CareTeamRecommendation]
+
+
+class CareTeamRecommendationRequest(BaseModel):
+    # Exactly one of patient_ids (existing patients) or count (new patients)
+    patient_ids: Optional[List[int]] = Field(None, min_length=1, max_length=1000)
+    count: Optional[int] = Field(None, ge=1, le=1000)
+    roles: Optional[List[CareTeamRole]] = None
+
+    @model_validator(mode="after")
+    def require_one_selector(self):
+        if (self.patient_ids is None) == (self.count is None):
+            raise ValueError("provide exactly one of patient_ids or count")
+        return self
+
+
+class CareTeamAutoAssignRequest(BaseModel):
+    patient_ids: List[int] = Field(min_length=1, max_length=1000)
+    # Roles to fill; defaults to every role. Roles a patient already has are skipped.
+    roles: Optional[List[CareTeamRole]] = None
+    assigned_date: Optional[date] = None
+
+
+class CareTeamAssignmentPair(BaseModel):
+    patient_id: int
+    care_team_member_id: int
+
+
+class CareTeamAutoAssignResponse(BaseModel):
+    assigned: int
+    assignments: List["SyncCareTeamAssignment"]
+    # Picks that were already assigned by a concurrent request
+    skipped: List[CareTeamAssignmentPair] = []
+    not_found: List[int] = []
+
+
+class CareTeamBulkSelection(BaseModel):
+    # Either one member and many patients, or one patient and many members
+    care_team_member_id: Optional[int] = None
+    patient_ids: Optional[List[int]] = Field(None, min_length=1, max_length=1000)
+    patient_id: Optional[int] = None
+    care_team_member_ids: Optional[List[int]] = Field(None, min_length=1, max_length=1000)
+
+    @model_validator(mode="after")
+    def require_one_shape(self):
+        by_member = (self.care_team_member_id, self.patient_ids)
+        by_patient = (self.patient_id, self.care_team_member_ids)
+        if not (
+            (None not in by_member and by_patient == (None, None))
+            or (None not in by_patient and by_member == (None, None))
+        ):
+            raise ValueError("provide either care_team_member_id with patient_ids, or patient_id with care_team_member_ids")
+        return self
+
+    def pairs(self) -> list:
+        """(patient_id, care_team_member_id) pairs in request order, without repeats"""
+        if self.patient_ids is not None:
+            return list(dict.fromkeys((patient_id, self.care_team_member_id) for patient_id in self.patient_ids))
+        return list(dict.fromkeys((self.patient_id, member_id) for member_id in self.care_team_member_ids))
+
+
+class CareTeamBulkAssign(CareTeamBulkSelection):
+    assigned_date: Optional[date] = None
+
+
+class CareTeamBulkResult(BaseModel):
+    patient_id: int
+    care_team_member_id: int
+    status: Literal[
+        "assigned", "already_assigned", "unassigned", "not_assigned", "patient_not_found", "member_not_found"
+    ]
+    # The new, existing or deleted assignment
+    assignment_id: Optional[int] = None
+
+
+class CareTeamBulkAssignResponse(BaseModel):
+    assigned: int
+    results: List[CareTeamBulkResult]
+
+
+class CareTeamBulkUnassignResponse(BaseModel):
+    unassigned: int
+    results: List[CareTeamBulkResult]
+
+
 # Health Screening Schemas
 class HealthScreeningBase(BaseModel):
     patient_id: int
@@ -101,6 +300,201 @@ class HealthScreeningCreate(HealthScreeningBase):
 
 class HealthScreeningResponse(HealthScreeningBase):
     id: int
+    updated_at: Optional[datetime] = None
+    change_seq: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+
+class HealthScreeningReviewItem(HealthScreeningResponse):
+    first_name: str
+    last_name: str
+    care_program: Optional[str] = None
+
+
+class HealthScreeningPage(BaseModel):
+    items: List[HealthScreeningReviewItem]
+    # Pass back as cursor for the next page; null on the last page
+    next_cursor: Optional[str] = None
+
+
+# Delta Sync Schemas
+class SyncCareTeamAssignment(CareTeamAssignmentBase):
+    id: int
+    updated_at: Optional[datetime] = None
+    change_seq: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+
+class TombstoneResponse(BaseModel):
+    entity: str
+    entity_id: int
+    patient_id: Optional[int] = None
+    reason: str
+    change_seq: int
+    deleted_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class SyncChangesResponse(BaseModel):
+    patients: List[PatientResponse]
+    care_team_assignments: List[SyncCareTeamAssignment]
+    health_screenings: List[HealthScreeningResponse]
+    tombstones: List[TombstoneResponse]
+    # Store once has_more is false, and pass back as since_seq for the next sync
+    next_seq: int
+    # Pass back as cursor to fetch the next page while has_more is true
+    next_cursor: Optional[str] = None
+    has_more: bool
+
+
+# Analytics Schemas
+class ScoreBin(BaseModel):
+    start: float
+    end: float
+    count: int
+
+
+class ScoreDistributionResponse(BaseModel):
+    count: int
+    mean: Optional[float] = None
+    std: Optional[float] = None
+    bins: List[ScoreBin]
+    # e.g. {"p50": 6.2}
+    percentiles: Dict[str, Optional[float]]
+
+
+class CohortScoreStats(BaseModel):
+    cohort: str
+    patients: int
+    mean: float
+    std: float
+
+
+class PatientZScore(BaseModel):
+    patient_id: int
+    cohort: str
+    score: float
+    screening_date: date
+    z_score: float
+
+
+class ScoreZScoresResponse(BaseModel):
+    cohort_field: str
+    cohorts: List[CohortScoreStats]
+    patients: List[PatientZScore]
+
+
+# Archive Schemas
+class ArchiveRequest(BaseModel):
+    batch_size: int = Field(500, ge=1, le=10000)
+
+
+# Snapshot Schemas
+class SnapshotRequest(BaseModel):
+    tables: Optional[List[Literal["patients", "care_team_assignments", "health_screenings"]]] = None
+    name: Optional[str] = Field(None, pattern=r"^[A-Za-z0-9][A-Za-z0-9_.-]*$", max_length=100)
+    format: Optional[Literal["parquet", "arrow"]] = None
+    # Incremental snapshots: only rows in these id / date ranges (inclusive)
+    id_from: Optional[int] = None
+    id_to: Optional[int] = None
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+
+
+class SnapshotTableFile(BaseModel):
+    file: str
+    rows: int
+    max_id: Optional[int] = None
+
+
+class SnapshotResponse(BaseModel):
+    name: str
+    format: str
+    created_at: datetime
+    id_from: Optional[int] = None
+    id_to: Optional[int] = None
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    tables: Dict[str, SnapshotTableFile]
+
+
+# Profiling Schemas
+class ProfileResponse(BaseModel):
+    id: str
+    method: str
+    path: str
+    query: str = ""
+    route: str
+    status_code: int
+    duration_ms: float
+    trigger: str
+    created_at: datetime
+
+
+class ProfileFunction(BaseModel):
+    function: str
+    calls: int
+    primitive_calls: int
+    total_time_ms: float
+    cumulative_time_ms: float
+
+
+class ProfileDetailResponse(ProfileResponse):
+    functions: List[ProfileFunction]
+
+
+# Admission Control Schemas
+class AdmissionStatsResponse(BaseModel):
+    max_concurrency: int
+    max_queue: int
+    in_flight: int
+    queue_depth: int
+    max_queue_depth: int
+    admitted: int
+    rejected_queue_full: int
+    rejected_queue_timeout: int
+    # Rejections per budget ("default", "expensive")
+    rate_limited: dict
+    rate_limit_clients: int
+
+
+class QueryCacheStatsResponse(BaseModel):
+    enabled: bool
+    # Patients generation the entries were read under
+    generation: Optional[int] = None
+    entries: int
+    bytes: int
+    max_entries: int
+    max_bytes: int
+    hits: int
+    misses: int
+    hit_rate: Optional[float] = None
+    invalidated: int
+    evictions: int
+    bypassed: int
+
+
+# Job Schemas
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    status: JobStatus
+    params: Optional[dict] = None
+    progress_current: int
+    progress_total: Optional[int] = None
+    message: Optional[str] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    cancel_requested: bool
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -109,3 +503,4 @@ class HealthScreeningResponse(HealthScreeningBase):
 # Update forward references
 PatientDetailResponse.model_rebuild()
 CareTeamAssignmentResponse.model_rebuild()
+CareTeamAutoAssignResponse.model_rebuild()
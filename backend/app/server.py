@@ -0,0 +1,26 @@
+"""
+Production server helpers used by gunicorn.conf.py.
+"""
+import os
+from uvicorn.workers import UvicornWorker
+
+
+def available_cpus() -> int:
+    """CPUs this process may run on (respects container CPU affinity)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def worker_count() -> int:
+    """Worker processes: WEB_CONCURRENCY if set, else one per CPU capped at MAX_WORKERS"""
+    if os.getenv("WEB_CONCURRENCY"):
+        return max(1, int(os.getenv("WEB_CONCURRENCY")))
+    return max(1, min(available_cpus(), int(os.getenv("MAX_WORKERS", "8"))))
+
+
+class TunedUvicornWorker(UvicornWorker):
+    """Uvicorn worker pinned to the uvloop event loop and httptools parser"""
+
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools"}
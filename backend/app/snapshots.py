@@ -0,0 +1,355 @@
+"""
+Columnar snapshots of patients, care team assignments and screenings.
+
+``export`` streams each table from the database in chunks of SNAPSHOT_CHUNK_SIZE
+rows (``yield_per``) and writes each chunk as one Parquet row group or Arrow IPC
+record batch. Memory use stays flat regardless of table size. The Arrow schema
+comes from the table definitions, not from the data, so every chunk and every
+snapshot of a table has the same column types. That holds even when a chunk is
+empty or all-null. A snapshot can be limited to an id range and a date range
+(the table's own date column), so incremental snapshots only export new rows.
+
+Snapshots are written to SNAPSHOT_DIR/<name>/, one file per table plus a
+manifest.json with row counts, ranges and the highest id exported. Files are
+renamed into place only once complete. The default name is the UTC time plus a
+random suffix, so exports started in the same second don't collide. Only the
+newest SNAPSHOT_KEEP snapshots are kept, plus the full snapshot (and the
+incrementals in between) that the oldest kept incremental builds on. ``load``
+reads them back memory-mapped, so analytics jobs work from the files and never
+touch the OLTP database.
+
+The export reads from a replica when one is configured, in a single
+transaction, so the tables are consistent with each other.
+
+pyarrow is optional and imported on first use; without it the loader and export
+raise SnapshotsUnavailable.
+
+    python -m app.snapshots export --tables health_screenings --id-from 500001
+    python -m app.snapshots list
+"""
+import argparse
+from datetime import date, datetime
+import importlib.util
+import json
+import os
+import re
+import secrets
+import shutil
+import threading
+from sqlalchemy import select, types
+from sqlalchemy.orm import Session
+from app.database import SessionLocal, replica_engines
+from app.models import Patient, CareTeamAssignment, HealthScreening
+
+# pyarrow and pyarrow.parquet, once _require_pyarrow has imported them
+pa = pq = None
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "./snapshots")
+SNAPSHOT_CHUNK_SIZE = int(os.getenv("SNAPSHOT_CHUNK_SIZE", "100000"))
+SNAPSHOT_FORMAT = os.getenv("SNAPSHOT_FORMAT", "parquet")
+SNAPSHOT_COMPRESSION = os.getenv("SNAPSHOT_COMPRESSION", "zstd")
+# How many snapshots to keep; older ones are deleted after each export (0 keeps all)
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", "20"))
+
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+# table name -> (model, column used for date ranges)
+TABLES = {
+    "patients": (Patient, "enrollment_date"),
+    "care_team_assignments": (CareTeamAssignment, "assigned_date"),
+    "health_screenings": (HealthScreening, "screening_date"),
+}
+
+_MANIFEST = "manifest.json"
+_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]*$")
+_prune_lock = threading.Lock()
+
+
+class SnapshotsUnavailable(RuntimeError):
+    """Raised when pyarrow is not installed"""
+
+
+def available() -> bool:
+    """Whether pyarrow is installed, without importing it"""
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _require_pyarrow():
+    global pa, pq
+    if pa is not None:
+        return
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise SnapshotsUnavailable("Snapshots need pyarrow (pip install pyarrow)")
+    pa, pq = pyarrow, pyarrow.parquet
+
+
+def _arrow_type(column):
+    column_type = column.type
+    if isinstance(column_type, types.Enum):
+        return pa.string()
+    if isinstance(column_type, types.DateTime):
+        return pa.timestamp("us")
+    if isinstance(column_type, types.Date):
+        return pa.date32()
+    if isinstance(column_type, types.Float):
+        return pa.float64()
+    if isinstance(column_type, types.Integer):
+        return pa.int64()
+    if isinstance(column_type, types.Boolean):
+        return pa.bool_()
+    return pa.string()
+
+
+def schema_for(table: str):
+    """Arrow schema of a table's snapshot files, derived from the model"""
+    _require_pyarrow()
+    columns = TABLES[table][0].__table__.columns
+    return pa.schema([pa.field(c.name, _arrow_type(c), nullable=c.nullable) for c in columns])
+
+
+def _to_batch(rows, columns, schema):
+    arrays = []
+    for i, (column, field) in enumerate(zip(columns, schema)):
+        values = [row[i] for row in rows]
+        if isinstance(column.type, types.Enum):
+            values = [getattr(v, "value", v) for v in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class _Writer:
+    """Chunked writer for one table file in either format"""
+
+    def __init__(self, path: str, schema, file_format: str):
+        if file_format == "parquet":
+            self._writer = pq.ParquetWriter(path, schema, compression=SNAPSHOT_COMPRESSION)
+        else:
+            # Uncompressed IPC files memory-map with zero copies
+            self._writer = pa.ipc.new_file(path, schema)
+        self._parquet = file_format == "parquet"
+
+    def write(self, batch):
+        if self._parquet:
+            self._writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            self._writer.write_batch(batch)
+
+    def close(self):
+        self._writer.close()
+
+
+def _export_table(db: Session, table: str, directory: str, file_format: str,
+                  id_range: tuple, date_range: tuple, on_chunk=None) -> dict:
+    model, date_column = TABLES[table]
+    columns = list(model.__table__.columns)
+    schema = schema_for(table)
+    statement = select(*columns).order_by(model.__table__.c.id)
+    id_column, day_column = model.__table__.c.id, model.__table__.c[date_column]
+    if id_range[0] is not None:
+        statement = statement.where(id_column >= id_range[0])
+    if id_range[1] is not None:
+        statement = statement.where(id_column <= id_range[1])
+    if date_range[0] is not None:
+        statement = statement.where(day_column >= date_range[0])
+    if date_range[1] is not None:
+        statement = statement.where(day_column <= date_range[1])
+
+    path = os.path.join(directory, table + FORMATS[file_format])
+    partial = path + ".partial"
+    writer = _Writer(partial, schema, file_format)
+    rows = 0
+    max_id = None
+    try:
+        result = db.execute(statement.execution_options(yield_per=SNAPSHOT_CHUNK_SIZE))
+        for partition in result.partitions():
+            writer.write(_to_batch(partition, columns, schema))
+            rows += len(partition)
+            max_id = partition[-1].id
+            if on_chunk:
+                on_chunk(table, rows)
+    finally:
+        writer.close()
+    os.replace(partial, path)
+    return {"file": os.path.basename(path), "rows": rows, "max_id": max_id}
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def export(tables=None, name: str = None, file_format: str = None, id_from: int = None, id_to: int = None,
+           date_from: date = None, date_to: date = None, db: Session = None, on_chunk=None) -> dict:
+    """Write a snapshot of the given tables (default all); returns its manifest"""
+    _require_pyarrow()
+    tables = list(tables or TABLES)
+    unknown = set(tables) - set(TABLES)
+    if unknown:
+        raise ValueError(f"Unknown snapshot tables: {', '.join(sorted(unknown))}")
+    file_format = file_format or SNAPSHOT_FORMAT
+    if file_format not in FORMATS:
+        raise ValueError(f"Unknown snapshot format: {file_format}")
+    name = name or f"{datetime.utcnow():%Y%m%dT%H%M%SZ}-{secrets.token_hex(4)}"
+    if not _NAME.match(name):
+        raise ValueError(f"Invalid snapshot name: {name}")
+    directory = os.path.join(SNAPSHOT_DIR, name)
+
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    try:
+        # Claims the name atomically, even against another worker's export
+        os.mkdir(directory)
+    except FileExistsError:
+        raise ValueError(f"Snapshot already exists: {name}")
+
+    own_session = db is None
+    if own_session:
+        db = SessionLocal()
+        # Keep the export's long scans off the primary when a replica exists
+        db.info["read_only"] = bool(replica_engines)
+    try:
+        if db.get_bind().dialect.name == "postgresql":
+            # One snapshot across all tables, without blocking writers
+            db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        files = {
+            table: _export_table(db, table, directory, file_format, (id_from, id_to), (date_from, date_to), on_chunk)
+            for table in tables
+        }
+    except BaseException:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+    finally:
+        if own_session:
+            db.close()
+
+    manifest = {
+        "name": name,
+        "format": file_format,
+        "created_at": datetime.utcnow().isoformat(),
+        "id_from": id_from,
+        "id_to": id_to,
+        "date_from": _isoformat(date_from),
+        "date_to": _isoformat(date_to),
+        "tables": files,
+    }
+    with open(os.path.join(directory, _MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    prune()
+    return manifest
+
+
+def list_snapshots() -> list:
+    """Manifests of all complete snapshots, oldest first"""
+    if not os.path.isdir(SNAPSHOT_DIR):
+        return []
+    manifests = []
+    for name in os.listdir(SNAPSHOT_DIR):
+        path = os.path.join(SNAPSHOT_DIR, name, _MANIFEST)
+        if os.path.isfile(path):
+            with open(path) as f:
+                manifests.append(json.load(f))
+    return sorted(manifests, key=lambda m: (m["created_at"], m["name"]))
+
+
+def is_full(manifest: dict) -> bool:
+    """A snapshot without id or date ranges; incremental snapshots build on the last full one"""
+    return all(manifest.get(key) is None for key in ("id_from", "id_to", "date_from", "date_to"))
+
+
+def prune(keep: int = None) -> list:
+    """
+    Delete snapshots older than the newest ``keep`` (default SNAPSHOT_KEEP);
+    returns the deleted names.
+
+    Whole chains are kept: if the oldest retained snapshot is incremental, the
+    full snapshot it builds on and everything after it are kept too, so every
+    retained incremental can still be loaded on top of its base.
+    """
+    keep = SNAPSHOT_KEEP if keep is None else keep
+    if keep <= 0:
+        return []
+    with _prune_lock:
+        manifests = list_snapshots()
+        start = max(len(manifests) - keep, 0)
+        while start > 0 and not is_full(manifests[start]):
+            start -= 1
+        expired = [m["name"] for m in manifests[:start]]
+        for name in expired:
+            shutil.rmtree(os.path.join(SNAPSHOT_DIR, name), ignore_errors=True)
+    return expired
+
+
+def _read_file(path: str, columns=None):
+    if path.endswith(FORMATS["arrow"]):
+        with pa.memory_map(path) as source:
+            table = pa.ipc.open_file(source).read_all()
+        return table.select(columns) if columns else table
+    return pq.read_table(path, columns=columns, memory_map=True)
+
+
+def load(table: str, snapshots=None, columns=None):
+    """
+    Read a table back from snapshots as one pyarrow Table, memory-mapped.
+
+    snapshots is a list of snapshot names, e.g. a full snapshot followed by
+    incremental ones. Their files share a schema and are concatenated without
+    copying. By default only the newest snapshot that includes the table is read.
+    """
+    _require_pyarrow()
+    if table not in TABLES:
+        raise ValueError(f"Unknown snapshot table: {table}")
+    manifests = {m["name"]: m for m in list_snapshots()}
+    if snapshots is None:
+        names = [name for name, m in manifests.items() if table in m["tables"]][-1:]
+    else:
+        names = snapshots
+    parts = []
+    for name in names:
+        if name not in manifests:
+            raise ValueError(f"Unknown snapshot: {name}")
+        entry = manifests[name]["tables"].get(table)
+        if entry:
+            parts.append(_read_file(os.path.join(SNAPSHOT_DIR, name, entry["file"]), columns))
+    if not parts:
+        schema = schema_for(table)
+        return schema.empty_table() if columns is None else schema.empty_table().select(columns)
+    return pa.concat_tables(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export and list columnar snapshots")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="Write a new snapshot")
+    export_parser.add_argument("--tables", nargs="+", choices=list(TABLES), help="Tables to export (default all)")
+    export_parser.add_argument("--name", help="Snapshot name (default: UTC timestamp and a random suffix)")
+    export_parser.add_argument("--format", choices=list(FORMATS), default=SNAPSHOT_FORMAT)
+    export_parser.add_argument("--id-from", type=int)
+    export_parser.add_argument("--id-to", type=int)
+    export_parser.add_argument("--date-from", type=date.fromisoformat)
+    export_parser.add_argument("--date-to", type=date.fromisoformat)
+    commands.add_parser("list", help="List snapshots")
+    prune_parser = commands.add_parser("prune", help="Delete all but the newest snapshots")
+    prune_parser.add_argument("--keep", type=int, default=SNAPSHOT_KEEP)
+    args = parser.parse_args()
+
+    if args.command == "prune":
+        for name in prune(args.keep):
+            print(f"  deleted {name}")
+        return
+
+    if args.command == "list":
+        for manifest in list_snapshots():
+            rows = ", ".join(f"{t} {e['rows']}" for t, e in manifest["tables"].items())
+            print(f"{manifest['name']} ({manifest['format']}): {rows}")
+        return
+
+    manifest = export(
+        args.tables, args.name, args.format, args.id_from, args.id_to, args.date_from, args.date_to,
+        on_chunk=lambda table, rows: print(f"  {table}: {rows} rows"),
+    )
+    print(f"✓ Snapshot {manifest['name']} written to {os.path.join(SNAPSHOT_DIR, manifest['name'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Streaming JSON array responses for large result sets.
+
+``json_array`` runs a statement with ``yield_per`` (a server-side cursor on
+PostgreSQL) and writes the rows as a JSON array, one chunk of STREAM_CHUNK_SIZE
+rows at a time. Only one chunk of rows and its JSON text are in memory at once,
+however many rows the response has. Each chunk is a single write, so the
+threadpool handoff per write is amortized over the chunk.
+
+The stream opens its own session when iteration starts and closes it when the
+stream ends or the client disconnects. It doesn't depend on the request's
+session staying open. Errors after the first chunk can't change the status
+code; the array is left unterminated, so clients see invalid JSON rather than
+a silently short result.
+"""
+import logging
+import os
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "1000"))
+
+
+def json_array(statement, to_json, read_only: bool = False, chunk_size: int = STREAM_CHUNK_SIZE):
+    """Yield a JSON array of to_json(row) for each row the statement returns"""
+    db = SessionLocal()
+    db.info["read_only"] = read_only
+    try:
+        result = db.execute(statement.execution_options(yield_per=chunk_size))
+        yield "["
+        separator = ""
+        for partition in result.partitions():
+            yield separator + ",".join(to_json(row) for row in partition)
+            separator = ","
+        yield "]"
+    except Exception:
+        logger.exception("Streaming response failed")
+        raise
+    finally:
+        db.close()
@@ -0,0 +1,212 @@
+"""
+Change tracking for delta sync.
+
+Patients, care team assignments and health screenings carry ``updated_at`` and
+``change_seq``. Every write takes the next value from one database-wide change
+sequence, the single-row ``change_sequence`` table. Deletes leave a row in
+``tombstones`` carrying its own sequence value.
+
+Taking a value updates that row, and the row stays locked until the writing
+transaction ends (on SQLite the whole database is locked anyway). Writers
+therefore commit in sequence order, and the committed value of the row is a
+safe watermark: every change at or below it is committed and visible. A sync
+page never goes past the watermark it read before its queries, so a
+transaction that took a lower value but committed later can't be skipped.
+Native PostgreSQL sequences don't give this guarantee; nextval() takes no
+lock, so transactions can commit out of order.
+
+The lock also makes the change sequence the first lock every tracked write
+takes, so patient rows and counters are always locked after it.
+
+The cost is that tracked writes are serialized: a write waits for every
+earlier writer's whole transaction. Long jobs therefore commit in batches, each
+taking its own value (archival per ``batch_size`` patients, seeding per
+SEED_BATCH_SIZE rows), so single edits get a turn between batches. A bulk
+update or delete is one statement and holds the lock until it commits. Measured
+on SQLite with one CPU, that is about 25 us per updated patient (100k patients:
+about 2.5 s) and about 0.3 ms per deleted patient with 25 screenings. Single
+edits queued behind it wait that long.
+
+ORM writes are stamped in a before_flush hook. Set-based statements take one
+value with ``next_seq`` and stamp every row they touch with it. Pages are
+ordered by (change_seq, id), so one statement's rows can span several pages.
+"""
+import base64
+from datetime import datetime
+from sqlalchemy import event, update, select, insert, literal, or_, and_
+from sqlalchemy.orm import Session
+from app.database import RoutingSession
+from app.models import Patient, CareTeamAssignment, HealthScreening, Tombstone, ChangeSequence
+
+# Sync entity name -> model
+TRACKED = {
+    "patient": Patient,
+    "care_team_assignment": CareTeamAssignment,
+    "health_screening": HealthScreening,
+}
+_ENTITY_NAMES = {model: name for name, model in TRACKED.items()}
+
+_DELETED_KEY = "sync_deleted_seqs"
+
+
+def next_seq(session: Session) -> int:
+    """Allocate the next change sequence value, locking the sequence until the transaction ends"""
+    conn = session.connection()
+    table = ChangeSequence.__table__
+    value = conn.execute(
+        update(table).where(table.c.id == 1).values(value=table.c.value + 1).returning(table.c.value)
+    ).scalar()
+    if value is None:
+        conn.execute(table.insert().values(id=1, value=1))
+        value = 1
+    return value
+
+
+def committed_seq(session: Session) -> int:
+    """The highest change sequence value whose changes are all committed"""
+    table = ChangeSequence.__table__
+    return session.execute(select(table.c.value).where(table.c.id == 1)).scalar() or 0
+
+
+def tombstone_patients(session: Session, patient_ids, seq: int, reason: str = "deleted") -> dict:
+    """
+    Tombstone patients and their assignments and screenings with INSERT ... SELECT.
+
+    patient_ids is a list of ids or a select of ids. Run it before the rows are
+    deleted. Returns the number of tombstones written per entity.
+    """
+    patient = Patient.__table__
+    assignment = CareTeamAssignment.__table__
+    screening = HealthScreening.__table__
+    columns = ["entity", "entity_id", "patient_id", "reason", "change_seq", "deleted_at"]
+    now = literal(datetime.utcnow())
+
+    written = {}
+    for entity, table, patient_column in (
+        ("patient", patient, patient.c.id),
+        ("care_team_assignment", assignment, assignment.c.patient_id),
+        ("health_screening", screening, screening.c.patient_id),
+    ):
+        result = session.execute(
+            insert(Tombstone.__table__).from_select(
+                columns,
+                select(
+                    literal(entity), table.c.id, patient_column, literal(reason), literal(seq), now,
+                ).where(patient_column.in_(patient_ids)),
+            )
+        )
+        written[entity] = result.rowcount
+    return written
+
+
+def tombstone_assignments(session: Session, assignment_ids, seq: int, reason: str = "deleted") -> int:
+    """Tombstone care team assignments with INSERT ... SELECT; run it before they are deleted"""
+    assignment = CareTeamAssignment.__table__
+    result = session.execute(
+        insert(Tombstone.__table__).from_select(
+            ["entity", "entity_id", "patient_id", "reason", "change_seq", "deleted_at"],
+            select(
+                literal("care_team_assignment"), assignment.c.id, assignment.c.patient_id,
+                literal(reason), literal(seq), literal(datetime.utcnow()),
+            ).where(assignment.c.id.in_(assignment_ids)),
+        )
+    )
+    return result.rowcount
+
+
+def deleted_seq(session: Session, entity: str, entity_id: int):
+    """Change sequence of a tombstone written by this session's ORM deletes"""
+    return session.info.get(_DELETED_KEY, {}).get((entity, entity_id))
+
+
+# Runs before the other before_flush hooks, so the sequence is locked before counters or generations
+@event.listens_for(RoutingSession, "before_flush", insert=True)
+def _stamp_changes(session, flush_context, instances):
+    changed = [obj for obj in session.new if type(obj) in _ENTITY_NAMES]
+    changed += [
+        obj for obj in session.dirty
+        if type(obj) in _ENTITY_NAMES and obj not in session.deleted and session.is_modified(obj)
+    ]
+    deleted = [obj for obj in session.deleted if type(obj) in _ENTITY_NAMES]
+    if not changed and not deleted:
+        return
+
+    seq = next_seq(session)
+    now = datetime.utcnow()
+    for obj in changed:
+        obj.change_seq = seq
+        obj.updated_at = now
+
+    deleted_seqs = session.info.setdefault(_DELETED_KEY, {})
+    for obj in deleted:
+        entity = _ENTITY_NAMES[type(obj)]
+        patient_id = obj.id if isinstance(obj, Patient) else obj.patient_id
+        session.add(Tombstone(
+            entity=entity, entity_id=obj.id, patient_id=patient_id,
+            reason="deleted", change_seq=seq, deleted_at=now,
+        ))
+        deleted_seqs[(entity, obj.id)] = seq
+
+
+def encode_cursor(seq: int, source: int, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{seq}:{source}:{row_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """(change_seq, source index, id); raises ValueError for a malformed cursor"""
+    seq, source, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+    return int(seq), int(source), int(row_id)
+
+
+def changes_since(session: Session, since_seq: int = 0, limit: int = 500, cursor: tuple = None) -> dict:
+    """
+    Rows and tombstones written after since_seq (or after cursor), oldest first.
+
+    Rows are ordered by (change_seq, source, id) and pages hold at most
+    ``limit`` rows, so a large set-based change is split across pages. While
+    ``has_more`` is true, pass ``next_cursor`` back to continue. Once it is
+    false, store ``next_seq`` as the next sync's since_seq.
+    """
+    sources = dict(TRACKED, tombstone=Tombstone)
+    # Read before the rows: everything at or below it is committed and visible
+    high = committed_seq(session)
+    seq, source, row_id = cursor or (since_seq, len(sources), 0)
+
+    # The next limit + 1 keys of each source; together they contain the next limit + 1 overall
+    keys = []
+    for index, model in enumerate(sources.values()):
+        if index > source:
+            after = model.change_seq >= seq
+        elif index == source:
+            after = or_(model.change_seq > seq, and_(model.change_seq == seq, model.id > row_id))
+        else:
+            after = model.change_seq > seq
+        keys.extend(
+            (row.change_seq, index, row.id) for row in session.query(model.change_seq, model.id)
+            .filter(after, model.change_seq <= high)
+            .order_by(model.change_seq, model.id)
+            .limit(limit + 1)
+        )
+    keys.sort()
+    has_more = len(keys) > limit
+    keys = keys[:limit]
+
+    names = list(sources)
+    ids = {name: [] for name in names}
+    for _, index, key_id in keys:
+        ids[names[index]].append(key_id)
+    changes = {}
+    for name, model in sources.items():
+        rows = session.query(model).filter(model.id.in_(ids[name])).all() if ids[name] else []
+        order = {key_id: position for position, key_id in enumerate(ids[name])}
+        changes[name] = sorted(rows, key=lambda row: order[row.id])
+
+    if has_more:
+        # Part of the last sequence value may still be on the next page
+        next_seq = keys[-1][0] - 1
+        next_cursor = encode_cursor(*keys[-1])
+    else:
+        # Everything up to the watermark has been returned
+        next_seq = max(high, seq)
+        next_cursor = None
+    return {"changes": changes, "next_seq": next_seq, "next_cursor": next_cursor, "has_more": has_more}
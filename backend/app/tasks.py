@@ -0,0 +1,86 @@
+"""
+Job handlers registered with the background job runner.
+"""
+from app.database import SessionLocal
+from app.jobs import job_handler
+from datetime import date
+from app import models, archive, counters, snapshots
+
+
+@job_handler("seed")
+def seed_database(ctx):
+    """Seed the database with sample data, one step at a time"""
+    # seed_data lives next to the app package and is only needed by this job
+    import seed_data
+
+    db = SessionLocal()
+    try:
+        ctx.progress(0, 4, "Seeding care team members")
+        seed_data.seed_care_team_members(db)
+
+        ctx.progress(1, 4, "Seeding patients")
+        patients = seed_data.seed_patients(db)
+        if not patients:
+            patients = db.query(models.Patient).all()
+
+        if patients:
+            care_team_members = db.query(models.CareTeamMember).all()
+            ctx.progress(2, 4, "Seeding care team assignments")
+            seed_data.seed_care_team_assignments(db, patients, care_team_members)
+
+            ctx.progress(3, 4, "Seeding health screenings")
+            seed_data.seed_health_screenings(db, patients)
+
+        counts = {
+            "care_team_members": db.query(models.CareTeamMember).count(),
+            "patients": db.query(models.Patient).count(),
+            "assignments": db.query(models.CareTeamAssignment).count(),
+            "screenings": db.query(models.HealthScreening).count(),
+        }
+        ctx.progress(4, 4, "Database seeded successfully")
+        return counts
+    finally:
+        db.close()
+
+
+@job_handler("archive_discharged")
+def archive_discharged(ctx, batch_size: int = 500):
+    """Move discharged patients and their history into the archive tables"""
+    db = SessionLocal()
+    try:
+        ctx.progress(0, message="Archiving discharged patients")
+        archived = archive.archive_discharged(
+            db,
+            batch_size=batch_size,
+            on_batch=lambda done, total: ctx.progress(done, total, f"Archived {done} of {total} patients"),
+        )
+        return {"archived_patients": archived}
+    finally:
+        db.close()
+
+
+@job_handler("reconcile_patient_counts")
+def reconcile_patient_counts(ctx):
+    """Verify the per-status patient counters against the patients table and fix drift"""
+    db = SessionLocal()
+    try:
+        ctx.progress(0, 1, "Recounting patients by status")
+        drift = counters.reconcile(db)
+        ctx.progress(1, 1, "Counters match" if not drift else "Corrected counter drift")
+        return {"drift": drift}
+    finally:
+        db.close()
+
+
+@job_handler("snapshot_export")
+def export_snapshot(ctx, tables=None, name=None, format=None, id_from=None, id_to=None,
+                    date_from=None, date_to=None):
+    """Write a columnar snapshot of the patient tables"""
+    ctx.progress(0, message="Exporting snapshot")
+    manifest = snapshots.export(
+        tables, name, format, id_from, id_to,
+        date.fromisoformat(date_from) if date_from else None,
+        date.fromisoformat(date_to) if date_to else None,
+        on_chunk=lambda table, rows: ctx.progress(rows, message=f"Exported {rows} {table} rows"),
+    )
+    return manifest
@@ -0,0 +1,117 @@
+"""
+Bytes-on-wire and latency benchmark for response compression.
+
+Builds typical API payloads (a 100-patient list page, a long screening history,
+a patient detail and a 10k-row export), compresses them with each available
+encoding, and estimates end-to-end latency on slow clinic links:
+
+    latency = compression time + round trip + bytes * 8 / bandwidth
+
+Run from the backend directory:
+
+    python benchmarks/compression.py
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.compression import compress, brotli  # noqa: E402
+
+# (name, bandwidth in bits per second, round trip in seconds)
+LINKS = [
+    ("3G 0.75M/200ms", 750_000, 0.200),
+    ("DSL 4M/60ms", 4_000_000, 0.060),
+    ("LAN 20M/30ms", 20_000_000, 0.030),
+]
+
+FIRST_NAMES = ["John", "Jane", "Robert", "Maria", "James", "Patricia", "William", "Linda", "Amanda", "Daniel"]
+LAST_NAMES = ["Smith", "Doe", "Brown", "Garcia", "Wilson", "Moore", "Taylor", "Anderson", "Harris", "Martin"]
+PROGRAMS = ["Behavioral Health Program", "Chronic Care Management", "Wellness Program"]
+STATUSES = ["active", "active", "active", "inactive", "discharged"]
+
+
+def _patient(i: int) -> dict:
+    first, last = random.choice(FIRST_NAMES), random.choice(LAST_NAMES)
+    return {
+        "first_name": first,
+        "last_name": last,
+        "date_of_birth": str(date(1950, 1, 1) + timedelta(days=random.randint(0, 20000))),
+        "email": f"{first.lower()}.{last.lower()}{i}@email.com",
+        "phone": f"555-{random.randint(1000, 9999)}",
+        "address": f"{random.randint(1, 999)} Main St, Anytown, ST {random.randint(10000, 99999)}",
+        "enrollment_date": str(date(2023, 1, 1) + timedelta(days=random.randint(0, 700))),
+        "status": random.choice(STATUSES),
+        "care_program": random.choice(PROGRAMS),
+        "id": i,
+    }
+
+
+def _screenings(patient_id: int, count: int) -> list:
+    start = date(2015, 1, 1)
+    return [
+        {
+            "patient_id": patient_id,
+            "screening_date": str(start + timedelta(days=30 * n)),
+            "score": round(random.uniform(0, 10), 1),
+            "id": patient_id * 1000 + n,
+        }
+        for n in range(count)
+    ]
+
+
+def payloads() -> list:
+    random.seed(42)
+    detail = _patient(1)
+    detail["care_team_assignments"] = []
+    detail["health_screenings"] = _screenings(1, 60)
+    return [
+        ("patient count", {"count": 1243}),
+        ("patient list (limit=100)", [_patient(i) for i in range(100)]),
+        ("patient detail", detail),
+        ("screening history (120)", _screenings(1, 120)),
+        ("export (10k patients)", [_patient(i) for i in range(10_000)]),
+    ]
+
+
+def _time(func, repeat: int) -> tuple:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    encodings = ["identity", "gzip"] + (["br"] if brotli is not None else [])
+
+    for name, payload in payloads():
+        body = json.dumps(payload).encode()
+        print(f"\n{name}: {len(body):,} bytes uncompressed")
+        header = f"  {'encoding':<9} {'bytes':>10} {'ratio':>6} {'cpu ms':>7}"
+        print(header + "".join(f" {link[0]:>15}" for link in LINKS))
+        for encoding in encodings:
+            if encoding == "identity":
+                data, cpu = body, 0.0
+            else:
+                data, cpu = _time(lambda: compress(body, encoding), args.repeat)
+            row = f"  {encoding:<9} {len(data):>10,} {len(body) / len(data):>5.1f}x {cpu * 1000:>7.2f}"
+            for _, bandwidth, rtt in LINKS:
+                latency = cpu + rtt + len(data) * 8 / bandwidth
+                row += f" {latency * 1000:>12.0f} ms"
+            print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Startup-time benchmark for the API.
+
+Measures, in fresh interpreter processes:
+  - how long `import app.main` takes
+  - how long a uvicorn worker takes from spawn to its first successful response,
+    and the latency of that first request compared with a warm one
+
+Run from the backend directory against a migrated database:
+
+    python -m app.migrations
+    python benchmarks/startup.py --runs 5
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - t)"
+)
+
+
+def measure_import() -> float:
+    output = subprocess.check_output(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=BACKEND_DIR, text=True
+    )
+    return float(output.strip().splitlines()[-1])
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get(url: str) -> float:
+    start = time.perf_counter()
+    with urllib.request.urlopen(url, timeout=5) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def measure_first_request(path: str) -> tuple:
+    """Return (spawn-to-first-response, first request latency, warm request latency)"""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}{path}"
+    spawned = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+    )
+    try:
+        while True:
+            try:
+                first = _get(url)
+                break
+            except OSError:
+                if server.poll() is not None:
+                    raise RuntimeError("uvicorn exited before serving a request")
+                time.sleep(0.01)
+        ready = time.perf_counter() - spawned
+        warm = statistics.median(_get(url) for _ in range(5))
+        return ready, first, warm
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def _fmt(values) -> str:
+    return f"median {statistics.median(values) * 1000:7.1f} ms  (min {min(values) * 1000:.1f}, max {max(values) * 1000:.1f})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/api/patients?limit=20")
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    requests = [measure_first_request(args.path) for _ in range(args.runs)]
+
+    print(f"import app.main          {_fmt(imports)}")
+    print(f"spawn to first response  {_fmt([r[0] for r in requests])}")
+    print(f"first request latency    {_fmt([r[1] for r in requests])}")
+    print(f"warm request latency     {_fmt([r[2] for r in requests])}")
+
+
+if __name__ == "__main__":
+    main()
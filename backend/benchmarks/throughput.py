@@ -0,0 +1,180 @@
+"""
+Throughput scaling benchmark for the production server (gunicorn + uvicorn workers).
+
+For each worker count, starts `gunicorn -c gunicorn.conf.py app.main:app` with
+WEB_CONCURRENCY set, drives it with concurrent keep-alive HTTP client processes,
+and reports requests/second, latency percentiles and scaling efficiency relative
+to one worker.
+
+Run from the backend directory against a migrated, seeded database:
+
+    python benchmarks/throughput.py --workers 1 2 4 --duration 15
+
+On a multi-core host, give the server and the clients their own cores, so the
+load generator doesn't compete with the workers it measures:
+
+    python benchmarks/throughput.py --workers 1 2 4 8 --server-cpus 0-7 --client-cpus 8-15 --markdown
+
+--markdown prints the table in the format used in DEPLOYMENT.md.
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(port: int, server: subprocess.Popen, path: str):
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("gunicorn exited before it became ready")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", path)
+            conn.getresponse().read()
+            conn.close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("gunicorn did not become ready in time")
+
+
+def _cpu_list(value: str) -> set:
+    """Parse a CPU list like "0-3,8" into a set of CPU numbers"""
+    cpus = set()
+    for part in value.split(","):
+        first, _, last = part.partition("-")
+        cpus.update(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+def _client(port: int, path: str, duration: float, results, cpus=None):
+    """One client process issuing requests back to back over a keep-alive connection"""
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    latencies = []
+    errors = 0
+    end = time.monotonic() + duration
+    while time.monotonic() < end:
+        start = time.perf_counter()
+        try:
+            conn.request("GET", path)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            continue
+        latencies.append(time.perf_counter() - start)
+    results.put((latencies, errors))
+
+
+def run(workers: int, path: str, duration: float, clients: int, server_cpus=None, client_cpus=None) -> dict:
+    port = _free_port()
+    # Every load generator shares one address, so per-client rate limits would cap the run
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), PORT=str(port), RATE_LIMIT_ENABLED="false")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        # The master and every forked worker inherit the affinity
+        preexec_fn=(lambda: os.sched_setaffinity(0, server_cpus)) if server_cpus else None,
+    )
+    try:
+        _wait_ready(port, server, path)
+        results = multiprocessing.Queue()
+        procs = [
+            multiprocessing.Process(target=_client, args=(port, path, duration, results, client_cpus))
+            for _ in range(clients)
+        ]
+        for p in procs:
+            p.start()
+        latencies, errors = [], 0
+        for _ in procs:
+            lat, err = results.get()
+            latencies.extend(lat)
+            errors += err
+        for p in procs:
+            p.join()
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies.sort()
+    return {
+        "workers": workers,
+        "rps": len(latencies) / duration,
+        "p50": statistics.median(latencies) if latencies else 0,
+        "p99": latencies[int(len(latencies) * 0.99)] if latencies else 0,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--path", default="/api/patients?limit=20")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--clients", type=int, default=8, help="concurrent client processes")
+    parser.add_argument("--server-cpus", type=_cpu_list, help="CPUs for gunicorn, e.g. 0-3")
+    parser.add_argument("--client-cpus", type=_cpu_list, help="CPUs for the client processes, e.g. 4-7")
+    parser.add_argument("--markdown", action="store_true", help="print a Markdown table")
+    args = parser.parse_args()
+
+    available = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else set(range(os.cpu_count()))
+    print(f"CPUs available: {len(available)}")
+    if args.server_cpus and args.client_cpus:
+        if args.server_cpus & args.client_cpus:
+            parser.error("--server-cpus and --client-cpus overlap")
+        print(f"Server on CPUs {sorted(args.server_cpus)}, clients on CPUs {sorted(args.client_cpus)}")
+    else:
+        print("Server and clients share CPUs; pass --server-cpus and --client-cpus to separate them")
+    for cpus in (args.server_cpus, args.client_cpus):
+        if cpus and not cpus <= available:
+            parser.error(f"CPUs {sorted(cpus - available)} are not available")
+    if args.server_cpus and max(args.workers) > len(args.server_cpus):
+        print(f"Note: more workers than server CPUs ({len(args.server_cpus)})")
+
+    if args.markdown:
+        print("| workers | req/s | p50 ms | p99 ms | scaling |")
+        print("|--------:|------:|-------:|-------:|--------:|")
+    else:
+        print(f"{'workers':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7} {'scaling':>8}")
+    baseline = None
+    for workers in args.workers:
+        r = run(workers, args.path, args.duration, args.clients, args.server_cpus, args.client_cpus)
+        baseline = baseline or r["rps"]
+        if args.markdown:
+            print(
+                f"| {r['workers']} | {r['rps']:.0f} | {r['p50'] * 1000:.1f} | {r['p99'] * 1000:.1f} "
+                f"| {r['rps'] / baseline:.2f}x |"
+            )
+            if r["errors"]:
+                print(f"<!-- {r['errors']} errors with {workers} workers -->")
+        else:
+            print(
+                f"{r['workers']:>7} {r['rps']:>9.0f} {r['p50'] * 1000:>8.1f} {r['p99'] * 1000:>8.1f} "
+                f"{r['errors']:>7} {r['rps'] / baseline:>7.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Gunicorn configuration for production:
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+The app is imported once in the master (preload) and workers are forked from it,
+so each worker starts without re-importing FastAPI and the models.
+
+Reloading:
+  - kill -HUP <master pid>                       graceful worker restart (same code)
+  - kill -USR2 <master pid>, then -QUIT old one  zero-downtime code upgrade
+  - GUNICORN_RELOAD=true                         restart on file changes (development)
+"""
+import os
+from app.server import worker_count
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = worker_count()
+worker_class = "app.server.TunedUvicornWorker"
+
+reload = os.getenv("GUNICORN_RELOAD", "false").lower() in ("1", "true", "yes")
+# Preloading is incompatible with reload-on-change, which must re-import the app
+preload_app = not reload
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "0"))
+
+# Peers allowed to set X-Forwarded-Proto/-For for uvicorn. Rate limiting picks the
+# client address itself, counting TRUSTED_PROXY_HOPS back (see app.admission)
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "*" if os.getenv("RAILWAY_ENVIRONMENT") else "127.0.0.1")
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", None)
+errorlog = "-"
+
+# Interrupted jobs are recovered once by the master, not by every worker on boot
+os.environ.setdefault("RECOVER_JOBS_ON_STARTUP", "false")
+
+# The in-memory change feed only reaches clients of the worker that made the
+# change. With several workers on PostgreSQL, fan out through LISTEN/NOTIFY.
+_postgres = os.getenv("DATABASE_URL", "").startswith(("postgres://", "postgresql"))
+if workers > 1 and _postgres:
+    os.environ.setdefault("CHANGE_FEED_BROKER", "postgres")
+
+
+def when_ready(server):
+    from app.database import SessionLocal
+    from app import jobs
+
+    db = SessionLocal()
+    try:
+        recovered = jobs.recover_interrupted(db)
+        if recovered:
+            server.log.info("Marked %s interrupted jobs as failed", recovered)
+    finally:
+        db.close()
+    server.log.info("Serving with %s workers", workers)
+    if workers > 1 and os.getenv("CHANGE_FEED_BROKER", "memory") == "memory":
+        server.log.warning(
+            "CHANGE_FEED_BROKER=memory with %s workers: change stream clients only see "
+            "changes made by their own worker", workers,
+        )
+
+
+def post_fork(server, worker):
+    # Connections opened in the master must not be shared with forked workers
+    from app.database import engine, replica_engines
+
+    for bind_engine in [engine, *replica_engines]:
+        bind_engine.dispose(close=False)
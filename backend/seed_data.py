@@ -3,13 +3,21 @@ Seed script to populate the database with sample data.
 Run this script after setting up the database to populate it with test data.
 """
 from sqlalchemy.orm import Session
-from app.database import SessionLocal, engine, Base
-from app import models
+from app.database import SessionLocal
+from app import models, migrations, counters, sync, generations  # noqa: F401 - session hooks keep counts, change sequence and generations current
 from datetime import date, timedelta
+import os
 import random
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+# Rows per commit. Each commit releases the change sequence lock (see app.sync),
+# so API writes aren't held up for the whole seed
+SEED_BATCH_SIZE = int(os.getenv("SEED_BATCH_SIZE", "200"))
+
+
+def _commit_batch(db: Session, added: int):
+    """Commit after every SEED_BATCH_SIZE added rows"""
+    if added and added % SEED_BATCH_SIZE == 0:
+        db.commit()
 
 
 def seed_care_team_members(db: Session):
@@ -412,6 +420,7 @@ def seed_patients(db: Session):
             db.add(db_patient)
             db.flush()
             patients.append(db_patient)
+            _commit_batch(db, len(patients))
     
     db.commit()
     print(f"✓ Seeded {len(patients)} patients")
@@ -536,6 +545,7 @@ def seed_care_team_assignments(db: Session, patients: list, care_team_members: l
                 )
                 db.add(db_assignment)
                 assignments_added += 1
+                _commit_batch(db, assignments_added)
     
     db.commit()
     print(f"✓ Seeded {assignments_added} care team assignments")
@@ -575,6 +585,7 @@ def seed_health_screenings(db: Session, patients: list):
                 )
                 db.add(db_screening)
                 screenings_added += 1
+                _commit_batch(db, screenings_added)
     
     db.commit()
     print(f"✓ Seeded {screenings_added} health screenings (6 months per patient)")
@@ -584,8 +595,8 @@ def main():
     """Main seeding function - Safe and idempotent, never deletes existing data"""
     db = SessionLocal()
     try:
-        # Ensure tables exist
-        Base.metadata.create_all(bind=engine)
+        # Ensure the schema is up to date
+        migrations.upgrade()
         
         print("Starting database seeding...")
         print("Note: This script is safe to run multiple times - it only adds missing data.")
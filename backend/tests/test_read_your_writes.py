@@ -0,0 +1,74 @@
+"""
+Read-your-writes for a cross-origin browser client.
+
+The frontend runs on another site, so the browser won't send the API's cookie.
+After a committed write the API must tell the client (through a CORS-exposed
+header) how long to send X-Read-Primary, and reads with that header must go to
+the primary. Requests that don't write must not start the window.
+
+The app reads its configuration at import, so it is set up here before the
+import, with the primary database doubling as the one replica.
+"""
+import os
+import tempfile
+
+_db_path = os.path.join(tempfile.mkdtemp(), "ryw.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_path}"
+os.environ["DATABASE_REPLICA_URLS"] = f"sqlite:///{_db_path}"
+os.environ["VERCEL_FRONTEND_URL"] = "https://care.example.app"
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+from app.main import app  # noqa: E402
+from app.database import wants_primary, READ_PRIMARY_HEADER, READ_PRIMARY_FOR_HEADER  # noqa: E402
+
+ORIGIN = {"Origin": "https://care.example.app"}
+PATIENT = {
+    "first_name": "Ada", "last_name": "Byron", "date_of_birth": "1990-12-10",
+    "email": "ada@example.com", "phone": "555-0100", "enrollment_date": "2024-01-02",
+}
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+def test_write_starts_primary_window_for_cross_origin_client(client):
+    response = client.post("/api/patients", json=PATIENT, headers=ORIGIN)
+    assert response.status_code == 201
+    assert float(response.headers[READ_PRIMARY_FOR_HEADER]) > 0
+    exposed = response.headers["access-control-expose-headers"].lower()
+    assert READ_PRIMARY_FOR_HEADER.lower() in exposed
+
+
+def test_cross_origin_client_may_send_read_primary(client):
+    response = client.options("/api/patients", headers={
+        **ORIGIN,
+        "Access-Control-Request-Method": "GET",
+        "Access-Control-Request-Headers": READ_PRIMARY_HEADER,
+    })
+    assert response.status_code == 200
+    assert READ_PRIMARY_HEADER.lower() in response.headers["access-control-allow-headers"].lower()
+
+
+def test_read_primary_header_routes_to_primary():
+    request = Request({"type": "http", "headers": [(READ_PRIMARY_HEADER.lower().encode(), b"1")]})
+    assert wants_primary(request)
+    assert not wants_primary(Request({"type": "http", "headers": []}))
+
+
+def test_read_only_post_does_not_start_window(client):
+    response = client.post("/api/care-team-assignments/recommendations", json={"count": 1}, headers=ORIGIN)
+    assert response.status_code == 200
+    assert READ_PRIMARY_FOR_HEADER not in response.headers
+    assert "read_primary_until" not in response.headers.get("set-cookie", "")
+
+
+def test_failed_write_does_not_start_window(client):
+    response = client.post("/api/patients", json={**PATIENT, "email": "not-an-email"}, headers=ORIGIN)
+    assert response.status_code == 422
+    assert READ_PRIMARY_FOR_HEADER not in response.headers
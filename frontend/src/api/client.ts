@@ -4,6 +4,12 @@ import axios from 'axios'
 // For production, set VITE_API_URL to your backend URL (e.g., Railway, Render, etc.)
 const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8002'
 
+// After a write the API answers with X-Read-Primary-For: <seconds>. Until then we
+// send X-Read-Primary, so reads see the write even if a replica lags. The API's
+// cookie does the same for same-site clients, but browsers don't send it
+// cross-site. Kept in sessionStorage so it survives a reload.
+const READ_PRIMARY_UNTIL_KEY = 'readPrimaryUntil'
+
 const apiClient = axios.create({
   baseURL: API_BASE_URL,
   headers: {
@@ -11,4 +17,20 @@ const apiClient = axios.create({
   },
 })
 
+apiClient.interceptors.request.use((config) => {
+  const until = Number(sessionStorage.getItem(READ_PRIMARY_UNTIL_KEY) || 0)
+  if (until > Date.now()) {
+    config.headers.set('X-Read-Primary', '1')
+  }
+  return config
+})
+
+apiClient.interceptors.response.use((response) => {
+  const seconds = Number(response.headers['x-read-primary-for'])
+  if (seconds > 0) {
+    sessionStorage.setItem(READ_PRIMARY_UNTIL_KEY, String(Date.now() + seconds * 1000))
+  }
+  return response
+})
+
 export default apiClient
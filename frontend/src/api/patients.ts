@@ -1,9 +1,17 @@
 import apiClient from './client'
-import { Patient, PatientDetail, PatientStatus } from '../types'
+import { Patient, PatientDetail, PatientStatus, PatientSuggestion } from '../types'
 
 export interface PatientsResponse {
   patients: Patient[]
   total: number
+  // False when the server stopped counting at its cap; render as `${total}+`
+  totalExact: boolean
+}
+
+interface PatientCountResponse {
+  count: number
+  exact: boolean
+  estimate?: number | null
 }
 
 export const getPatients = async (
@@ -18,15 +26,26 @@ export const getPatients = async (
 
   const [patientsResponse, countResponse] = await Promise.all([
     apiClient.get<Patient[]>('/api/patients', { params }),
-    apiClient.get<{ count: number }>('/api/patients/count', { params: { search, status } }),
+    apiClient.get<PatientCountResponse>('/api/patients/count', { params: { search, status } }),
   ])
 
   return {
     patients: patientsResponse.data,
     total: countResponse.data.count,
+    totalExact: countResponse.data.exact,
   }
 }
 
+export const autocompletePatients = async (
+  prefix: string,
+  limit: number = 8
+): Promise<PatientSuggestion[]> => {
+  const response = await apiClient.get<PatientSuggestion[]>('/api/patients/autocomplete', {
+    params: { prefix, limit },
+  })
+  return response.data
+}
+
 export const getPatient = async (id: number): Promise<PatientDetail> => {
   const response = await apiClient.get<PatientDetail>(`/api/patients/${id}`)
   return response.data
@@ -1,7 +1,7 @@
 import { useState, useEffect } from 'react'
 import { useNavigate } from 'react-router-dom'
-import { getPatients, deletePatient } from '../api/patients'
-import { Patient, PatientStatus } from '../types'
+import { getPatients, deletePatient, autocompletePatients } from '../api/patients'
+import { Patient, PatientStatus, PatientSuggestion } from '../types'
 
 const PatientList = () => {
   const navigate = useNavigate()
@@ -9,16 +9,44 @@ const PatientList = () => {
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState<string | null>(null)
   const [search, setSearch] = useState('')
+  const [debouncedSearch, setDebouncedSearch] = useState('')
+  const [suggestions, setSuggestions] = useState<PatientSuggestion[]>([])
   const [statusFilter, setStatusFilter] = useState<PatientStatus | ''>('')
   const [currentPage, setCurrentPage] = useState(1)
   const [totalPatients, setTotalPatients] = useState(0)
+  const [totalExact, setTotalExact] = useState(true)
   const [deletingId, setDeletingId] = useState<number | null>(null)
 
   const patientsPerPage = 20
 
+  // Typeahead comes from the in-memory autocomplete endpoint on every keystroke;
+  // the full list query only runs once typing pauses
+  useEffect(() => {
+    const timer = setTimeout(() => setDebouncedSearch(search), 300)
+    return () => clearTimeout(timer)
+  }, [search])
+
+  useEffect(() => {
+    if (!search.trim()) {
+      setSuggestions([])
+      return
+    }
+    let cancelled = false
+    autocompletePatients(search)
+      .then((result) => {
+        if (!cancelled) setSuggestions(result)
+      })
+      .catch(() => {
+        if (!cancelled) setSuggestions([])
+      })
+    return () => {
+      cancelled = true
+    }
+  }, [search])
+
   useEffect(() => {
     loadPatients()
-  }, [currentPage, search, statusFilter])
+  }, [currentPage, debouncedSearch, statusFilter])
 
   const loadPatients = async () => {
     try {
@@ -28,11 +56,12 @@ const PatientList = () => {
       const result = await getPatients(
         skip,
         patientsPerPage,
-        search || undefined,
+        debouncedSearch || undefined,
         statusFilter || undefined
       )
       setPatients(result.patients)
       setTotalPatients(result.total)
+      setTotalExact(result.totalExact)
     } catch (err: any) {
       setError(err.response?.data?.detail || 'Failed to load patients')
     } finally {
@@ -68,6 +97,9 @@ const PatientList = () => {
   }
 
   const totalPages = Math.ceil(totalPatients / patientsPerPage)
+  // Inexact (capped) totals: keep paging while pages come back full
+  const hasNextPage = totalExact ? currentPage < totalPages : patients.length === patientsPerPage
+  const plus = totalExact ? '' : '+'
 
   const getStatusBadgeClass = (status: PatientStatus) => {
     const baseClasses = 'inline-block rounded-xl text-sm font-medium capitalize'
@@ -96,14 +128,31 @@ const PatientList = () => {
       </div>
 
       <div className="flex gap-4 mb-6 items-center">
-        <div className="flex-1">
+        <div className="flex-1 relative">
           <input
             type="text"
             placeholder="Search by name, email, or phone..."
             value={search}
             onChange={handleSearchChange}
+            onBlur={() => setTimeout(() => setSuggestions([]), 150)}
             className="w-full rounded border border-[#ddd] text-base p-3"
           />
+          {suggestions.length > 0 && (
+            <ul className="absolute z-10 left-0 right-0 mt-1 bg-white border border-[#ddd] rounded shadow list-none p-0 m-0">
+              {suggestions.map((s) => (
+                <li
+                  key={s.id}
+                  className="px-3 py-2 cursor-pointer hover:bg-[#f8f9fa]"
+                  onMouseDown={() => navigate(`/patients/${s.id}`)}
+                >
+                  <span className="text-[#2c3e50]">
+                    {s.first_name} {s.last_name}
+                  </span>
+                  <span className="text-sm text-[#6c757d] ml-2">{s.email || s.phone}</span>
+                </li>
+              ))}
+            </ul>
+          )}
         </div>
         <div className="min-w-[200px]">
           <select
@@ -178,7 +227,7 @@ const PatientList = () => {
             </table>
           </div>
 
-          {totalPages > 1 && (
+          {(totalPages > 1 || !totalExact) && (
             <div className="flex justify-center items-center gap-4 mt-8">
               <button
                 className="px-4 py-2 bg-[#6c757d] text-white rounded border-none text-base cursor-pointer transition-colors duration-200 hover:bg-[#5a6268] disabled:opacity-50 disabled:cursor-not-allowed"
@@ -188,12 +237,12 @@ const PatientList = () => {
                 Previous
               </button>
               <span className="text-sm text-[#6c757d]">
-                Page {currentPage} of {totalPages} ({totalPatients} total)
+                Page {currentPage} of {totalPages}{plus} ({totalPatients.toLocaleString()}{plus} total)
               </span>
               <button
                 className="px-4 py-2 bg-[#6c757d] text-white rounded border-none text-base cursor-pointer transition-colors duration-200 hover:bg-[#5a6268] disabled:opacity-50 disabled:cursor-not-allowed"
-                onClick={() => setCurrentPage((p) => Math.min(totalPages, p + 1))}
-                disabled={currentPage === totalPages}
+                onClick={() => setCurrentPage((p) => (hasNextPage ? p + 1 : p))}
+                disabled={!hasNextPage}
               >
                 Next
               </button>
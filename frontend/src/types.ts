@@ -23,6 +23,15 @@ export interface Patient {
   care_program?: string
 }
 
+export interface PatientSuggestion {
+  id: number
+  first_name: string
+  last_name: string
+  email?: string
+  phone?: string
+  status: PatientStatus
+}
+
 export interface PatientDetail extends Patient {
   care_team_assignments: CareTeamAssignment[]
   health_screenings: HealthScreening[]
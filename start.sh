@@ -28,6 +28,9 @@ fi
 source venv/bin/activate
 pip install -q -r requirements.txt
 
+# Apply schema migrations
+python -m app.migrations
+
 # Check if database exists, if not seed it
 if [ ! -f "patient_care.db" ]; then
     echo "Seeding database..."